@@ -0,0 +1,145 @@
+-- Rows refer to locations (provinces and coasts) and players by integer ids, and to phases by phase_ordinal, rather
+-- than by name, so they are smaller and quicker to compare, and renaming a location only changes its row in locations.
+-- Location ids are per variant, which is the map_file of the board. Rows of a phase with no row in boards can't be
+-- given a phase_ordinal and are dropped; the bot never read them.
+
+-- every board so far was saved with this map
+UPDATE boards SET map_file = 'assets/imperial_diplomacy.svg' WHERE map_file IS NULL;
+
+DROP INDEX boards_latest_phase;
+CREATE UNIQUE INDEX boards_latest_phase ON boards (board_id, phase_ordinal);
+
+CREATE TABLE locations (
+    location_id INTEGER PRIMARY KEY,
+    variant text NOT NULL,
+    name text NOT NULL,
+    UNIQUE (variant, name));
+
+INSERT INTO locations (variant, name)
+SELECT DISTINCT boards.map_file, names.name FROM boards JOIN (
+    SELECT board_id, phase, province_name AS name FROM provinces
+    UNION SELECT board_id, phase, location FROM units
+    UNION SELECT board_id, phase, order_destination FROM units
+    UNION SELECT board_id, phase, order_source FROM units
+    UNION SELECT board_id, phase, origin FROM retreat_options
+    UNION SELECT board_id, phase, retreat_loc FROM retreat_options
+    UNION SELECT board_id, phase, location FROM builds
+) AS names USING (board_id, phase)
+WHERE names.name IS NOT NULL
+ORDER BY boards.map_file, names.name;
+
+-- names are matched ignoring capitalization, as Board.get_player does
+CREATE TABLE players_new (
+    player_id INTEGER PRIMARY KEY,
+    board_id int,
+    player_name text COLLATE NOCASE,
+    color varchar(6),
+    UNIQUE (board_id, player_name),
+    FOREIGN KEY (board_id) REFERENCES boards (board_id));
+
+INSERT OR IGNORE INTO players_new (board_id, player_name, color)
+SELECT board_id, player_name, color FROM players ORDER BY board_id, player_name;
+
+CREATE TABLE provinces_new (
+    board_id int,
+    phase_ordinal int,
+    province_id int,
+    owner_id int,
+    core_id int,
+    half_core_id int,
+    PRIMARY KEY (board_id, phase_ordinal, province_id),
+    FOREIGN KEY (board_id, phase_ordinal) REFERENCES boards (board_id, phase_ordinal),
+    FOREIGN KEY (province_id) REFERENCES locations (location_id),
+    FOREIGN KEY (owner_id) REFERENCES players (player_id),
+    FOREIGN KEY (core_id) REFERENCES players (player_id),
+    FOREIGN KEY (half_core_id) REFERENCES players (player_id)
+) WITHOUT ROWID;
+
+INSERT INTO provinces_new
+SELECT provinces.board_id, boards.phase_ordinal, province.location_id, owner.player_id, core.player_id,
+    half_core.player_id
+FROM provinces JOIN boards USING (board_id, phase)
+JOIN locations AS province ON province.variant = boards.map_file AND province.name = provinces.province_name
+LEFT JOIN players_new AS owner ON owner.board_id = provinces.board_id AND owner.player_name = provinces.owner
+LEFT JOIN players_new AS core ON core.board_id = provinces.board_id AND core.player_name = provinces.core
+LEFT JOIN players_new AS half_core
+    ON half_core.board_id = provinces.board_id AND half_core.player_name = provinces.half_core;
+
+CREATE TABLE retreat_options_new (
+    board_id int,
+    phase_ordinal int,
+    origin_id int,
+    retreat_location_id int,
+    PRIMARY KEY (board_id, phase_ordinal, origin_id, retreat_location_id),
+    FOREIGN KEY (board_id, phase_ordinal) REFERENCES boards (board_id, phase_ordinal),
+    FOREIGN KEY (origin_id) REFERENCES locations (location_id),
+    FOREIGN KEY (retreat_location_id) REFERENCES locations (location_id)
+) WITHOUT ROWID;
+
+INSERT INTO retreat_options_new
+SELECT retreat_options.board_id, boards.phase_ordinal, origin.location_id, retreat_location.location_id
+FROM retreat_options JOIN boards USING (board_id, phase)
+JOIN locations AS origin ON origin.variant = boards.map_file AND origin.name = retreat_options.origin
+JOIN locations AS retreat_location
+    ON retreat_location.variant = boards.map_file AND retreat_location.name = retreat_options.retreat_loc;
+
+CREATE TABLE units_new (
+    board_id int,
+    phase_ordinal int,
+    location_id int,
+    is_dislodged boolean,
+    owner_id int,
+    is_army boolean,
+    order_type text,
+    order_destination_id int,
+    order_source_id int,
+    PRIMARY KEY (board_id, phase_ordinal, location_id, is_dislodged),
+    FOREIGN KEY (board_id, phase_ordinal) REFERENCES boards (board_id, phase_ordinal),
+    FOREIGN KEY (location_id) REFERENCES locations (location_id),
+    FOREIGN KEY (owner_id) REFERENCES players (player_id),
+    FOREIGN KEY (order_destination_id) REFERENCES locations (location_id),
+    FOREIGN KEY (order_source_id) REFERENCES locations (location_id)
+) WITHOUT ROWID;
+
+INSERT INTO units_new
+SELECT units.board_id, boards.phase_ordinal, location.location_id, units.is_dislodged, owner.player_id,
+    units.is_army, units.order_type, destination.location_id, source.location_id
+FROM units JOIN boards USING (board_id, phase)
+JOIN locations AS location ON location.variant = boards.map_file AND location.name = units.location
+LEFT JOIN players_new AS owner ON owner.board_id = units.board_id AND owner.player_name = units.owner
+LEFT JOIN locations AS destination
+    ON destination.variant = boards.map_file AND destination.name = units.order_destination
+LEFT JOIN locations AS source ON source.variant = boards.map_file AND source.name = units.order_source;
+
+CREATE TABLE builds_new (
+    board_id int,
+    phase_ordinal int,
+    player_id int,
+    location_id int,
+    is_build boolean,
+    is_army boolean,
+    PRIMARY KEY (board_id, phase_ordinal, player_id, location_id),
+    FOREIGN KEY (board_id, phase_ordinal) REFERENCES boards (board_id, phase_ordinal),
+    FOREIGN KEY (player_id) REFERENCES players (player_id),
+    FOREIGN KEY (location_id) REFERENCES locations (location_id)
+) WITHOUT ROWID;
+
+INSERT INTO builds_new
+SELECT builds.board_id, boards.phase_ordinal, player.player_id, location.location_id, builds.is_build,
+    builds.is_army
+FROM builds JOIN boards USING (board_id, phase)
+JOIN players_new AS player ON player.board_id = builds.board_id AND player.player_name = builds.player
+JOIN locations AS location ON location.variant = boards.map_file AND location.name = builds.location;
+
+DROP TABLE provinces;
+DROP TABLE retreat_options;
+DROP TABLE units;
+DROP TABLE builds;
+DROP TABLE players;
+ALTER TABLE players_new RENAME TO players;
+ALTER TABLE provinces_new RENAME TO provinces;
+ALTER TABLE retreat_options_new RENAME TO retreat_options;
+ALTER TABLE units_new RENAME TO units;
+ALTER TABLE builds_new RENAME TO builds;
+
+CREATE INDEX builds_location ON builds (board_id, phase_ordinal, location_id)
@@ -0,0 +1,10 @@
+-- The state of a phase packed into one blob (see diplomacy/persistence/db/snapshot.py), so that it is loaded with one
+-- read. Phases saved before this have no snapshot and are read from the row tables, which snapshots replace.
+CREATE TABLE snapshots (
+    board_id int,
+    phase_ordinal int,
+    version int NOT NULL,
+    data blob NOT NULL,
+    PRIMARY KEY (board_id, phase_ordinal),
+    FOREIGN KEY (board_id, phase_ordinal) REFERENCES boards (board_id, phase_ordinal)
+) WITHOUT ROWID
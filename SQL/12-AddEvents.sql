@@ -0,0 +1,12 @@
+-- Changes to a phase are appended to events rather than each one remaking its snapshot. A snapshot records the last
+-- event it includes, and the phase's events after it are replayed on top when it is read.
+CREATE TABLE events (
+    event_id INTEGER PRIMARY KEY,
+    board_id int NOT NULL,
+    phase_ordinal int NOT NULL,
+    created_at real NOT NULL,
+    kind text NOT NULL,
+    data text NOT NULL);
+CREATE INDEX events_phase ON events (board_id, phase_ordinal, event_id);
+
+ALTER TABLE snapshots ADD COLUMN last_event_id int NOT NULL DEFAULT 0
@@ -0,0 +1,13 @@
+ALTER TABLE boards ADD COLUMN phase_ordinal int;
+
+-- phase is '<year> <phase name>'; the ordinal is year * 5 + the phase's index in the year
+UPDATE boards
+SET phase_ordinal = CAST(substr(phase, 1, instr(phase, ' ') - 1) AS int) * 5 + CASE substr(phase, instr(phase, ' ') + 1)
+    WHEN 'Spring Moves' THEN 0
+    WHEN 'Spring Retreats' THEN 1
+    WHEN 'Fall Moves' THEN 2
+    WHEN 'Fall Retreats' THEN 3
+    WHEN 'Winter Builds' THEN 4
+END;
+
+CREATE INDEX boards_latest_phase ON boards (board_id, phase_ordinal);
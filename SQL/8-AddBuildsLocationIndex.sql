@@ -0,0 +1,2 @@
+-- builds are removed by location, which comes after player in the primary key
+CREATE INDEX builds_location ON builds (board_id, phase, location);
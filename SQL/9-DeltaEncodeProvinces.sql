@@ -0,0 +1,38 @@
+-- Every phase had a row for every province. Now only keyframe phases do, every 10th phase of a board starting from its
+-- first; the others only keep the provinces that changed since the phase before.
+ALTER TABLE boards ADD COLUMN is_keyframe boolean NOT NULL DEFAULT 1;
+
+CREATE TEMP TABLE phase_numbers AS
+SELECT board_id, phase, ROW_NUMBER() OVER (PARTITION BY board_id ORDER BY phase_ordinal) - 1 AS phase_number
+FROM boards;
+
+UPDATE boards SET is_keyframe = 0
+WHERE (board_id, phase) IN (SELECT board_id, phase FROM phase_numbers WHERE phase_number % 10 != 0);
+
+-- a row is only dropped if the phase right before has the same one, as a province missing in some phases must still be
+-- found when it is read back from the keyframe
+CREATE TEMP TABLE unchanged_provinces AS
+SELECT province_rowid FROM (
+    SELECT
+        provinces.rowid AS province_rowid,
+        phase_number,
+        owner,
+        core,
+        half_core,
+        LAG(phase_number) OVER history AS previous_phase_number,
+        LAG(owner) OVER history AS previous_owner,
+        LAG(core) OVER history AS previous_core,
+        LAG(half_core) OVER history AS previous_half_core
+    FROM provinces JOIN phase_numbers USING (board_id, phase)
+    WINDOW history AS (PARTITION BY board_id, province_name ORDER BY phase_number)
+)
+WHERE phase_number % 10 != 0
+AND previous_phase_number = phase_number - 1
+AND owner IS previous_owner
+AND core IS previous_core
+AND half_core IS previous_half_core;
+
+DELETE FROM provinces WHERE rowid IN (SELECT province_rowid FROM unchanged_provinces);
+
+DROP TABLE phase_numbers;
+DROP TABLE unchanged_provinces
@@ -24,29 +24,18 @@ for find, replace in to_rename:
 with open("assets/imperial_diplomacy.svg", 'w') as f:
     f.write(txt)
 
+# rows refer to locations by id, so only their names in locations change
 SQL_format = """
-UPDATE {table_name}
-SET {column_name} = '{replace}'
-WHERE {column_name} = '{search}';
+UPDATE locations
+SET name = '{replace}'
+WHERE name = '{search}';
 """
 
-# table_name, column
-db_usages = [
-    ["provinces", "province_name"],
-    ["retreat_options", "origin"],
-    ["retreat_options", "retreat_loc"],
-    ["units", "location"],
-    ["units", "order_source"],
-    ["units", "order_destination"],
-    ["builds", "location"]
-]
-
 SQL_txt = "BEGIN TRANSACTION;"
 
-for table, column in db_usages:
-    for find, replace in to_rename:
-        SQL_txt += SQL_format.format(table_name=table, column_name=column, replace=replace, search=find)
-    
+for find, replace in to_rename:
+    SQL_txt += SQL_format.format(replace=replace, search=find)
+
 SQL_txt += "\nCOMMIT;\n"
 
 with open("SQL/Rename.out.sql", 'w') as f:
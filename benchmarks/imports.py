@@ -0,0 +1,60 @@
+"""
+Reports how long importing each of the bot's modules takes in a fresh interpreter, and which of the modules imported
+along the way cost the most, so that slow work creeping back into import time is easy to spot.
+
+Run from the repository root: python -m benchmarks.imports [--top N] [module ...]
+"""
+
+import argparse
+import subprocess
+import sys
+
+_modules: list[str] = [
+    "bot.bot",
+    "bot.command",
+    "bot.parse_order",
+    "bot.parse_edit_state",
+    "diplomacy.persistence.manager",
+    "diplomacy.persistence.db.database",
+    "diplomacy.adjudicator.adjudicator",
+    "diplomacy.adjudicator.mapper",
+    "diplomacy.map_parser.vector.vector",
+]
+
+
+def _profile_import(module: str) -> list[tuple[str, int, int]]:
+    """:return: (module, self µs, cumulative µs) of every module imported by importing module, from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=5, help="slowest imports to list per module (default 5)")
+    parser.add_argument("modules", nargs="*", default=_modules, help="modules to import (default: the bot's)")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        imports = _profile_import(module)
+        total = next((cumulative for name, _, cumulative in imports if name == module), 0)
+        print(f"{module}: {total / 1000:.1f} ms")
+        for name, self_us, _ in sorted(imports, key=lambda entry: entry[1], reverse=True)[: args.top]:
+            print(f"    {self_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
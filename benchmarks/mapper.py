@@ -0,0 +1,229 @@
+"""
+Times each stage of drawing maps with Mapper on boards of increasing order density, and the peak memory each stage
+allocates, so rendering regressions are caught and the biggest costs are obvious.
+
+Run from the repository root: python -m benchmarks.mapper [--repeat N] [--fixture NAME ...]
+
+Peak memory is what tracemalloc sees, so it covers Python objects but not lxml's own allocations for the tree.
+"""
+
+import argparse
+import collections
+import copy
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+from diplomacy.adjudicator import mapper as mapper_module
+from diplomacy.adjudicator.mapper import Mapper, UNITLAYER, _MapTemplate
+from diplomacy.map_parser.vector import config_svg as svgcfg
+from diplomacy.map_parser.vector.vector import get_parser
+from diplomacy.persistence import phase
+from diplomacy.persistence.board import Board
+from diplomacy.persistence.order import Build, ConvoyTransport, Hold, Move, Support
+from diplomacy.persistence.province import Province, ProvinceType
+from diplomacy.persistence.unit import UnitType
+
+# boards are graphs of provinces and units referring to each other, which deepcopy walks recursively
+sys.setrecursionlimit(100000)
+
+
+def _with_orders(board: Board, moving: float, seed: int = 0) -> Board:
+    """Orders the given fraction of units to move to a random adjacent province, and the rest to hold"""
+    rng = random.Random(seed)
+    for unit in sorted(board.units, key=lambda unit: unit.province.name):
+        destinations = sorted(unit.province.adjacent, key=lambda province: province.name)
+        if destinations and rng.random() < moving:
+            unit.order = Move(rng.choice(destinations))
+        else:
+            unit.order = Hold()
+    return board
+
+
+def _all_supporting(board: Board, seed: int = 0) -> Board:
+    """Every unit next to another unit supports it, either holding or moving to a random adjacent province"""
+    rng = random.Random(seed)
+    for unit in sorted(board.units, key=lambda unit: unit.province.name):
+        neighbours = sorted(
+            (province.unit for province in unit.province.adjacent if province.unit is not None),
+            key=lambda neighbour: neighbour.province.name,
+        )
+        if not neighbours:
+            unit.order = Hold()
+            continue
+        supported = rng.choice(neighbours)
+        destinations = sorted(supported.province.adjacent, key=lambda province: province.name)
+        if rng.random() < 0.5 or not destinations:
+            unit.order = Support(supported, supported.location())
+        else:
+            unit.order = Support(supported, rng.choice(destinations))
+    return board
+
+
+def _all_fleets_convoying(board: Board) -> Board:
+    """
+    Puts a fleet on every empty sea, and has every fleet at sea convoy one army to the coast farthest from it across the
+    sea. This gives the most convoy routes there can be for one army.
+    """
+    players = sorted(board.players, key=lambda player: player.name)
+    seas = sorted((province for province in board.provinces if province.type == ProvinceType.SEA), key=lambda p: p.name)
+    for i, sea in enumerate(seas):
+        if sea.unit is None:
+            board.create_unit(UnitType.FLEET, players[i % len(players)], sea, None, None)
+
+    for unit in board.units:
+        unit.order = Hold()
+
+    def touches_sea(province: Province) -> bool:
+        return province.type != ProvinceType.SEA and any(p.type == ProvinceType.SEA for p in province.adjacent)
+
+    armies = sorted(
+        (unit for unit in board.units if unit.unit_type == UnitType.ARMY and touches_sea(unit.province)),
+        key=lambda unit: unit.province.name,
+    )
+    if not armies:
+        return board
+    army = armies[0]
+
+    # the last coast reached by a breadth-first search over the seas is the farthest
+    destination = None
+    visited = {army.province}
+    to_visit = collections.deque(p for p in army.province.adjacent if p.type == ProvinceType.SEA)
+    visited.update(to_visit)
+    while to_visit:
+        current = to_visit.popleft()
+        for province in sorted(current.adjacent, key=lambda p: p.name):
+            if province in visited:
+                continue
+            visited.add(province)
+            if province.type == ProvinceType.SEA:
+                to_visit.append(province)
+            else:
+                destination = province
+    if destination is None:
+        return board
+
+    army.order = Move(destination)
+    for sea in seas:
+        sea.unit.order = ConvoyTransport(army, destination)
+    return board
+
+
+def _all_building(board: Board) -> Board:
+    """Every player builds an army in each of their empty home centers"""
+    board.phase = phase.get("Winter Builds")
+    for province in board.provinces:
+        if province.has_supply_center and province.core is not None and province.unit is None:
+            if province.owner == province.core:
+                province.core.build_orders.add(Build(province, UnitType.ARMY))
+    return board
+
+
+_fixtures: dict[str, Callable[[Board], Board]] = {
+    "no orders": lambda board: board,
+    "all holding": lambda board: _with_orders(board, 0),
+    "25% moving": lambda board: _with_orders(board, 0.25),
+    "50% moving": lambda board: _with_orders(board, 0.5),
+    "all moving": lambda board: _with_orders(board, 1),
+    "all supporting": _all_supporting,
+    "all fleets convoying": _all_fleets_convoying,
+    "all building": _all_building,
+}
+
+
+def _forget_drawn(mapper: Mapper) -> None:
+    """Makes the next draw of mapper redraw everything, as on a new mapper"""
+    unit_layer = mapper._index.layers[UNITLAYER]
+    for elements in mapper._drawn_units.values():
+        for element in elements:
+            unit_layer.remove(element)
+    mapper._drawn_units = {}
+    mapper._drawn_province_colors = {}
+    mapper._drawn_center_colors = {}
+    mapper._drawn_scoreboard = [None] * len(mapper.scoreboard_power_locations)
+    mapper._drawn_date = None
+
+
+class _Stage:
+    def __init__(self, name: str, run: Callable[[], None], setup: Callable[[], None] = lambda: None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+
+
+def _measure(stage: _Stage, repeat: int) -> tuple[float, float, int]:
+    """:return: median and minimum seconds, and peak bytes allocated, of running the stage"""
+    times = []
+    for _ in range(repeat):
+        stage.setup()
+        start = time.perf_counter()
+        stage.run()
+        times.append(time.perf_counter() - start)
+
+    # measured separately because tracing allocations slows everything down
+    stage.setup()
+    tracemalloc.start()
+    try:
+        stage.run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), min(times), peak
+
+
+def _get_stages(board: Board) -> list[_Stage]:
+    template = mapper_module._get_template(svgcfg.SVG_FILE)
+    mapper = Mapper(board)
+
+    stages = [
+        _Stage("template copy", template.copy),
+        _Stage("Mapper()", lambda: Mapper(board)),
+        _Stage("_draw_units", mapper._draw_units, lambda: _forget_drawn(mapper)),
+        _Stage("_color_provinces", mapper._color_provinces, lambda: _forget_drawn(mapper)),
+        _Stage("_color_centers", mapper._color_centers, lambda: _forget_drawn(mapper)),
+        _Stage("draw_side_panel", mapper.draw_side_panel, lambda: _forget_drawn(mapper)),
+        _Stage("update (unchanged)", lambda: mapper.update(board), lambda: mapper.update(board)),
+        _Stage("moves orders", lambda: mapper._draw_moves_elements(board.phase, None)),
+    ]
+
+    moves_elements = mapper._draw_moves_elements(board.phase, None)
+    stages.append(_Stage("moves serialize", lambda: mapper._write_svg(moves_elements, "moves_map")))
+    stages.append(_Stage("draw_moves_map", lambda: mapper.draw_moves_map(board.phase, None)))
+    stages.append(_Stage("draw_current_map", mapper.draw_current_map))
+    return stages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="times to run each stage (default 5)")
+    parser.add_argument("--fixture", action="append", choices=list(_fixtures), help="only run these fixtures")
+    args = parser.parse_args()
+
+    row = "{:<22} {:<20} {:>12} {:>12} {:>12}"
+    print(row.format("fixture", "stage", "median ms", "min ms", "peak KiB"))
+
+    def report(fixture_name: str, stage: _Stage) -> None:
+        median, minimum, peak = _measure(stage, args.repeat)
+        print(
+            row.format(fixture_name, stage.name, f"{median * 1000:.2f}", f"{minimum * 1000:.2f}", f"{peak / 1024:.0f}")
+        )
+
+    report("-", _Stage("template parse", lambda: _MapTemplate(svgcfg.SVG_FILE)))
+
+    base_board = get_parser().parse()
+    for fixture_name in args.fixture or _fixtures:
+        board = _fixtures[fixture_name](copy.deepcopy(base_board))
+        ordered = sum(1 for unit in board.units if unit.order is not None and not isinstance(unit.order, Hold))
+        builds = sum(len(player.build_orders) for player in board.players)
+        print(f"\n{fixture_name}: {len(board.units)} units, {ordered} non-hold orders, {builds} builds")
+        for stage in _get_stages(board):
+            report(fixture_name, stage)
+        size = len(Mapper(board).draw_moves_map(board.phase, None).getbuffer())
+        print(f"{fixture_name}: moves map is {size / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
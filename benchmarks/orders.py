@@ -0,0 +1,147 @@
+"""
+Measures how many orders per second bot.parse_order turns into unit orders, for realistic order messages of 40 units,
+with the LALR parser the bot uses and with the Earley parser over the grammar it replaced, orders_baseline.ebnf. The
+baseline is the reference: wherever it reads a message, the bot must give every unit the same order. Messages only the
+bot reads are counted, but allowed.
+
+Known differences:
+- "supports-holds" and the like are read as one keyword, where the baseline rejects them
+- a name with a keyword as one of its later words, such as "gulf of s" or "cape stand", is always read as the name,
+  where the baseline often tries to read the keyword and fails
+- a location whose name starts with the whole name of another is read as the longer one, so with locations called
+  "sea" and "sea to", "sea to paris" is the order of a unit in "sea to"; the baseline may read either
+Both reject two keywords in a row, such as "paris move to brest".
+
+Run from the repository root: python -m benchmarks.orders [--messages N] [--units N]
+"""
+
+import argparse
+import random
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from lark import Lark
+
+from bot import parse_order
+from diplomacy.map_parser.vector.vector import get_parser
+from diplomacy.persistence.board import Board
+from diplomacy.persistence.unit import Unit, UnitType
+
+
+def _name(unit: Unit) -> str:
+    return unit.location().name.lower()
+
+
+def _order_line(unit: Unit, rng: random.Random) -> str:
+    """A line ordering unit the way players write them, with a mix of order types and keywords"""
+    descriptor = rng.choice(["", "a " if unit.unit_type == UnitType.ARMY else "f "])
+    neighbours = sorted(unit.province.adjacent, key=lambda province: province.name)
+    units_nearby = [province.unit for province in neighbours if province.unit is not None]
+    kind = rng.random()
+    if kind < 0.3 or not neighbours:
+        return f"{descriptor}{_name(unit)} {rng.choice(['h', 'hold', 'holds'])}"
+    if kind < 0.7 or not units_nearby:
+        destination = rng.choice(neighbours)
+        if destination.coasts and unit.unit_type == UnitType.FLEET:
+            destination = rng.choice(sorted(destination.coasts, key=lambda coast: coast.name))
+        return f"{descriptor}{_name(unit)} {rng.choice(['-', '->', 'to', 'move'])} {destination.name.lower()}"
+    supported = rng.choice(units_nearby)
+    if kind < 0.85:
+        return f"{descriptor}{_name(unit)} {rng.choice(['s', 'support', 'supports'])} {_name(supported)}"
+    supported_neighbours = sorted(supported.province.adjacent, key=lambda province: province.name)
+    if not supported_neighbours:
+        return f"{descriptor}{_name(unit)} s {_name(supported)} h"
+    return f"{descriptor}{_name(unit)} s {_name(supported)} - {rng.choice(supported_neighbours).name.lower()}"
+
+
+def _messages(board: Board, count: int, units: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    all_units = sorted(board.units, key=_name)
+    messages = []
+    for _ in range(count):
+        lines = [_order_line(unit, rng) for unit in rng.sample(all_units, min(units, len(all_units)))]
+        messages.append(".order\n" + "\n".join(lines))
+    return messages
+
+
+class _BaselineTreeToOrder(parse_order.TreeToOrder):
+    def province(self, s):
+        # the baseline grammar keeps the whitespace between the words of a name
+        return super().province(s[::2])
+
+
+def _parse(message: str, board: Board) -> set[Unit]:
+    cmd = parse_order._get_parser().parse(
+        parse_order._join_location_names(message.lower(), board) + "\n", start="movement_phase"
+    )
+    return parse_order.TreeToOrder(board, None).transform(cmd)
+
+
+def _parse_baseline(parser: Lark, message: str, board: Board) -> set[Unit]:
+    return _BaselineTreeToOrder(board, None).transform(parser.parse(message.lower() + "\n", start="movement_phase"))
+
+
+def _run(parse: Callable[[str], set[Unit]], messages: list[str]) -> tuple[float, list[dict[str, str] | str]]:
+    """
+    :return: seconds taken to parse and transform every message, and the order each message gave each unit, or the
+        error it failed with
+    """
+    results = []
+    elapsed = 0.0
+    for message in messages:
+        start = time.perf_counter()
+        try:
+            units = parse(message)
+            results.append({_name(unit): str(unit.order) for unit in units})
+        except Exception as error:
+            results.append(f"{type(error).__name__}: {error}")
+        elapsed += time.perf_counter() - start
+    return elapsed, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50, help="order messages to parse (default 50)")
+    parser.add_argument("--units", type=int, default=40, help="units ordered per message (default 40)")
+    args = parser.parse_args()
+
+    board = get_parser().parse()
+    messages = _messages(board, args.messages, args.units)
+    orders = sum(message.count("\n") for message in messages)
+
+    with open(Path(__file__).parent / "orders_baseline.ebnf", "r") as f:
+        ebnf = f.read()
+    baseline = Lark(ebnf, start=["movement_phase", "retreat_phase"], parser="earley")
+
+    start = time.perf_counter()
+    parse_order._get_parser()
+    print(f"lalr: parser ready in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    lalr_time, lalr_results = _run(lambda message: _parse(message, board), messages)
+    baseline_time, baseline_results = _run(lambda message: _parse_baseline(baseline, message, board), messages)
+    for name, elapsed in [("lalr", lalr_time), ("baseline", baseline_time)]:
+        print(f"{name}: {orders} orders in {elapsed * 1000:.1f} ms, {orders / elapsed:.0f} orders/s")
+
+    # messages that fail are compared by whether they fail, not by the error
+    mismatched = [
+        i
+        for i, (lalr_result, baseline_result) in enumerate(zip(lalr_results, baseline_results))
+        if not isinstance(baseline_result, str) and lalr_result != baseline_result
+    ]
+    if mismatched:
+        example = mismatched[0]
+        raise SystemExit(
+            f"LALR and the baseline disagree on {len(mismatched)} messages, e.g.:\n{messages[example]}\n"
+            f"LALR: {lalr_results[example]}\nbaseline: {baseline_results[example]}"
+        )
+    failed = sum(isinstance(result, str) for result in lalr_results)
+    only_lalr = sum(isinstance(result, str) for result in baseline_results) - failed
+    print(
+        f"lalr gives the baseline's orders for all {len(messages)} messages; {failed} fail on both, and {only_lalr} "
+        "are only read by lalr"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Compares saving every province every phase with saving keyframes and the provinces that changed in between, on a copy
+of a database such as production's: how big the database is, and how long the provinces of the latest phase of every
+board and of every phase take to read. Also checks that every phase reads back with the same provinces both ways, and
+exits with an error if not. Phases saved since snapshots have no province rows, so only those saved before are compared.
+
+The database given is only read. Run from the repository root:
+python -m benchmarks.province_deltas [db_file] [--interval N]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from diplomacy.persistence.db import database, migrations
+
+# phases between keyframes, as SQL/9-DeltaEncodeProvinces.sql saved them
+_keyframe_interval = 10
+
+# owner, core and half core ids of each province id, for each (board_id, phase_ordinal)
+_ProvinceIds = dict[tuple[int, int], dict[int, tuple]]
+# the same by name
+_ProvinceNames = dict[tuple[int, int], dict[str, tuple]]
+
+
+def _read_ids(connection: sqlite3.Connection) -> tuple[list[tuple[int, int]], _ProvinceIds]:
+    """:return: every phase, oldest first within each board, and the provinces in each"""
+    phases = connection.execute(
+        "SELECT board_id, phase_ordinal, is_keyframe FROM boards ORDER BY board_id, phase_ordinal"
+    ).fetchall()
+    rows: _ProvinceIds = {}
+    for board_id, phase_ordinal, province_id, *state in connection.execute("SELECT * FROM provinces"):
+        rows.setdefault((board_id, phase_ordinal), {})[province_id] = tuple(state)
+
+    provinces: _ProvinceIds = {}
+    previous: dict[int, tuple] = {}
+    previous_board_id = None
+    for board_id, phase_ordinal, is_keyframe in phases:
+        if is_keyframe or board_id != previous_board_id:
+            previous = {}
+        previous = provinces[(board_id, phase_ordinal)] = {**previous, **rows.get((board_id, phase_ordinal), {})}
+        previous_board_id = board_id
+    return [(board_id, phase_ordinal) for board_id, phase_ordinal, _ in phases], provinces
+
+
+def _write_ids(
+    connection: sqlite3.Connection, phases: list[tuple[int, int]], provinces: _ProvinceIds, interval: int
+) -> None:
+    """Replaces the provinces saved with keyframes every interval phases of a board and the changes in between"""
+    connection.execute("DELETE FROM provinces")
+    keyframes = []
+    rows = []
+    previous: dict[int, tuple] = {}
+    phase_number = 0
+    for i, (board_id, phase_ordinal) in enumerate(phases):
+        phase_number = phase_number + 1 if i and phases[i - 1][0] == board_id else 0
+        is_keyframe = phase_number % interval == 0
+        keyframes.append((is_keyframe, board_id, phase_ordinal))
+        state = provinces[(board_id, phase_ordinal)]
+        rows += [
+            (board_id, phase_ordinal, province_id, *province_state)
+            for province_id, province_state in state.items()
+            if is_keyframe or previous.get(province_id) != province_state
+        ]
+        previous = state
+    connection.executemany("UPDATE boards SET is_keyframe=? WHERE board_id=? AND phase_ordinal=?", keyframes)
+    connection.executemany("INSERT INTO provinces VALUES (?, ?, ?, ?, ?, ?)", rows)
+    connection.commit()
+    connection.execute("VACUUM")
+
+
+def _read_names(connection: sqlite3.Connection, board_keys: list[tuple[int, int]]) -> _ProvinceNames:
+    """:return: the provinces of each phase as the bot reads them"""
+    provinces: _ProvinceNames = {board_key: {} for board_key in board_keys}
+    for i in range(0, len(board_keys), database._board_keys_per_query):
+        chunk = board_keys[i : i + database._board_keys_per_query]
+        wanted = f"WITH wanted(board_id, phase_ordinal) AS (VALUES {', '.join(['(?, ?)'] * len(chunk))}) "
+        for board_id, phase_ordinal, province_name, *state in connection.execute(
+            wanted + database._province_history_sql, [value for board_key in chunk for value in board_key]
+        ):
+            # rows are oldest first, so the last one for a province is its state in the phase
+            provinces[(board_id, phase_ordinal)][province_name] = tuple(state)
+    return provinces
+
+
+def _time_read(
+    connection: sqlite3.Connection, board_keys: list[tuple[int, int]], repeats: int
+) -> tuple[float, _ProvinceNames]:
+    """:return: the fastest time in seconds to read the provinces of board_keys, and what was read"""
+    best = float("inf")
+    provinces: _ProvinceNames = {}
+    for _ in range(repeats):
+        start = time.perf_counter()
+        provinces = _read_names(connection, board_keys)
+        best = min(best, time.perf_counter() - start)
+    return best, provinces
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("db_file", nargs="?", default=database.SQL_FILE_PATH, help="database to copy")
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=_keyframe_interval,
+        help=f"phases between keyframes (default {_keyframe_interval})",
+    )
+    parser.add_argument("--repeats", type=int, default=5, help="times to time each read, keeping the fastest")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = sqlite3.connect(f"file:{args.db_file}?mode=ro", uri=True)
+        copy = sqlite3.connect(os.path.join(directory, "copy.sqlite"))
+        source.backup(copy)
+        source.close()
+        start = time.perf_counter()
+        migrations.migrate(copy)
+        print(f"migrating the copy took {time.perf_counter() - start:.2f} s")
+        phases, provinces = _read_ids(copy)
+        latest_phases = [
+            (board_id, phase_ordinal) for board_id, _, phase_ordinal, _ in copy.execute(database._latest_boards_sql)
+        ]
+        print(f"{len(latest_phases)} boards, {len(phases)} phases")
+
+        results = {}
+        for name, interval in [("every province", 1), (f"keyframes every {args.interval}", args.interval)]:
+            connection = sqlite3.connect(os.path.join(directory, f"{interval}.sqlite"))
+            copy.backup(connection)
+            _write_ids(connection, phases, provinces, interval)
+            (page_count,) = connection.execute("PRAGMA page_count").fetchone()
+            (page_size,) = connection.execute("PRAGMA page_size").fetchone()
+            (rows,) = connection.execute("SELECT COUNT(*) FROM provinces").fetchone()
+            latest_time, _ = _time_read(connection, latest_phases, args.repeats)
+            every_time, results[name] = _time_read(connection, phases, args.repeats)
+            connection.close()
+            print(
+                f"{name:>20}: {page_count * page_size / 2**20:8.2f} MiB, {rows:9} province rows; reading the "
+                f"latest phases {latest_time * 1000:8.1f} ms, every phase {every_time * 1000:8.1f} ms"
+            )
+        copy.close()
+
+    full, deltas = results.values()
+    different = [key for key in phases if full[key] != deltas[key]]
+    if different:
+        print(f"{len(different)} phases read back differently, such as {different[:5]}")
+        sys.exit(1)
+    print("every phase reads back the same")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Checks with EXPLAIN QUERY PLAN that none of the bot's frequent queries reads a whole table, on a new database made by the
+migration runner. Exits with an error listing the query plans that scan a table, so it can be run in CI.
+
+Run from the repository root: python -m benchmarks.query_plans
+"""
+
+import re
+import sqlite3
+import sys
+
+from diplomacy.persistence.db import database, migrations
+
+
+def _bind(sql: str, **values) -> str:
+    """:return: sql with each named parameter :name replaced by values[name], written as SQL"""
+    return re.sub(r":(\w+)", lambda match: str(values[match.group(1)]), sql)
+
+
+_tables: list[str] = [
+    "boards",
+    "locations",
+    "players",
+    "provinces",
+    "retreat_options",
+    "units",
+    "builds",
+    "snapshots",
+    "events",
+]
+
+_wanted = "WITH wanted(board_id, phase_ordinal) AS (VALUES (1, 8210), (2, 8210)) "
+_board = {"variant": "'assets/imperial_diplomacy.svg'", "board_id": 1, "phase_ordinal": 8210}
+
+# each query as the bot runs it, with any values for its parameters
+_queries: list[str] = [
+    database._latest_boards_sql,
+    "SELECT phase, phase_ordinal, fish FROM boards WHERE board_id=1 ORDER BY phase_ordinal DESC LIMIT 1",
+    "SELECT * FROM boards WHERE board_id=1 and phase_ordinal=8210",
+    "UPDATE boards SET fish=1 WHERE board_id=1 AND phase_ordinal=8210",
+    "SELECT board_id, player_name, color FROM players WHERE board_id IN (1, 2)",
+    _wanted + database._province_history_sql,
+    *[_wanted + sql for sql in database._board_rows_sql.values()],
+    _wanted + database._board_snapshot_sql,
+    _wanted + database._board_events_sql,
+    "SELECT location_id, name FROM locations WHERE variant='assets/imperial_diplomacy.svg'",
+    "SELECT player_id, player_name FROM players WHERE board_id=1",
+    _bind(database._save_snapshot_sql, **_board, version=1, data="x'00'"),
+    _bind(database._save_event_sql, **_board, created_at=0, kind="'edit'", data="'{}'"),
+    "SELECT data, last_event_id FROM snapshots WHERE board_id=1 AND phase_ordinal=8210 AND version=1",
+    "SELECT COUNT(*) FROM events WHERE board_id=1 AND phase_ordinal=8210 AND event_id>5",
+    "SELECT data FROM events WHERE board_id=1 AND phase_ordinal=8210 AND event_id>5 ORDER BY event_id",
+    _bind(database._save_location_sql, variant="'assets/imperial_diplomacy.svg'", name="'Rome'"),
+    "INSERT INTO boards (board_id, phase, phase_ordinal, map_file, fish) VALUES (1, '1642 Spring Moves', 8210, '', 0)",
+    "DELETE FROM units WHERE board_id=1 AND phase_ordinal=8210",
+    "UPDATE events SET phase_ordinal=8211 WHERE board_id=1 AND phase_ordinal=8210",
+]
+
+
+def _scans(plan: list[tuple]) -> list[str]:
+    """:return: the steps of the plan that read every row of one of the bot's tables"""
+    steps = [row[-1] for row in plan]
+    # a covering index is still read whole by a SCAN, but SEARCH only reads the rows it needs
+    return [step for step in steps if step.startswith("SCAN ") and step.split()[1] in _tables]
+
+
+def main() -> None:
+    connection = sqlite3.connect(":memory:")
+    migrations.migrate(connection)
+
+    failed = False
+    for query in _queries:
+        plan = connection.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+        scans = _scans(plan)
+        if scans:
+            failed = True
+            print(f"FULL SCAN: {' '.join(query.split())}")
+            for step in scans:
+                print(f"    {step}")
+    if failed:
+        sys.exit(1)
+    print(f"none of the {len(_queries)} queries reads a whole table")
+
+
+if __name__ == "__main__":
+    main()
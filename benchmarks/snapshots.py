@@ -0,0 +1,125 @@
+"""
+Compares loading boards from the row tables with loading them from snapshots, on a copy of a database such as
+production's: snapshots are made from the rows of the latest phase of every board saved before snapshots, and then
+those boards are read both ways. Also checks that every board reads back the same both ways, and exits with an error
+if not.
+
+The database given is only read. Run from the repository root:
+python -m benchmarks.snapshots [db_file]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from diplomacy.persistence.db import database, migrations, snapshot
+from diplomacy.persistence.db.rows import BoardRows
+
+
+def _make_snapshots(connection: sqlite3.Connection, board_keys: list[tuple[int, int]]) -> None:
+    """Saves a snapshot of each (board_id, phase_ordinal) from its rows"""
+    cursor = connection.cursor()
+    board_rows = database._DatabaseConnection._get_board_rows(board_keys, cursor)
+    variants = dict(cursor.execute("SELECT board_id, map_file FROM boards"))
+    location_ids: dict[str, dict[str, int]] = {}
+    for location_id, variant, name in cursor.execute("SELECT location_id, variant, name FROM locations"):
+        location_ids.setdefault(variant, {})[name] = location_id
+    player_ids: dict[int, dict[str, int]] = {}
+    for player_id, board_id, player_name in cursor.execute("SELECT player_id, board_id, player_name FROM players"):
+        player_ids.setdefault(board_id, {})[player_name.lower()] = player_id
+
+    snapshots = []
+    for (board_id, phase_ordinal), rows in board_rows.items():
+        provinces = list({province[0]: province for province in rows.provinces}.values())
+        data = snapshot.encode(
+            provinces,
+            rows.units,
+            rows.retreat_options,
+            rows.builds,
+            location_ids.get(variants[board_id], {}),
+            player_ids.get(board_id, {}),
+        )
+        snapshots.append((board_id, phase_ordinal, snapshot.VERSION, data))
+    cursor.executemany(
+        "INSERT OR REPLACE INTO snapshots (board_id, phase_ordinal, version, data) VALUES (?, ?, ?, ?)", snapshots
+    )
+    connection.commit()
+    cursor.close()
+
+
+def _booleans(row: tuple) -> tuple:
+    # SQLite gives booleans back as 0 and 1
+    return tuple(bool(value) if isinstance(value, int) else value for value in row)
+
+
+def _normalized(rows: BoardRows) -> tuple:
+    """:return: the rows of a board in an order and form that doesn't depend on how they were read"""
+    # only a dislodged unit has retreat options
+    dislodged = {location for location, is_dislodged, *_ in rows.units if is_dislodged}
+    return (
+        sorted(rows.players),
+        sorted({province[0]: province for province in rows.provinces}.values(), key=str),
+        sorted(map(_booleans, rows.units), key=str),
+        sorted(option for option in rows.retreat_options if option[0] in dislodged),
+        sorted(map(_booleans, rows.builds), key=str),
+    )
+
+
+def _time_read(
+    connection: sqlite3.Connection, board_keys: list[tuple[int, int]], repeats: int
+) -> tuple[float, dict[tuple[int, int], BoardRows]]:
+    """:return: the fastest time in seconds to read the rows of board_keys, and what was read"""
+    best = float("inf")
+    board_rows = {}
+    for _ in range(repeats):
+        start = time.perf_counter()
+        board_rows = database._DatabaseConnection._get_board_rows(board_keys, connection.cursor())
+        best = min(best, time.perf_counter() - start)
+    return best, board_rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("db_file", nargs="?", default=database.SQL_FILE_PATH, help="database to copy")
+    parser.add_argument("--repeats", type=int, default=5, help="times to time each read, keeping the fastest")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = sqlite3.connect(f"file:{args.db_file}?mode=ro", uri=True)
+        connection = sqlite3.connect(os.path.join(directory, "copy.sqlite"))
+        source.backup(connection)
+        source.close()
+        migrations.migrate(connection)
+        # phases saved since snapshots have no rows
+        snapshot_keys = set(connection.execute("SELECT board_id, phase_ordinal FROM snapshots"))
+        board_keys = [
+            (board_id, phase_ordinal)
+            for board_id, _, phase_ordinal, _ in connection.execute(database._latest_boards_sql)
+            if (board_id, phase_ordinal) not in snapshot_keys
+        ]
+        print(f"{len(board_keys)} boards")
+
+        rows_time, from_rows = _time_read(connection, board_keys, args.repeats)
+        _make_snapshots(connection, board_keys)
+        (size,) = connection.execute("SELECT SUM(LENGTH(data)) FROM snapshots").fetchone()
+        snapshots_time, from_snapshots = _time_read(connection, board_keys, args.repeats)
+        connection.close()
+
+    print(f"{'rows':>10}: {rows_time * 1000:8.1f} ms")
+    print(f"{'snapshots':>10}: {snapshots_time * 1000:8.1f} ms, {(size or 0) / 2**10:.1f} KiB of snapshots")
+    different = [
+        board_key
+        for board_key in board_keys
+        if _normalized(from_rows[board_key]) != _normalized(from_snapshots[board_key])
+    ]
+    if different:
+        print(f"{len(different)} boards read back differently, such as {different[:5]}")
+        sys.exit(1)
+    print("every board reads back the same")
+
+
+if __name__ == "__main__":
+    main()
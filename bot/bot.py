@@ -1,11 +1,15 @@
+import asyncio
+import io
 import logging
 import os
-from typing import Callable
+import threading
+from typing import Callable, TypeVar
 
 import discord
 from discord.ext import commands
 
 from bot import command
+from bot.command_queue import get_command_queue
 from diplomacy.persistence.manager import Manager
 
 intents = discord.Intents.default()
@@ -13,7 +17,26 @@ intents.message_content = True
 bot = commands.Bot(command_prefix=".", intents=intents)
 logger = logging.getLogger(__name__)
 
-manager = Manager()
+_Response = TypeVar("_Response")
+
+_manager: Manager | None = None
+_manager_lock = threading.Lock()
+
+
+# making the manager opens and migrates the database, while boards are only loaded as commands need them; commands run
+# on worker threads, so the first few may ask for it at once
+def get_manager() -> Manager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = Manager()
+        return _manager
+
+
+@bot.event
+async def on_ready():
+    # open the database now on a thread, rather than on the event loop when the first command asks for the manager
+    await asyncio.to_thread(get_manager)
 
 
 @bot.before_invoke
@@ -50,11 +73,24 @@ async def on_command_error(ctx, error):
         await ctx.send(error)
 
 
+async def _run_command(
+    function: Callable[[commands.Context, Manager], _Response],
+    ctx: discord.ext.commands.Context,
+    exclusive: bool = True,
+) -> _Response:
+    # commands that only read the game (exclusive=False) can run alongside each other in the same server
+    manager = get_manager()
+    return await get_command_queue().run(
+        ctx.guild.id, manager.get_lock(ctx.guild.id), exclusive, ctx.command.name, function, ctx, manager
+    )
+
+
 async def _handle_command(
-    function: Callable[[commands.Context, Manager], tuple[str, str | None]],
+    function: Callable[[commands.Context, Manager], tuple[str, io.BytesIO | None]],
     ctx: discord.ext.commands.Context,
+    exclusive: bool = True,
 ) -> None:
-    response, file_name = function(ctx, manager)
+    response, svg = await _run_command(function, ctx, exclusive)
     logger.debug(
         f"[{ctx.guild.name}][#{ctx.channel.name}]({ctx.message.author.name}) - '{ctx.message.content}' -> \n{response}"
     )
@@ -65,15 +101,15 @@ async def _handle_command(
             cutoff = 2000
         await ctx.channel.send(response[:cutoff].strip())
         response = response[cutoff:].strip()
-    if file_name is not None:
-        await ctx.channel.send(response, file=discord.File(file_name))
+    if svg is not None:
+        await ctx.channel.send(response, file=discord.File(svg, filename=svg.name))
     else:
         await ctx.channel.send(response)
 
 
 @bot.command(help="Checks bot listens and responds.")
 async def ping(ctx: discord.ext.commands.Context) -> None:
-    await _handle_command(command.ping, ctx)
+    await _handle_command(command.ping, ctx, exclusive=False)
 
 
 @bot.command(hidden=True)
@@ -87,14 +123,22 @@ async def fish(ctx: discord.ext.commands.Context) -> None:
     await _handle_command(command.fish, ctx)
 
 
+@bot.command(hidden=True)
+async def queue_stats(ctx: discord.ext.commands.Context) -> None:
+    # answered straight away rather than queued, so it works while the queue is busy
+    await ctx.channel.send(get_command_queue().stats())
+
+
 @bot.command(hidden=True)
 async def botsay(ctx: discord.ext.commands.Context) -> None:
-    await command.botsay(ctx, manager)
+    await command.botsay(ctx, get_manager())
 
 
 @bot.command(hidden=True)
 async def announce(ctx: discord.ext.commands.Context) -> None:
-    await command.announce(ctx, {bot.get_guild(server_id) for server_id in manager.list_servers()})
+    # the servers are read from the database, so not on the event loop
+    server_ids = await asyncio.to_thread(get_manager().list_servers)
+    await command.announce(ctx, {bot.get_guild(server_id) for server_id in server_ids})
 
 
 @bot.command(
@@ -122,11 +166,17 @@ async def remove_order(ctx: discord.ext.commands.Context) -> None:
 
 @bot.command(
     brief="Outputs your current submitted orders.",
-    description="Outputs your current submitted orders. "
-    "In the future we will support outputting a sample moves map of your orders.",
+    description="Outputs your current submitted orders and a moves map of them.",
 )
 async def view_orders(ctx: discord.ext.commands.Context) -> None:
-    await _handle_command(command.view_orders, ctx)
+    await _handle_command(command.view_orders, ctx, exclusive=False)
+
+
+@bot.command(brief="Sends each player a moves map of their current orders in their orders channel.")
+async def send_order_previews(ctx: discord.ext.commands.Context) -> None:
+    # the maps are drawn and matched to channels on the command queue, and only sent from here
+    previews = await _run_command(command.get_order_previews, ctx, exclusive=False)
+    await command.send_order_previews(ctx, previews)
 
 
 @bot.command(brief="Adjudicates the game and outputs the moves and results maps.")
@@ -146,7 +196,7 @@ async def reload(ctx: discord.ext.commands.Context) -> None:
 
 @bot.command(brief="Outputs the scoreboard.", description="Outputs the scoreboard.")
 async def scoreboard(ctx: discord.ext.commands.Context) -> None:
-    await _handle_command(command.get_scoreboard, ctx)
+    await _handle_command(command.get_scoreboard, ctx, exclusive=False)
 
 
 @bot.command(
@@ -191,12 +241,12 @@ async def unlock_orders(ctx: discord.ext.commands.Context) -> None:
 
 @bot.command(brief="outputs information about the current game")
 async def info(ctx: discord.ext.commands.Context) -> None:
-    await _handle_command(command.info, ctx)
+    await _handle_command(command.info, ctx, exclusive=False)
 
 
 @bot.command(brief="outputs information about a specific province")
 async def province_info(ctx: discord.ext.commands.Context) -> None:
-    await _handle_command(command.province_info, ctx)
+    await _handle_command(command.province_info, ctx, exclusive=False)
 
 
 @bot.command(
@@ -1,15 +1,15 @@
+import io
 import itertools
 import logging
 import random
 
-from discord import Guild
+from discord import File, Guild
 from discord.ext import commands
 
 import bot.perms as perms
 from bot.parse_edit_state import parse_edit_state
 from bot.parse_order import parse_order, parse_remove_order
-from bot.utils import is_gm_channel, get_orders, is_admin
-from diplomacy.persistence.db.database import get_connection
+from bot.utils import is_gm_channel, get_orders, is_admin, get_player_by_channel, get_save_error
 from diplomacy.persistence.manager import Manager
 from diplomacy.persistence.player import Player
 
@@ -22,7 +22,7 @@ ping_text_choices = [
 ]
 
 
-def ping(ctx: commands.Context, _: Manager) -> tuple[str, str | None]:
+def ping(ctx: commands.Context, _: Manager) -> tuple[str, io.BytesIO | None]:
     response = "Beep Boop"
     if random.random() < 0.1:
         author = ctx.message.author
@@ -36,7 +36,7 @@ def ping(ctx: commands.Context, _: Manager) -> tuple[str, str | None]:
     return response, None
 
 
-def bumble(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+def bumble(ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
     word_of_bumble = random.choice(["".join(perm) for perm in itertools.permutations("bumble")])
     if word_of_bumble == "bumble":
         word_of_bumble = "You are the chosen bumble"
@@ -48,7 +48,7 @@ def bumble(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
     return f"**{word_of_bumble}**", None
 
 
-def fish(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+def fish(ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
     board = manager.get_board(ctx.guild.id)
     fish_num = random.randrange(0, 20)
     if 0 == fish_num:
@@ -84,10 +84,7 @@ def fish(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
         fish_message = f"Accidentally let {fish_num} captured fish sneak away :("
     fish_message += f"\nIn total, {board.fish} fish have been caught!"
     if random.randrange(0, 5) == 0:
-        get_connection().execute_arbitrary_sql(
-            """UPDATE boards SET fish=? WHERE board_id=? AND phase=?""",
-            (board.fish, board.board_id, board.get_phase_and_year_string()),
-        )
+        manager.storage.save_fish(board)
     return fish_message, None
 
 
@@ -122,27 +119,27 @@ async def announce(ctx: commands.Context, servers: set[Guild | None]) -> None:
 
 
 @perms.player("order")
-def order(player: Player | None, ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+def order(player: Player | None, ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
     board = manager.get_board(ctx.guild.id)
 
     if player and not board.orders_enabled:
         return "Orders locked! If you think this is an error, contact a GM.", None
 
-    return parse_order(ctx.message.content, player, board), None
+    return parse_order(ctx.message.content, player, board, manager.storage), None
 
 
 @perms.player("remove orders")
-def remove_order(player: Player | None, ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+def remove_order(player: Player | None, ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
     board = manager.get_board(ctx.guild.id)
 
     if player and not board.orders_enabled:
         return "Orders locked! If you think this is an error, contact a GM.", None
 
-    return parse_remove_order(ctx.message.content, player, board), None
+    return parse_remove_order(ctx.message.content, player, board, manager.storage), None
 
 
 @perms.player("view orders")
-def view_orders(player: Player | None, ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+def view_orders(player: Player | None, ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
     try:
         order_text = get_orders(manager.get_board(ctx.guild.id), player)
     except RuntimeError as err:
@@ -150,46 +147,73 @@ def view_orders(player: Player | None, ctx: commands.Context, manager: Manager)
         order_text = "view_orders text failed"
     if player is None:
         try:
-            file_name = manager.draw_moves_map(ctx.guild.id, None)
+            moves_map = manager.draw_moves_map(ctx.guild.id, None)
         except Exception as err:
             logger.error(f"View_orders map failed in game with id: {ctx.guild.id}", exc_info=err)
-            file_name = None
-        return order_text, file_name
+            moves_map = None
+        return order_text, moves_map
 
     else:
-        # file_name = manager.draw_moves_map(ctx.guild.id, player)
-        return order_text, None
+        try:
+            moves_map = manager.draw_moves_map(ctx.guild.id, player)
+        except Exception as err:
+            logger.error(f"View_orders map failed in game with id: {ctx.guild.id}", exc_info=err)
+            moves_map = None
+        return order_text, moves_map
+
+
+@perms.gm("send order previews")
+def get_order_previews(ctx: commands.Context, manager: Manager) -> list[tuple[str, io.BytesIO]]:
+    """:return: the name of each player's orders channel, with a moves map of their orders"""
+    moves_maps = manager.draw_player_moves_maps(ctx.guild.id)
+    moves_maps_by_name = {player.name.lower(): moves_map for player, moves_map in moves_maps.items()}
+    previews = []
+    for channel in ctx.guild.text_channels:
+        if channel.category is None:
+            continue
+        player = get_player_by_channel(channel, manager, ctx.guild.id)
+        if player is not None and player.name.lower() in moves_maps_by_name:
+            previews.append((channel.name, moves_maps_by_name[player.name.lower()]))
+    return previews
+
+
+async def send_order_previews(ctx: commands.Context, previews: list[tuple[str, io.BytesIO]]) -> None:
+    channels = {channel.name: channel for channel in ctx.guild.text_channels if channel.category is not None}
+    for channel_name, moves_map in previews:
+        await channels[channel_name].send("Your current orders:", file=File(moves_map, filename=moves_map.name))
+    await ctx.channel.send(f"Sent order previews to {len(previews)} players")
 
 
 @perms.gm("adjudicate")
-def adjudicate(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
-    svg_file_name = manager.adjudicate(ctx.guild.id)
-    return "Adjudication completed successfully.", svg_file_name
+def adjudicate(ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
+    results_map = manager.adjudicate(ctx.guild.id)
+    return "Adjudication completed successfully.", results_map
 
 
 @perms.gm("rollback")
-def rollback(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+def rollback(ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
     return manager.rollback(ctx.guild.id)
 
 
 @perms.gm("reload")
-def reload(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+def reload(ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
     return manager.reload(ctx.guild.id)
 
 
 @perms.gm("remove all orders")
-def remove_all(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+def remove_all(ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
     board = manager.get_board(ctx.guild.id)
     for unit in board.units:
         unit.order = None
 
-    database = get_connection()
-    database.save_order_for_units(board, board.units)
+    error = get_save_error([manager.storage.save_order_for_units(board, board.units)])
+    if error is not None:
+        return f"Removed all orders, but could not save that: {error}", None
     return "Successful", None
 
 
 # @perms.gm("get scoreboard")
-def get_scoreboard(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+def get_scoreboard(ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
     board = manager.get_board(ctx.guild.id)
     response = ""
     for player in board.get_players_by_score():
@@ -198,36 +222,37 @@ def get_scoreboard(ctx: commands.Context, manager: Manager) -> tuple[str, str |
 
 
 @perms.gm("edit")
-def edit(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
-    return parse_edit_state(ctx.message.content, manager.get_board(ctx.guild.id))
+def edit(ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
+    response = parse_edit_state(ctx.message.content, manager.get_board(ctx.guild.id), manager.storage)
+    return response, manager.draw_current_map(ctx.guild.id)
 
 
 @perms.gm("create a game")
-def create_game(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+def create_game(ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
     return manager.create_game(ctx.guild.id), None
 
 
 @perms.gm("unlock orders")
-def enable_orders(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+def enable_orders(ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
     board = manager.get_board(ctx.guild.id)
     board.orders_enabled = True
     return "Successful", None
 
 
 @perms.gm("lock orders")
-def disable_orders(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+def disable_orders(ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
     board = manager.get_board(ctx.guild.id)
     board.orders_enabled = False
     return "Successful", None
 
 
-def info(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+def info(ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
     board = manager.get_board(ctx.guild.id)
     out = "Phase: " + str(board.phase) + "\nOrders are: " + ("Open" if board.orders_enabled else "Locked")
     return out, None
 
 
-def province_info(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+def province_info(ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
     board = manager.get_board(ctx.guild.id)
     province_name = ctx.message.content.removeprefix(".province_info ").strip()
     if not province_name:
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from diplomacy.persistence.server_lock import ServerLock
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# how many commands may run at once across all servers
+_workers = int(os.getenv("COMMAND_WORKERS", "4"))
+# commands that wait longer than this for their turn are logged as a warning
+_slow_wait_seconds = 5
+
+
+class CommandQueue:
+    """
+    Runs the blocking part of commands (adjudicating, parsing, saving and drawing maps) on worker threads, so the event
+    loop stays free to answer Discord's heartbeats and add reactions while they run.
+
+    Each command holds its server's lock while it runs, shared if it only reads the board and exclusive if it changes
+    it, so commands that change a board run one at a time in the order they were sent. Commands wait for the lock on
+    the event loop rather than on a worker, so a busy server can't use up the workers other servers need.
+    """
+
+    def __init__(self, workers: int = _workers):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="command")
+        # commands sent but not yet finished, by server
+        self._depths: dict[int, int] = {}
+
+        self.commands_run = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def depth(self, server_id: int | None = None) -> int:
+        """How many commands are waiting or running, in server_id or in every server"""
+        if server_id is None:
+            return sum(self._depths.values())
+        return self._depths.get(server_id, 0)
+
+    async def run(
+        self, server_id: int, lock: ServerLock, exclusive: bool, name: str, function: Callable[..., T], *args
+    ) -> T:
+        """
+        Runs function(*args) on a worker thread holding lock, after every command sent earlier in server_id that it
+        conflicts with has finished
+
+        :param exclusive: whether the command changes the server's game, rather than only reading it
+        :param name: what to call the command in the logs
+        """
+        queued_at = time.perf_counter()
+        depth = self._depths.get(server_id, 0)
+        self._depths[server_id] = depth + 1
+        try:
+            # the place in the queue is taken now, on the event loop, so it is the order the commands were sent in
+            ticket = lock.reserve(exclusive)
+            try:
+                await asyncio.shield(asyncio.wrap_future(ticket.granted))
+            except asyncio.CancelledError:
+                ticket.granted.add_done_callback(lambda _: lock.release(ticket))
+                raise
+
+            started_at = time.perf_counter()
+            work = self._executor.submit(function, *args)
+            # released when the work is done, even if this is cancelled while it runs
+            work.add_done_callback(lambda _: lock.release(ticket))
+            result = await asyncio.wrap_future(work)
+            finished_at = time.perf_counter()
+        finally:
+            self._depths[server_id] -= 1
+            if self._depths[server_id] == 0:
+                del self._depths[server_id]
+
+        wait = started_at - queued_at
+        self.commands_run += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        mode = "exclusive" if exclusive else "shared"
+        message = (
+            f"[{server_id}] {name} ({mode}) waited {wait * 1000:.0f} ms behind {depth} commands and ran in "
+            f"{(finished_at - started_at) * 1000:.0f} ms; {self.depth()} commands queued"
+        )
+        if wait > _slow_wait_seconds:
+            logger.warning(message)
+        else:
+            logger.debug(message)
+        return result
+
+    def stats(self) -> str:
+        average = self.total_wait / self.commands_run if self.commands_run else 0
+        return (
+            f"{self.depth()} commands queued in {len(self._depths)} servers; {self.commands_run} run, waiting "
+            f"{average * 1000:.0f} ms on average and {self.max_wait * 1000:.0f} ms at most"
+        )
+
+
+_command_queue: CommandQueue | None = None
+
+
+def get_command_queue() -> CommandQueue:
+    global _command_queue
+    if _command_queue:
+        return _command_queue
+    _command_queue = CommandQueue()
+    return _command_queue
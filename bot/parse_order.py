@@ -1,10 +1,13 @@
+from pathlib import Path
+
 from lark import Lark, Transformer
 
-from bot.utils import get_unit_type, get_keywords, _manage_coast_signature
+from bot.utils import get_save_error, get_unit_type
 from diplomacy.adjudicator.defs import get_base_province_from_location
 from diplomacy.persistence import order, phase
 from diplomacy.persistence.board import Board
-from diplomacy.persistence.db.database import get_connection
+from diplomacy.persistence.db.storage import Storage
+from diplomacy.persistence.name_matcher import normalize
 from diplomacy.persistence.player import Player
 from diplomacy.persistence.province import Province, Location, ProvinceType
 from diplomacy.persistence.unit import Unit, UnitType
@@ -52,8 +55,10 @@ _order_dict = {
 }
 
 
+# one is made for each message, as commands for different servers parse orders at once on different threads
 class TreeToOrder(Transformer):
-    def set_state(self, board: Board, player_restriction: Player | None):
+    def __init__(self, board: Board, player_restriction: Player | None):
+        super().__init__()
         self.board = board
         self.player_restriction = player_restriction
 
@@ -64,9 +69,7 @@ class TreeToOrder(Transformer):
         return set([x for x in statements if isinstance(x, Unit)])
 
     def province(self, s):
-        name = " ".join(s[::2]).replace("_", " ").strip()
-        name = _manage_coast_signature(name)
-        return self.board.get_location(name)
+        return self.board.get_location(" ".join(s))
 
     def unit(self, s) -> Unit:
         # ignore the fleet/army signifier, if exists
@@ -152,28 +155,70 @@ class TreeToOrder(Transformer):
         return unit
 
 
-generator = TreeToOrder()
-
-
-with open("bot/orders.ebnf", "r") as f:
-    ebnf = f.read()
-
-movement_parser = Lark(ebnf, start="movement_phase", parser="earley")
-retreats_parser = Lark(ebnf, start="retreat_phase", parser="earley")
-
-
-def parse_order(message: str, player_restriction: Player | None, board: Board) -> str:
+_parser: Lark | None = None
+
+
+# compiling the grammar is slow, so it is only done the first time an order is parsed, and Lark caches the compiled
+# parser on disk between runs
+def _get_parser() -> Lark:
+    global _parser
+    if _parser:
+        return _parser
+    with open(Path(__file__).parent / "orders.ebnf", "r") as f:
+        ebnf = f.read()
+    _parser = Lark(ebnf, start=["movement_phase", "retreat_phase"], parser="lalr", lexer="contextual", cache=True)
+    return _parser
+
+
+def _join_location_names(message: str, board: Board) -> str:
+    """
+    Joins the words of each multi-word location name in message with underscores, so that a word of one that is also a
+    keyword, such as the "s" of "gulf of s", is read as part of the name. The parser can't look ahead to see that the
+    name goes on, so it would read the keyword; the longest name the board knows is taken instead.
+    """
+    matcher = board.get_name_matcher()
+    lines = []
+    for line in message.splitlines():
+        words = line.split()
+        normalized = [normalize(word) for word in words]
+        joined = []
+        i = 0
+        while i < len(words):
+            match = matcher.match(normalized, i)
+            end = i + 1 if match is None else match[1]
+            joined.append("_".join(words[i:end]))
+            i = end
+        lines.append(" ".join(joined))
+    return "\n".join(lines)
+
+
+_not_saved_response = (
+    "The orders could not be saved, so they will be lost if the bot restarts. Please report this to a gm. Error: "
+)
+
+
+def parse_order(message: str, player_restriction: Player | None, board: Board, storage: Storage) -> str:
     invalid: list[tuple[str, Exception]] = []
     if phase.is_builds(board.phase):
+        # build orders replaced by ones in another coast of their province
+        replaced_locations: set[str] = set()
         for command in str.splitlines(message):
             try:
                 if command.strip() != ".order":
-                    _parse_player_order(get_keywords(command.lower()), player_restriction, board)
+                    replaced_location = _parse_player_order(command, player_restriction, board)
+                    if replaced_location is not None:
+                        replaced_locations.add(replaced_location)
             except Exception as error:
                 invalid.append((command, error))
 
-        database = get_connection()
-        database.save_build_orders_for_players(board, player_restriction)
+        error = get_save_error(
+            [
+                storage.delete_build_orders(board, replaced_locations),
+                storage.save_build_orders_for_players(board, player_restriction),
+            ]
+        )
+        if error is not None:
+            return _not_saved_response + str(error)
 
         if invalid:
             response = "The following orders were invalid:"
@@ -185,23 +230,23 @@ def parse_order(message: str, player_restriction: Player | None, board: Board) -
         return response
     elif phase.is_moves(board.phase) or phase.is_retreats(board.phase):
         if phase.is_moves(board.phase):
-            parser = movement_parser
+            start = "movement_phase"
         else:
-            parser = retreats_parser
+            start = "retreat_phase"
 
-        generator.set_state(board, player_restriction)
-        cmd = parser.parse(message.lower() + "\n")
-        movement = generator.transform(cmd)
+        cmd = _get_parser().parse(_join_location_names(message.lower(), board) + "\n", start=start)
+        movement = TreeToOrder(board, player_restriction).transform(cmd)
 
-        database = get_connection()
-        database.save_order_for_units(board, movement)
+        error = get_save_error([storage.save_order_for_units(board, movement)])
+        if error is not None:
+            return _not_saved_response + str(error)
 
         return "Orders validated successfully"
     else:
         return "The game is in an unknown phase. Something has gone very wrong with the bot. Please report this to a gm"
 
 
-def parse_remove_order(message: str, player_restriction: Player | None, board: Board) -> str:
+def parse_remove_order(message: str, player_restriction: Player | None, board: Board, storage: Storage) -> str:
     invalid: list[tuple[str, Exception]] = []
     commands = str.splitlines(message)
     updated_units: set[Unit] = set()
@@ -218,13 +263,14 @@ def parse_remove_order(message: str, player_restriction: Player | None, board: B
         except Exception as error:
             invalid.append((command, error))
 
-    database = get_connection()
-    database.save_order_for_units(board, list(updated_units))
-    for province in provinces_with_removed_builds:
-        database.execute_arbitrary_sql(
-            "DELETE FROM builds WHERE board_id=? and phase=? and location=?",
-            (board.board_id, board.get_phase_and_year_string(), province),
-        )
+    error = get_save_error(
+        [
+            storage.save_order_for_units(board, list(updated_units)),
+            storage.delete_build_orders(board, provinces_with_removed_builds),
+        ]
+    )
+    if error is not None:
+        return _not_saved_response + str(error)
 
     if invalid:
         response = "The following order removals were invalid:"
@@ -237,11 +283,7 @@ def parse_remove_order(message: str, player_restriction: Player | None, board: B
 
 
 def _parse_remove_order(command: str, player_restriction: Player, board: Board) -> Unit | str:
-    command = command.lower()
-    keywords: list[str] = get_keywords(command)
-    if keywords[0] == ".remove order":
-        keywords = keywords[1:]
-    location = keywords[0]
+    location = command.lower().strip().removeprefix(".remove_order").strip()
     province, coast = board.get_province_and_coast(location)
 
     if phase.is_builds(board.phase):
@@ -252,7 +294,9 @@ def _parse_remove_order(command: str, player_restriction: Player, board: Board)
                 f"{player_restriction.name} does not control the unit in {location} which belongs to {player.name}"
             )
 
-        remove_player_order_for_location(board, player, province)
+        removed_location = remove_player_order_for_location(player, province)
+        if removed_location is not None:
+            return removed_location
 
         if coast is None:
             if province.coasts:
@@ -278,18 +322,28 @@ def _parse_remove_order(command: str, player_restriction: Player, board: Board)
         raise Exception(f"You control neither the unit nor dislodged unit in province {province.name}")
 
 
-def _parse_player_order(keywords: list[str], player_restriction: Player | None, board: Board) -> Player:
-    if keywords[0] == ".order":
-        keywords = keywords[1:]
-    command = keywords[0]
-    try:
-        location = board.get_location(keywords[1])
-    except KeyError as original_error:
-        keywords[1], keywords[2] = keywords[2], keywords[1]
-        try:
-            location = board.get_location(keywords[1])
-        except KeyError:
-            raise original_error
+def _parse_player_order(command: str, player_restriction: Player | None, board: Board) -> str | None:
+    """:return: the location of the build order this one replaced, if it replaced one"""
+    words = command.lower().split()
+    if words[0] == ".order":
+        words = words[1:]
+    order_word = words[0]
+
+    # the unit type can come before or after the location, e.g. "build army new york" or "build new_york a"
+    words = normalize(" ".join(words[1:])).split()
+    unit_type = get_unit_type(words[0]) if words else None
+    start = 0 if unit_type is None else 1
+    match = board.get_name_matcher().match(words, start)
+    if match is None:
+        # raises with the closest names
+        board.get_location(" ".join(words[start:]))
+    location_name, end = match
+    if unit_type is None and end < len(words):
+        unit_type = get_unit_type(words[end])
+        end += 1
+    if end < len(words):
+        raise ValueError(f"Did not understand {' '.join(words[end:])} after {location_name}")
+    location = board.get_location(location_name)
 
     if player_restriction is not None and location.get_owner() != player_restriction:
         raise PermissionError(f"{player_restriction} does not control {location.name}")
@@ -300,34 +354,35 @@ def _parse_player_order(keywords: list[str], player_restriction: Player | None,
     if player is None:
         raise ValueError(f"{location.name} is not owned by anyone")
 
-    if command in _order_dict[_build]:
-        unit_type = get_unit_type(keywords[2])
+    if order_word in _order_dict[_build]:
+        if unit_type is None:
+            raise ValueError(f"Build in {location.name} needs a unit type, army or fleet")
         if unit_type == UnitType.FLEET:
             if isinstance(location, Province):
                 location = location.coast()
         player_order = order.Build(location, unit_type)
-        remove_player_order_for_location(board, player, location)
+        replaced_location = remove_player_order_for_location(player, location)
         player.build_orders.add(player_order)
-        return player
+        return replaced_location
 
-    if command in _order_dict[_disband]:
+    if order_word in _order_dict[_disband]:
         player_order = order.Disband(location)
-        remove_player_order_for_location(board, player, location)
+        replaced_location = remove_player_order_for_location(player, location)
         player.build_orders.add(player_order)
-        return player
+        return replaced_location
 
     raise RuntimeError("Build could not be parsed")
 
 
-def remove_player_order_for_location(board: Board, player: Player, location: Location) -> bool:
+def remove_player_order_for_location(player: Player, location: Location) -> str | None:
+    """
+    Removes player's build order in the province of location, which is left to the caller to delete from storage
+
+    :return: the location of the build order removed, or None if there wasn't one
+    """
     base_province = get_base_province_from_location(location)
     for player_order in player.build_orders:
         if get_base_province_from_location(player_order.location) == base_province:
             player.build_orders.remove(player_order)
-            database = get_connection()
-            database.execute_arbitrary_sql(
-                "DELETE FROM builds WHERE board_id=? and phase=? and location=?",
-                (board.board_id, board.get_phase_and_year_string(), player_order.location.name),
-            )
-            return True
-    return False
+            return player_order.location.name
+    return None
@@ -1,4 +1,5 @@
-from typing import Callable
+import io
+from typing import Callable, TypeVar
 
 from discord.ext import commands
 
@@ -6,13 +7,15 @@ from bot.utils import is_gm, is_gm_channel, get_player_by_role, is_player_channe
 from diplomacy.persistence.manager import Manager
 from diplomacy.persistence.player import Player
 
+_Response = TypeVar("_Response")
+
 
 # adds one extra argument, player, which is None if run by a GM
 def player(description: str = "run this command"):
     def player_check(
-        function: Callable[[Player | None, commands.Context, Manager], tuple[str, str | None]]
-    ) -> Callable[[commands.Context, Manager], tuple[str, str | None]]:
-        def f(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+        function: Callable[[Player | None, commands.Context, Manager], tuple[str, io.BytesIO | None]]
+    ) -> Callable[[commands.Context, Manager], tuple[str, io.BytesIO | None]]:
+        def f(ctx: commands.Context, manager: Manager) -> tuple[str, io.BytesIO | None]:
             player = get_player_by_role(ctx.message.author, manager, ctx.guild.id)
             if player:
                 if not is_player_channel(player.name, ctx.channel):
@@ -34,10 +37,10 @@ def player(description: str = "run this command"):
 
 def gm(description: str = "run this command"):
     def gm_check(
-        function: Callable[[commands.Context, Manager], tuple[str, str | None]]
-    ) -> Callable[[commands.Context, Manager], tuple[str, str | None]]:
+        function: Callable[[commands.Context, Manager], _Response]
+    ) -> Callable[[commands.Context, Manager], _Response]:
 
-        def f(ctx: commands.Context, manager: Manager) -> tuple[str, str | None]:
+        def f(ctx: commands.Context, manager: Manager) -> _Response:
             if not is_gm(ctx.message.author):
                 raise PermissionError(f"You cannot {description} because you are not a GM.")
 
@@ -1,3 +1,6 @@
+from collections.abc import Iterable
+from concurrent.futures import Future
+
 from discord.ext import commands
 
 from bot import config
@@ -12,18 +15,6 @@ whitespace_dict = {
     "_",
 }
 
-_north_coast = "nc"
-_south_coast = "sc"
-_east_coast = "ec"
-_west_coast = "wc"
-
-coast_dict = {
-    _north_coast: ["nc", "north coast", "(nc)"],
-    _south_coast: ["sc", "south coast", "(sc)"],
-    _east_coast: ["ec", "east coast", "(ec)"],
-    _west_coast: ["wc", "west coast", "(wc)"],
-}
-
 _army = "army"
 _fleet = "fleet"
 
@@ -91,25 +82,10 @@ def get_keywords(command: str) -> list[str]:
             if keywords[i][j] in whitespace_dict:
                 keywords[i] = keywords[i][:j] + " " + keywords[i][j + 1 :]
 
-    for i in range(len(keywords)):
-        keywords[i] = _manage_coast_signature(keywords[i])
-
+    # coasts however they are written (e.g. "spain (nc)") are matched by the board's NameMatcher
     return keywords
 
 
-def _manage_coast_signature(keyword: str) -> str:
-    for coast_key, coast_val in coast_dict.items():
-        # we want to make sure this was a separate word like "zapotec ec" and not part of a word like "zapotec"
-        suffix = f" {coast_val}"
-        if keyword.endswith(suffix):
-            # remove the suffix
-            keyword = keyword[: len(keyword) - len(suffix)]
-            # replace the suffix with the one we expect
-            new_suffix = f" {coast_key}"
-            keyword += f" {new_suffix}"
-    return keyword
-
-
 def get_unit_type(command: str) -> UnitType | None:
     if command in unit_dict[_army]:
         return UnitType.ARMY
@@ -118,6 +94,15 @@ def get_unit_type(command: str) -> UnitType | None:
     return None
 
 
+def get_save_error(saves: Iterable[Future[None]]) -> Exception | None:
+    """Waits for writes to the storage, which commit within a few milliseconds, and returns the first that failed"""
+    for save in saves:
+        error = save.exception()
+        if error is not None:
+            return error
+    return None
+
+
 def get_orders(board: Board, player_restriction: Player | None) -> str:
     if phase.is_builds(board.phase):
         response = "Received orders:"
@@ -1,6 +1,7 @@
 import abc
 import collections
 import logging
+from typing import Callable
 
 from diplomacy.adjudicator.defs import (
     ResolutionState,
@@ -60,6 +61,27 @@ def get_source_province_from_unit(unit: Unit) -> Province:
     return unit.province
 
 
+def can_convoy(province: Province, start: Province, end: Location, check_fleet_orders=False) -> bool:
+    """
+    :param province: Province that a convoy from start to end could pass through
+    :param check_fleet_orders: if True, check that the fleet there is actually convoying from start to end
+    :return: True if there is a fleet at sea in province that can carry the convoy
+    """
+    if province.type != ProvinceType.SEA:
+        return False
+    if province.unit is None or province.unit.unit_type != UnitType.FLEET:
+        return False
+    if check_fleet_orders:
+        fleet_order = province.unit.order
+        if fleet_order is None:
+            return False
+        if not isinstance(fleet_order, ConvoyTransport):
+            return False
+        if fleet_order.source.province is not start or fleet_order.destination is not end:
+            return False
+    return True
+
+
 def convoy_is_possible(start: Province, end: Province, check_fleet_orders=False) -> bool:
     """
     Breadth-first search to figure out if start -> end is possible passing over fleets
@@ -82,23 +104,55 @@ def convoy_is_possible(start: Province, end: Province, check_fleet_orders=False)
         for adjacent_province in current.adjacent:
             if adjacent_province == end:
                 return True
-            if adjacent_province.type != ProvinceType.SEA:
-                continue
-            if adjacent_province.unit is None or adjacent_province.unit.unit_type != UnitType.FLEET:
+            if not can_convoy(adjacent_province, start, end, check_fleet_orders):
                 continue
-            if check_fleet_orders:
-                fleet_order = adjacent_province.unit.order
-                if fleet_order is None:
-                    continue
-                if not isinstance(fleet_order, ConvoyTransport):
-                    continue
-                if fleet_order.source.province is not start or fleet_order.destination is not end:
-                    continue
             to_visit.append(adjacent_province)
 
     return False
 
 
+def get_convoy_paths(
+    start: Province, end: Location, can_pass: Callable[[Province], bool], max_paths: int
+) -> list[tuple[Location, ...]]:
+    """
+    Breadth-first search for the shortest convoy routes from start to end, shortest first. A route stops at the first
+    province next to end.
+
+    :param start: Start province
+    :param end: End location
+    :param can_pass: whether a route may pass through a province, e.g. can_convoy for the fleet's orders
+    :param max_paths: the most routes to return. No province is expanded more often than this, so the search stays
+                      polynomial however many fleets are convoying
+    :return: routes as (start, province passed through..., end)
+    """
+    paths: list[tuple[Location, ...]] = []
+    expanded: collections.Counter[str] = collections.Counter()
+    passable: dict[str, bool] = {}
+    to_visit = collections.deque()
+    to_visit.append((start,))
+    while 0 < len(to_visit) and len(paths) < max_paths:
+        path = to_visit.popleft()
+        current = path[-1]
+
+        if expanded[current.name] >= max_paths:
+            continue
+        expanded[current.name] += 1
+
+        if any(adjacent_province == end for adjacent_province in current.adjacent):
+            paths.append(path + (end,))
+            continue
+
+        for adjacent_province in current.adjacent:
+            if adjacent_province in path:
+                continue
+            if adjacent_province.name not in passable:
+                passable[adjacent_province.name] = can_pass(adjacent_province)
+            if passable[adjacent_province.name]:
+                to_visit.append(path + (adjacent_province,))
+
+    return paths
+
+
 def order_is_valid(location: Location, order: Order, strict_convoys_supports=False) -> tuple[bool, str | None]:
     """
     Checks if order from given location is valid for configured board
@@ -1,5 +1,6 @@
 import copy
-import itertools
+import gzip
+import io
 import re
 import sys
 from xml.etree.ElementTree import ElementTree, Element
@@ -8,6 +9,7 @@ import numpy as np
 from lxml import etree
 
 from diplomacy.adjudicator import utils
+from diplomacy.adjudicator.adjudicator import can_convoy, get_convoy_paths
 from diplomacy.map_parser.vector import config_svg as svgcfg
 
 from diplomacy.map_parser.vector.utils import get_element_color, get_svg_element, get_unit_coordinates
@@ -34,69 +36,258 @@ from diplomacy.persistence.unit import Unit, UnitType
 OUTPUTLAYER = "layer16"
 UNITLAYER = "layer17"
 
+INKSCAPE_LABEL = "{http://www.inkscape.org/namespaces/inkscape}label"
+XLINK_HREF = "{http://www.w3.org/1999/xlink}href"
+
+
+class _ElementIndex:
+    """Elements of one copy of the map SVG that the mapper recolors or draws into, looked up by province label."""
+
+    def __init__(self):
+        self.defs: Element | None = None
+        self.layers: dict[str, Element] = {}
+        self.province_fills: dict[str, list[Element]] = {}
+        self.island_rings: dict[str, list[Element]] = {}
+        self.centers: dict[str, Element] = {}
+        self.power_banners: dict[str, Element] = {}
+        self.phantom_units: dict[UnitType, Element] = {}
+
+
+class _MapTemplate:
+    """
+    The variant map SVG after the setup every Mapper does before drawing (arrow definitions, units layer removed),
+    together with the paths (child indices from the root) of every element in _ElementIndex. This is built once per
+    variant; each Mapper deep copies the tree and resolves the paths instead of searching the tree again.
+    """
+
+    def __init__(self, svg_path: str):
+        self.svg: ElementTree = etree.parse(svg_path)
+        utils.add_arrow_definition_to_svg(self.svg)
+        units_layer: Element = get_svg_element(self.svg, svgcfg.UNITS_LAYER_ID)
+        self.svg.getroot().remove(units_layer)
+
+        self.defs_path: tuple[int, ...] = self._get_path(self.svg.find("{http://www.w3.org/2000/svg}defs"))
+        self.layer_paths: dict[str, tuple[int, ...]] = {}
+        for layer_id in [
+            OUTPUTLAYER,
+            UNITLAYER,
+            svgcfg.SEASON_TITLE_LAYER_ID,
+            svgcfg.POWER_BANNERS_LAYER_ID,
+        ]:
+            self.layer_paths[layer_id] = self._get_path(get_svg_element(self.svg, layer_id))
+
+        self.province_fill_paths: dict[str, list[tuple[int, ...]]] = {}
+        for layer_id in [svgcfg.LAND_PROVINCE_LAYER_ID, svgcfg.ISLAND_FILL_LAYER_ID]:
+            self._add_labeled_children(layer_id, self.province_fill_paths)
+        self.island_ring_paths: dict[str, list[tuple[int, ...]]] = {}
+        self._add_labeled_children(svgcfg.ISLAND_RING_LAYER_ID, self.island_ring_paths)
+        center_paths: dict[str, list[tuple[int, ...]]] = {}
+        self._add_labeled_children(svgcfg.SUPPLY_CENTER_LAYER_ID, center_paths)
+        self.center_paths: dict[str, tuple[int, ...]] = {name: paths[0] for name, paths in center_paths.items()}
+
+        # banners are matched to players by the color of their rectangle
+        self.power_banner_paths: dict[str, tuple[int, ...]] = {}
+        banners_layer = get_svg_element(self.svg, svgcfg.POWER_BANNERS_LAYER_ID)
+        banners_path = self.layer_paths[svgcfg.POWER_BANNERS_LAYER_ID]
+        for i, power_element in enumerate(banners_layer):
+            self.power_banner_paths[get_element_color(power_element[0])] = banners_path + (i,)
+
+        self.phantom_unit_paths: dict[UnitType, tuple[int, ...]] = {
+            UnitType.ARMY: self._get_path(get_svg_element(self.svg, svgcfg.PHANTOM_PRIMARY_ARMY_LAYER_ID)[0]),
+            UnitType.FLEET: self._get_path(get_svg_element(self.svg, svgcfg.PHANTOM_PRIMARY_FLEET_LAYER_ID)[0]),
+        }
+
+        self.scoreboard_power_locations: list[str] = []
+        for power_element in banners_layer:
+            self.scoreboard_power_locations.append(power_element.get("transform"))
+
+        # each power is placed in the right spot based on the transform field which has value of "tranlate($x,$y)" where x,y
+        # are floating point numbers; we parse these via regex and sort by y-value
+        self.scoreboard_power_locations.sort(
+            key=lambda loc: float(re.match(r"translate\((-?\d+(?:\.\d+)?),\s*(-?\d+(?:\.\d+)?)\)", loc).groups()[1])
+        )
+
+    def copy(self) -> tuple[ElementTree, _ElementIndex]:
+        svg = copy.deepcopy(self.svg)
+        root = svg.getroot()
+
+        def resolve(path: tuple[int, ...]) -> Element:
+            element = root
+            for i in path:
+                element = element[i]
+            return element
+
+        index = _ElementIndex()
+        index.defs = resolve(self.defs_path)
+        index.layers = {layer_id: resolve(path) for layer_id, path in self.layer_paths.items()}
+        index.province_fills = {name: list(map(resolve, paths)) for name, paths in self.province_fill_paths.items()}
+        index.island_rings = {name: list(map(resolve, paths)) for name, paths in self.island_ring_paths.items()}
+        index.centers = {name: resolve(path) for name, path in self.center_paths.items()}
+        index.power_banners = {color: resolve(path) for color, path in self.power_banner_paths.items()}
+        index.phantom_units = {unit_type: resolve(path) for unit_type, path in self.phantom_unit_paths.items()}
+        return svg, index
+
+    def _get_path(self, element: Element) -> tuple[int, ...]:
+        path = []
+        parent = element.getparent()
+        while parent is not None:
+            path.append(parent.index(element))
+            element = parent
+            parent = element.getparent()
+        return tuple(reversed(path))
+
+    def _add_labeled_children(self, layer_id: str, paths: dict[str, list[tuple[int, ...]]]) -> None:
+        layer = get_svg_element(self.svg, layer_id)
+        layer_path = self._get_path(layer)
+        for i, element in enumerate(layer):
+            name = element.get(INKSCAPE_LABEL)
+            if name is None:
+                logger.warning(f"Unlabeled element {element} in layer {layer_id}")
+                continue
+            paths.setdefault(name, []).append(layer_path + (i,))
+
+
+_templates: dict[str, _MapTemplate] = {}
+
+
+def _get_template(svg_path: str) -> _MapTemplate:
+    template = _templates.get(svg_path)
+    if template is None:
+        template = _MapTemplate(svg_path)
+        _templates[svg_path] = template
+    return template
+
 
 class Mapper:
+    """
+    Mapper keeps a drawn SVG of a board. It can be kept around between phases: update() only redraws the provinces,
+    centers, units and side panel entries that differ from what was last drawn.
+    """
+
     def __init__(self, board: Board):
         self.board: Board = board
-        self.board_svg: ElementTree = etree.parse(svgcfg.SVG_PATH)
+        template = _get_template(svgcfg.SVG_FILE)
+        self.board_svg: ElementTree
+        self._index: _ElementIndex
+        self.board_svg, self._index = template.copy()
         self.player_restriction: Player | None = None
-        self._initialize_scoreboard_locations()
+        self.scoreboard_power_locations: list[str] = template.scoreboard_power_locations
+
+        # What is currently drawn on board_svg. The template colors are unknown, so the first update draws everything
+        self._drawn_province_colors: dict[str, str] = {}
+        self._drawn_center_colors: dict[str, tuple[str, str, str | None]] = {}
+        self._drawn_units: dict[tuple[UnitType, str, str, bool], list[Element]] = {}
+        self._drawn_scoreboard: list[tuple[str, int] | None] = [None] * len(self.scoreboard_power_locations)
+        self._drawn_date: str | None = None
+
+        # ids of definitions already added to defs, which are only emitted once something uses them
+        self._unit_symbols: dict[tuple[UnitType, str], str] = {}
+        self._gradients: set[str] = set()
+
+        # Both outputs are the drawn board plus a handful of extra elements, so rather than copying the whole tree
+        # for each output we keep a list of (parent, element) to attach to board_svg only while writing that output.
+        # Each list is built the first time its output is requested.
+        self._moves_elements: list[tuple[Element, Element]] | None = None
+        self._state_elements: list[tuple[Element, Element]] | None = None
 
-        utils.add_arrow_definition_to_svg(self.board_svg)
+        # Resolved once per moves map before its orders are drawn: (location, from) -> closest point of location, and
+        # unit -> convoy routes drawn for it
+        self._closest_points: dict[tuple[Location, tuple[float, float]], tuple[float, float]] = {}
+        self._convoy_routes: dict[Unit, list[tuple[Location]]] = {}
 
-        units_layer: Element = get_svg_element(self.board_svg, svgcfg.UNITS_LAYER_ID)
-        self.board_svg.getroot().remove(units_layer)
+        self.update(board)
+
+    def update(self, board: Board) -> None:
+        self.board = board
+        self._moves_elements = None
+        self._state_elements = None
 
-        # TODO: Switch to passing the SVG directly, as that's simpiler (self.svg = draw_units(svg)?)
         self._draw_units()
         self._color_provinces()
         self._color_centers()
-        self.draw_side_panel(self.board_svg)
-
-        self._moves_svg = copy.deepcopy(self.board_svg)
-
-        self.state_svg = copy.deepcopy(self.board_svg)
+        self.draw_side_panel()
 
-        self.highlight_retreating_units(self.state_svg)
+    def draw_moves_map(self, current_phase: phase.Phase, player_restriction: Player | None) -> io.BytesIO:
+        elements = self._draw_moves_elements(current_phase, player_restriction)
+        return self._write_svg(elements, f"{self.board.phase.name}_moves_map")
 
-    def draw_moves_map(self, current_phase: phase.Phase, player_restriction: Player | None) -> str:
-        self._reset_moves_map()
+    def draw_player_moves_maps(self, current_phase: phase.Phase) -> dict[Player, io.BytesIO]:
+        """
+        Draws the moves map of every player, each restricted to that player's orders. The base map is drawn once for
+        all of them, and only each player's orders are drawn on top of it in turn.
+        """
+        players = sorted(self.board.players, key=lambda player: player.name)
+        maps = {}
+        for player in players:
+            elements = self._draw_moves_elements(current_phase, player)
+            maps[player] = self._write_svg(elements, f"{self.board.phase.name}_{player.name}_moves_map")
+        return maps
+
+    def _draw_moves_elements(
+        self, current_phase: phase.Phase, player_restriction: Player | None
+    ) -> list[tuple[Element, Element]]:
+        self._moves_elements = []
         self.player_restriction = player_restriction
+        output_layer = self._index.layers[OUTPUTLAYER]
+        self._closest_points = {}
+        self._convoy_routes = {}
         if not phase.is_builds(current_phase):
+            units = []
             for unit in self.board.units:
                 if player_restriction and unit.player != player_restriction:
                     continue
                 if phase.is_retreats(current_phase) and unit.province.dislodged_unit != unit:
                     continue
+                units.append(unit)
 
+            # The closest copy of each unit to each copy of where it is ordered to, for all units at once
+            unit_locs_by_unit: list[list[tuple[float, float]]] = []
+            endpoint_queries = []
+            for unit in units:
                 if phase.is_retreats(current_phase):
-                    unit_locs = unit.location().all_rets
+                    unit_locs_by_unit.append(unit.location().all_rets)
                 else:
-                    unit_locs = unit.location().all_locs
+                    unit_locs_by_unit.append(unit.location().all_locs)
+                if isinstance(unit.order, (RetreatMove, Move, Support)):
+                    for endpoint in unit.order.destination.all_locs:
+                        endpoint_queries.append((unit_locs_by_unit[-1], endpoint))
+            closest_endpoints = iter(utils.get_closest_locs(endpoint_queries))
 
-                # TODO: Maybe there's a better way to handle convoys?
+            # TODO: Maybe there's a better way to handle convoys?
+            for i, unit in enumerate(units):
                 if isinstance(unit.order, (RetreatMove, Move, Support)):
                     new_locs = []
                     for endpoint in unit.order.destination.all_locs:
-                        new_locs += [utils.normalize(utils.get_closest_loc(unit_locs, endpoint))]
-                    unit_locs = new_locs
+                        closest = next(closest_endpoints)
+                        if closest is None:
+                            closest = utils.get_closest_loc(unit_locs_by_unit[i], endpoint)
+                        new_locs += [utils.normalize(closest)]
+                    unit_locs_by_unit[i] = new_locs
+
+            self._resolve_points(
+                [hops for unit, unit_locs in zip(units, unit_locs_by_unit) for hops in self._get_hops(unit, unit_locs)]
+            )
+
+            for unit, unit_locs in zip(units, unit_locs_by_unit):
                 try:
                     for loc in unit_locs:
                         val = self._draw_order(unit, loc, current_phase)
                         if val is not None:
                             # if something returns, that means it could potentially go across the edge
                             # copy it 3 times (-1, 0, +1)
-                            lval = copy.deepcopy(val)
-                            rval = copy.deepcopy(val)
+                            if svgcfg.USE_SVG_REFERENCES:
+                                val.set("id", f"order{len(self._moves_elements)}")
+                                lval = utils.create_element("use", {XLINK_HREF: f"#{val.get('id')}"})
+                                rval = utils.create_element("use", {XLINK_HREF: f"#{val.get('id')}"})
+                            else:
+                                lval = copy.deepcopy(val)
+                                rval = copy.deepcopy(val)
                             lval.attrib["transform"] = f"translate({-svgcfg.MAP_WIDTH}, 0)"
                             rval.attrib["transform"] = f"translate({svgcfg.MAP_WIDTH}, 0)"
-                            t = self._moves_svg.getroot()
 
-                            l = get_svg_element(t, OUTPUTLAYER)
-
-                            l.append(lval)
-                            l.append(rval)
-                            l.append(val)
+                            self._moves_elements.append((output_layer, lval))
+                            self._moves_elements.append((output_layer, rval))
+                            self._moves_elements.append((output_layer, val))
                 except Exception as err:
                     logger.error(f"Drawing move failed for {unit}", exc_info=err)
         else:
@@ -109,25 +300,43 @@ class Mapper:
                 for build_order in player.build_orders:
                     self._draw_player_order(player, build_order)
 
-        self.draw_side_panel(self._moves_svg)
-        svg_file_name = f"{self.board.phase.name}_moves_map.svg"
-        self._moves_svg.write(svg_file_name)
-        return svg_file_name
-
-    def draw_current_map(self) -> str:
-        svg_file_name = f"{self.board.phase.name}_map.svg"
-        self.state_svg.write(svg_file_name)
-        return svg_file_name
+        return self._moves_elements
+
+    def draw_current_map(self) -> io.BytesIO:
+        if self._state_elements is None:
+            self._state_elements = []
+            self.highlight_retreating_units(self._state_elements)
+        return self._write_svg(self._state_elements, f"{self.board.phase.name}_map")
+
+    def _write_svg(self, elements: list[tuple[Element, Element]], name: str) -> io.BytesIO:
+        """Serializes board_svg with elements attached into a buffer named like the file it would be saved as"""
+        buffer = io.BytesIO()
+        for parent, element in elements:
+            parent.append(element)
+        try:
+            if svgcfg.COMPRESS_MAPS:
+                buffer.name = f"{name}.svgz"
+                with gzip.GzipFile(fileobj=buffer, mode="wb") as compressed:
+                    self.board_svg.write(compressed)
+            else:
+                buffer.name = f"{name}.svg"
+                self.board_svg.write(buffer)
+            buffer.seek(0)
+            return buffer
+        finally:
+            # leave board_svg as it was so that the other output can still be drawn on top of it
+            for parent, element in elements:
+                parent.remove(element)
 
     def get_pretty_date(self) -> str:
         # TODO: Get the start date from somewhere in the board/in a config file
         return self.board.phase.name + " " + str(self.board.year + 1642)
 
-    def draw_side_panel(self, svg: ElementTree) -> None:
-        self._draw_side_panel_date(svg)
-        self._draw_side_panel_scoreboard(svg)
+    def draw_side_panel(self) -> None:
+        self._draw_side_panel_date()
+        self._draw_side_panel_scoreboard()
 
-    def _draw_side_panel_scoreboard(self, svg: ElementTree) -> None:
+    def _draw_side_panel_scoreboard(self) -> None:
         """
         format is a list of each power; for each power, its children nodes are as follows:
         0: colored rectangle
@@ -135,22 +344,72 @@ class Mapper:
         2-4: "current", "victory", "start" text labels in that order
         5-7: SC counts in that same order
         """
-        all_power_banners_element = get_svg_element(svg.getroot(), svgcfg.POWER_BANNERS_LAYER_ID)
         for i, player in enumerate(self.board.get_players_by_score()):
-            for power_element in all_power_banners_element:
-                # match the correct svg element based on the color of the rectangle
-                if get_element_color(power_element[0]) == player.color:
-                    power_element.set("transform", self.scoreboard_power_locations[i])
-                    power_element[5][0].text = str(len(player.centers))
-                    break
-
-    def _draw_side_panel_date(self, svg: ElementTree) -> None:
-        date = get_svg_element(svg.getroot(), svgcfg.SEASON_TITLE_LAYER_ID)
+            entry = (player.color, len(player.centers))
+            if self._drawn_scoreboard[i] == entry:
+                continue
+            # match the correct svg element based on the color of the rectangle
+            power_element = self._index.power_banners.get(player.color)
+            if power_element is None:
+                continue
+            power_element.set("transform", self.scoreboard_power_locations[i])
+            power_element[5][0].text = str(len(player.centers))
+            self._drawn_scoreboard[i] = entry
+
+    def _draw_side_panel_date(self) -> None:
+        pretty_date = self.get_pretty_date()
+        if pretty_date == self._drawn_date:
+            return
+        date = self._index.layers[svgcfg.SEASON_TITLE_LAYER_ID]
         # TODO: this is hacky; I don't know a better way
-        date[0][0].text = self.get_pretty_date()
+        date[0][0].text = pretty_date
+        self._drawn_date = pretty_date
 
-    def _reset_moves_map(self):
-        self._moves_svg = copy.deepcopy(self.board_svg)
+    def _get_hops(
+        self, unit: Unit, unit_locs: list[tuple[float, float]]
+    ) -> list[tuple[tuple[float, float], list[Location]]]:
+        """The locations each drawn order of unit passes through in turn, from each of the unit's coordinates"""
+        order = unit.order
+        try:
+            if isinstance(order, (Move, ConvoyMove)):
+                locations = [list(route[1:]) for route in self._get_convoy_routes(unit)]
+            elif isinstance(order, Support):
+                locations = [[order.source.location(), order.destination]]
+            elif isinstance(order, RetreatMove):
+                locations = [[order.destination]]
+            else:
+                return []
+        except Exception:
+            # drawing the order will fail the same way, and log it then
+            return []
+        return [(loc, hops) for loc in unit_locs for hops in locations]
+
+    def _resolve_points(self, hops: list[tuple[tuple[float, float], list[Location]]]) -> None:
+        """
+        Finds the point each order is drawn to at each hop, for all orders at once. Each hop depends on the previous
+        one, so this makes one batched query per hop rather than one query per hop of each order.
+        """
+        # None once a location along the way has no coordinates; drawing that order will fail and log it
+        currents: list[tuple[float, float] | None] = [tuple(start) for start, _ in hops]
+        hop = 0
+        while True:
+            active = [
+                i for i, (_, locations) in enumerate(hops) if hop < len(locations) and currents[i] is not None
+            ]
+            if not active:
+                return
+            queries = [(hops[i][1][hop].all_locs, currents[i]) for i in active]
+            for i, point in zip(active, utils.get_closest_locs(queries)):
+                if point is not None:
+                    self._closest_points[(hops[i][1][hop], currents[i])] = point
+                currents[i] = point
+            hop += 1
+
+    def _loc_to_point(self, loc: Location, current: tuple[float, float]) -> tuple[float, float]:
+        point = self._closest_points.get((loc, tuple(current)))
+        if point is None:
+            return tuple(utils.loc_to_point(loc, current))
+        return point
 
     def _draw_order(self, unit: Unit, coordinate: tuple[float, float], current_phase: phase.Phase) -> None:
         order = unit.order
@@ -171,12 +430,12 @@ class Mapper:
         elif isinstance(order, RetreatMove):
             return self._draw_retreat_move(order, coordinate)
         elif isinstance(order, RetreatDisband):
-            self._draw_force_disband(coordinate, self._moves_svg)
+            self._draw_force_disband(coordinate, self._moves_elements)
         else:
             if phase.is_moves(current_phase):
                 self._draw_hold(coordinate)
             else:
-                self._draw_force_disband(coordinate, self._moves_svg)
+                self._draw_force_disband(coordinate, self._moves_elements)
             logger.debug(f"None order found: hold drawn. Coordinates: {coordinate}")
 
     def _draw_player_order(self, player: Player, order: PlayerOrder):
@@ -187,12 +446,12 @@ class Mapper:
             self._draw_build(player, order)
         elif isinstance(order, Disband):
             for coord in order.location.all_locs:
-                self._draw_force_disband(coord, self._moves_svg)
+                self._draw_force_disband(coord, self._moves_elements)
         else:
             logger.error(f"Could not draw player order {order}")
 
     def _draw_hold(self, coordinate: tuple[float, float]) -> None:
-        element = self._moves_svg.getroot()
+        element = self.board_svg.getroot()
         drawn_order = utils.create_element(
             "circle",
             {
@@ -204,10 +463,10 @@ class Mapper:
                 "stroke-width": svgcfg.STROKE_WIDTH,
             },
         )
-        element.append(drawn_order)
+        self._moves_elements.append((element, drawn_order))
 
     def _draw_core(self, coordinate: tuple[float, float]) -> None:
-        element = self._moves_svg.getroot()
+        element = self.board_svg.getroot()
         drawn_order = utils.create_element(
             "rect",
             {
@@ -221,10 +480,10 @@ class Mapper:
                 "transform": f"rotate(45 {coordinate[0]} {coordinate[1]})",
             },
         )
-        element.append(drawn_order)
+        self._moves_elements.append((element, drawn_order))
 
-    def _draw_retreat_move(self, order: RetreatMove, coordinate: tuple[float, float], use_moves_svg=True) -> None:
-        destination = utils.loc_to_point(order.destination, coordinate)
+    def _draw_retreat_move(self, order: RetreatMove, coordinate: tuple[float, float]) -> None:
+        destination = self._loc_to_point(order.destination, coordinate)
         if order.destination.get_unit():
             destination = utils.pull_coordinate(coordinate, destination)
         order_path = utils.create_element(
@@ -240,33 +499,6 @@ class Mapper:
         )
         return order_path
 
-    def _path_helper(
-        self, source: Province, destination: Province, current: Province, already_checked=()
-    ) -> list[tuple[Province]]:
-        if current in already_checked:
-            return []
-        options = []
-        new_checked = already_checked + (current,)
-        for possibility in current.adjacent:
-            if possibility == destination:
-                return [
-                    (
-                        current.get_unit().location(),
-                        destination,
-                    )
-                ]
-            if (
-                possibility.type == ProvinceType.SEA
-                and possibility.unit is not None
-                and (self.player_restriction is None or possibility.unit.player == self.player_restriction)
-                and possibility.unit.unit_type == UnitType.FLEET
-                and isinstance(possibility.unit.order, ConvoyTransport)
-                and possibility.unit.order.source.province is source
-                and possibility.unit.order.destination is destination
-            ):
-                options += self._path_helper(source, destination, possibility, new_checked)
-        return list(map((lambda t: (current.get_unit().location(),) + t), options))
-
     def _draw_path(self, d: str, marker_end="arrow", stroke_color="black"):
         order_path = utils.create_element(
             "path",
@@ -281,11 +513,30 @@ class Mapper:
         )
         return order_path
 
-    def _get_all_paths(self, unit: Unit) -> list[tuple[Province]]:
-        paths = self._path_helper(unit.province, unit.order.destination, unit.province)
+    def _get_all_paths(self, unit: Unit) -> list[tuple[Location]]:
+        source = unit.province
+        destination = unit.order.destination
+
+        def can_pass(province: Province) -> bool:
+            if not can_convoy(province, source, destination, check_fleet_orders=True):
+                return False
+            return self.player_restriction is None or province.unit.player == self.player_restriction
+
+        paths = get_convoy_paths(source, destination, can_pass, svgcfg.MAX_CONVOY_PATHS)
         if paths == []:
             return [(unit.province, unit.order.destination)]
-        return paths
+        # draw from the units themselves rather than the provinces they are in
+        return [
+            (unit.location(),) + tuple(province.get_unit().location() for province in path[1:-1]) + (path[-1],)
+            for path in paths
+        ]
+
+    def _get_convoy_routes(self, unit: Unit) -> list[tuple[Location]]:
+        routes = self._convoy_routes.get(unit)
+        if routes is None:
+            routes = self.get_shortest_paths(self._get_all_paths(unit))
+            self._convoy_routes[unit] = routes
+        return routes
 
     # removes unnesseary convoys, for instance [A->B->C & A->C] -> [A->C]
     def get_shortest_paths(self, args: list[tuple[Province]]) -> list[tuple[Location]]:
@@ -298,17 +549,11 @@ class Mapper:
         return min_subsets
 
     def _draw_convoyed_move(self, unit: Unit, coordinate: tuple[float, float]):
-        valid_convoys = self._get_all_paths(unit)
-        # TODO: make this a setting
-        if False:
-            if len(valid_convoys):
-                valid_convoys = valid_convoys[0:1]
-        valid_convoys = self.get_shortest_paths(valid_convoys)
-        for path in valid_convoys:
+        for path in self._get_convoy_routes(unit):
             p = [coordinate]
             start = coordinate
             for loc in path[1:]:
-                p += [utils.loc_to_point(loc, start)]
+                p += [self._loc_to_point(loc, start)]
                 start = p[-1]
 
             if path[-1].get_unit():
@@ -343,9 +588,9 @@ class Mapper:
         order: Support = unit.order
         x1 = coordinate[0]
         y1 = coordinate[1]
-        v2 = utils.loc_to_point(order.source.location(), coordinate)
+        v2 = self._loc_to_point(order.source.location(), coordinate)
         x2, y2 = v2
-        v3 = utils.loc_to_point(order.destination, v2)
+        v3 = self._loc_to_point(order.destination, v2)
         x3, y3 = v3
         marker_start = ""
         if order.destination.get_unit():
@@ -388,7 +633,7 @@ class Mapper:
         return drawn_order
 
     def _draw_convoy(self, order: ConvoyTransport, coordinate: tuple[float, float]) -> None:
-        element = self._moves_svg.getroot()
+        element = self.board_svg.getroot()
         drawn_order = utils.create_element(
             "circle",
             {
@@ -400,10 +645,10 @@ class Mapper:
                 "stroke-width": svgcfg.STROKE_WIDTH * 2 / 3,
             },
         )
-        element.append(drawn_order)
+        self._moves_elements.append((element, drawn_order))
 
     def _draw_build(self, player, order: Build) -> None:
-        element = self._moves_svg.getroot()
+        element = self.board_svg.getroot()
         drawn_order = utils.create_element(
             "circle",
             {
@@ -421,11 +666,11 @@ class Mapper:
         if isinstance(province, Coast):
             coast = province
             province = province.province
-        self._draw_unit(Unit(order.unit_type, player, province, coast, None), use_moves_svg=True)
-        element.append(drawn_order)
+        self._draw_unit(Unit(order.unit_type, player, province, coast, None), self._moves_elements)
+        self._moves_elements.append((element, drawn_order))
 
-    def _draw_disband(self, coordinate: tuple[float, float], svg) -> None:
-        element = svg.getroot()
+    def _draw_disband(self, coordinate: tuple[float, float], elements: list[tuple[Element, Element]]) -> None:
+        element = self.board_svg.getroot()
         drawn_order = utils.create_element(
             "circle",
             {
@@ -437,10 +682,10 @@ class Mapper:
                 "stroke-width": svgcfg.STROKE_WIDTH,
             },
         )
-        element.append(drawn_order)
+        elements.append((element, drawn_order))
 
-    def _draw_force_disband(self, coordinate: tuple[float, float], svg) -> None:
-        element = svg.getroot()
+    def _draw_force_disband(self, coordinate: tuple[float, float], elements: list[tuple[Element, Element]]) -> None:
+        element = self.board_svg.getroot()
         cross_width = svgcfg.STROKE_WIDTH / (2**0.5)
         square_rad = svgcfg.RADIUS / (2**0.5)
         # two corner and a center point. Rotate and concat them to make the correct object
@@ -461,56 +706,35 @@ class Mapper:
             },
         )
 
-        element.append(drawn_order)
+        elements.append((element, drawn_order))
 
     def _color_provinces(self) -> None:
-        province_layer = get_svg_element(self.board_svg, svgcfg.LAND_PROVINCE_LAYER_ID)
-        island_fill_layer = get_svg_element(self.board_svg, svgcfg.ISLAND_FILL_LAYER_ID)
-        island_ring_layer = get_svg_element(self.board_svg, svgcfg.ISLAND_RING_LAYER_ID)
-
-        visited_provinces: set[str] = set()
-
-        for province_element in itertools.chain(province_layer, island_fill_layer):
-            try:
-                province = self._get_province_from_element_by_label(province_element)
-            except ValueError as ex:
-                print(f"Error during recoloring provinces: {ex}", file=sys.stderr)
+        for province in self.board.provinces:
+            if province.type == ProvinceType.SEA:
                 continue
 
-            visited_provinces.add(province.name)
-            color = svgcfg.NEUTRAL_PROVINCE_COLOR
-            if province.owner:
-                color = province.owner.color
-            utils.color_element(province_element, color)
-
-        # Try to combine this with the code above? A lot of repeated stuff here
-        for island_ring in island_ring_layer:
-            try:
-                province = self._get_province_from_element_by_label(island_ring)
-            except ValueError as ex:
-                print(f"Error during recoloring provinces: {ex}", file=sys.stderr)
+            province_elements = self._index.province_fills.get(province.name)
+            if not province_elements:
+                print(f"Warning: Province {province.name} was not recolored by mapper!")
                 continue
 
             color = svgcfg.NEUTRAL_PROVINCE_COLOR
             if province.owner:
                 color = province.owner.color
-            utils.color_element(island_ring, color, key="stroke")
-
-        for province in self.board.provinces:
-            if province.type == ProvinceType.SEA:
+            if self._drawn_province_colors.get(province.name) == color:
                 continue
-            if province.name in visited_provinces:
-                continue
-            print(f"Warning: Province {province.name} was not recolored by mapper!")
+            for province_element in province_elements:
+                utils.color_element(province_element, color)
+            for island_ring in self._index.island_rings.get(province.name, []):
+                utils.color_element(island_ring, color, key="stroke")
+            self._drawn_province_colors[province.name] = color
 
     def _color_centers(self) -> None:
-        centers_layer = get_svg_element(self.board_svg, svgcfg.SUPPLY_CENTER_LAYER_ID)
-
-        for center_element in centers_layer:
-            try:
-                province = self._get_province_from_element_by_label(center_element)
-            except ValueError as ex:
-                print(f"Error during recoloring centers: {ex}", file=sys.stderr)
+        for province in self.board.provinces:
+            center_element = self._index.centers.get(province.name)
+            if center_element is None:
+                if province.has_supply_center:
+                    print(f"Error during recoloring centers: no center for {province.name}", file=sys.stderr)
                 continue
 
             if not province.has_supply_center:
@@ -525,6 +749,12 @@ class Mapper:
                 half_color = province.half_core.color
             else:
                 half_color = core_color
+            gradient = None
+            if half_color != core_color:
+                gradient = f"url(#{self._get_gradient(province.half_core, province.core)})"
+            if self._drawn_center_colors.get(province.name) == (core_color, half_color, gradient):
+                continue
+            self._drawn_center_colors[province.name] = (core_color, half_color, gradient)
             # color = "#ffffff"
             # if province.core:
             #     color = province.core.color
@@ -539,49 +769,59 @@ class Mapper:
             #     print(f"\t{path}")
             #     utils.color_element(path, color)
             for elem in center_element.getchildren():
-                if "{http://www.inkscape.org/namespaces/inkscape}label" in elem.attrib and elem.attrib["{http://www.inkscape.org/namespaces/inkscape}label"] in ["Halfcore Marker", "Core Marker"]:
+                if INKSCAPE_LABEL in elem.attrib and elem.attrib[INKSCAPE_LABEL] in ["Halfcore Marker", "Core Marker"]:
                     # Handling capitals is easy bc it's all marked
                     # TODO: Maybe make it split vertically?
                     # that might be hard to do
-                    if elem.attrib["{http://www.inkscape.org/namespaces/inkscape}label"] == "Halfcore Marker":
+                    if elem.attrib[INKSCAPE_LABEL] == "Halfcore Marker":
                         utils.color_element(elem, half_color)
-                    elif elem.attrib["{http://www.inkscape.org/namespaces/inkscape}label"] == "Core Marker":
+                    elif elem.attrib[INKSCAPE_LABEL] == "Core Marker":
                         utils.color_element(elem, core_color)
                 else:
-                    if half_color != core_color:
-                        corename = "None" if not province.core else province.core.name
-                        halfname = "None" if not province.half_core else province.half_core.name
-                        utils.color_element(elem, f"url(#{halfname}_{corename})")
+                    if gradient is not None:
+                        utils.color_element(elem, gradient)
                     else:
                         utils.color_element(elem, core_color)
 
-
-
-    def _get_province_from_element_by_label(self, element: Element) -> Province:
-        province_name = element.get("{http://www.inkscape.org/namespaces/inkscape}label")
-        if province_name is None:
-            raise ValueError(f"Unlabeled element {element}")
-        province = self.board.get_province(province_name)
-        if province is None:
-            raise ValueError(f"Could not find province for label {province_name}")
-        return province
+    def _get_gradient(self, first: Player | None, second: Player | None) -> str:
+        gradient_id = f"{first.name if first else 'None'}_{second.name if second else 'None'}"
+        if gradient_id not in self._gradients:
+            utils.add_gradient_definition_to_svg(
+                self._index.defs,
+                gradient_id,
+                first.color if first else "ffffff",
+                second.color if second else "ffffff",
+            )
+            self._gradients.add(gradient_id)
+        return gradient_id
 
     def _draw_units(self) -> None:
-        for unit in self.board.units:
-            self._draw_unit(unit)
-
-    def _draw_unit(self, unit: Unit, use_moves_svg=False):
-        unit_element = self._get_element_for_unit_type(unit.unit_type)
-
-        for path in unit_element.getchildren():
-            utils.color_element(path, unit.player.color)
-
-        current_coords = get_unit_coordinates(unit_element)
+        units = {self._get_unit_key(unit): unit for unit in self.board.units}
+        for key in list(self._drawn_units):
+            if key not in units:
+                for element in self._drawn_units.pop(key):
+                    element.getparent().remove(element)
+        for key, unit in units.items():
+            if key not in self._drawn_units:
+                self._drawn_units[key] = self._draw_unit(unit)
+
+    def _get_unit_key(self, unit: Unit) -> tuple[UnitType, str, str, bool]:
+        return unit.unit_type, unit.player.color, unit.location().name, unit == unit.province.dislodged_unit
+
+    def _draw_unit(self, unit: Unit, elements: list[tuple[Element, Element]] | None = None) -> list[Element]:
+        if svgcfg.USE_SVG_REFERENCES:
+            symbol_id = self._get_unit_symbol(unit.unit_type, unit.player.color)
+            unit_element = utils.create_element("use", {XLINK_HREF: f"#{symbol_id}"})
+            current_coords = get_unit_coordinates(self._index.phantom_units[unit.unit_type])
+        else:
+            unit_element = self._get_colored_unit(unit.unit_type, unit.player.color)
+            current_coords = get_unit_coordinates(unit_element)
 
         if unit == unit.province.dislodged_unit:
             coord_list = unit.location().all_rets
         else:
             coord_list = unit.location().all_locs
+        drawn = []
         for desired_coords in coord_list:
             elem = copy.deepcopy(unit_element)
             elem.set(
@@ -589,44 +829,50 @@ class Mapper:
                 f"translate({desired_coords[0] - current_coords[0]},{desired_coords[1] - current_coords[1]})",
             )
             elem.set("id", unit.province.name)
-            elem.set("{http://www.inkscape.org/namespaces/inkscape}label", unit.province.name)
+            elem.set(INKSCAPE_LABEL, unit.province.name)
 
-            tree = self.board_svg if not use_moves_svg else self._moves_svg
-            group = get_svg_element(tree, UNITLAYER)
-            group.append(elem)
+            group = self._index.layers[UNITLAYER]
+            if elements is None:
+                group.append(elem)
+            else:
+                elements.append((group, elem))
+            drawn.append(elem)
+        return drawn
 
-    def highlight_retreating_units(self, svg):
+    def _get_colored_unit(self, unit_type: UnitType, color: str) -> Element:
+        unit_element = self._get_element_for_unit_type(unit_type)
+        for path in unit_element.getchildren():
+            utils.color_element(path, color)
+        return unit_element
+
+    def _get_unit_symbol(self, unit_type: UnitType, color: str) -> str:
+        symbol_id = self._unit_symbols.get((unit_type, color))
+        if symbol_id is None:
+            symbol_id = f"unit_{unit_type.value}_{color}"
+            # symbol contents are in map coordinates, so they must not be clipped to the symbol's own viewport
+            symbol = utils.create_element("symbol", {"id": symbol_id, "overflow": "visible"})
+            for child in self._get_colored_unit(unit_type, color).getchildren():
+                symbol.append(child)
+            self._index.defs.append(symbol)
+            self._unit_symbols[(unit_type, color)] = symbol_id
+        return symbol_id
+
+    def highlight_retreating_units(self, elements: list[tuple[Element, Element]]):
         for unit in self.board.units:
             if unit == unit.province.dislodged_unit:
-                self._draw_retreat_options(unit, svg)
+                self._draw_retreat_options(unit, elements)
 
     def _get_element_for_unit_type(self, unit_type) -> Element:
         # Just copy a random phantom unit
-        if unit_type == UnitType.ARMY:
-            layer: Element = get_svg_element(self.board_svg, svgcfg.PHANTOM_PRIMARY_ARMY_LAYER_ID)
-        else:
-            layer: Element = get_svg_element(self.board_svg, svgcfg.PHANTOM_PRIMARY_FLEET_LAYER_ID)
-        return copy.deepcopy(layer.getchildren()[0])
+        return copy.deepcopy(self._index.phantom_units[unit_type])
 
-    def _draw_retreat_options(self, unit: Unit, svg):
-        root = svg.getroot()
+    def _draw_retreat_options(self, unit: Unit, elements: list[tuple[Element, Element]]):
+        root = self.board_svg.getroot()
         if not unit.retreat_options:
-           self._draw_force_disband(unit.province.retreat_unit_coordinate, svg)
+           self._draw_force_disband(unit.province.retreat_unit_coordinate, elements)
         # if we're drawing possible retreat locs, why show it as dislodged at all?
         # else:
         #     self._draw_disband(unit.location().retreat_unit_coordinate, svg)
 
         for retreat_province in unit.retreat_options:
-            root.append(self._draw_retreat_move(RetreatMove(retreat_province), unit.province.retreat_unit_coordinate, use_moves_svg=False))
-
-    def _initialize_scoreboard_locations(self) -> None:
-        all_power_banners_element = get_svg_element(self.board_svg.getroot(), svgcfg.POWER_BANNERS_LAYER_ID)
-        self.scoreboard_power_locations: list[str] = []
-        for power_element in all_power_banners_element:
-            self.scoreboard_power_locations.append(power_element.get("transform"))
-
-        # each power is placed in the right spot based on the transform field which has value of "tranlate($x,$y)" where x,y
-        # are floating point numbers; we parse these via regex and sort by y-value
-        self.scoreboard_power_locations.sort(
-            key=lambda loc: float(re.match(r"translate\((-?\d+(?:\.\d+)?),\s*(-?\d+(?:\.\d+)?)\)", loc).groups()[1])
-        )
+            elements.append((root, self._draw_retreat_move(RetreatMove(retreat_province), unit.province.retreat_unit_coordinate)))
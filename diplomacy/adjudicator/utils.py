@@ -1,6 +1,6 @@
 import math
 import re
-import itertools
+from typing import Iterable
 
 from lxml import etree
 from xml.etree.ElementTree import ElementTree, Element
@@ -10,8 +10,6 @@ import numpy as np
 from diplomacy.map_parser.vector.config_svg import MAP_WIDTH, RADIUS
 from diplomacy.persistence.province import Location
 
-from diplomacy.map_parser.vector.config_player import player_data
-
 def add_arrow_definition_to_svg(svg: ElementTree) -> None:
     defs: Element = svg.find("{http://www.w3.org/2000/svg}defs")
     if defs is None:
@@ -75,32 +73,32 @@ def add_arrow_definition_to_svg(svg: ElementTree) -> None:
     ball_marker.append(ball_def)
     defs.append(ball_marker)
 
-    data = player_data.copy()
-    data["None"] = ["ffffff"]
-    for mapping in itertools.product(data, data):
-        gradient_def: Element = create_element(
-            "linearGradient",
-            {
-                "id": f"{mapping[0]}_{mapping[1]}"
-            }
-        )
-        first: Element = create_element(
-            "stop",
-            {
-                "offset": "50%",
-                "stop-color": f"#{data[mapping[0]][0]}"
-            }
-        )
-        second: Element = create_element(
-            "stop",
-            {
-                "offset": "50%",
-                "stop-color": f"#{data[mapping[1]][0]}"
-            }
-        )
-        gradient_def.append(first)
-        gradient_def.append(second)
-        defs.append(gradient_def)
+
+def add_gradient_definition_to_svg(defs: Element, gradient_id: str, first_color: str, second_color: str) -> None:
+    """Adds a half-and-half gradient to defs, for filling centers that are cored by two different powers"""
+    gradient_def: Element = create_element(
+        "linearGradient",
+        {
+            "id": gradient_id
+        }
+    )
+    first: Element = create_element(
+        "stop",
+        {
+            "offset": "50%",
+            "stop-color": f"#{first_color}"
+        }
+    )
+    second: Element = create_element(
+        "stop",
+        {
+            "offset": "50%",
+            "stop-color": f"#{second_color}"
+        }
+    )
+    gradient_def.append(first)
+    gradient_def.append(second)
+    defs.append(gradient_def)
 
 
 def color_element(element: Element, color: str, key="fill"):
@@ -150,6 +148,40 @@ def get_closest_loc(possiblities: tuple[tuple[float, float]], coord: tuple[float
     return crossed_pos[short_ind].tolist()
 
 
+def get_closest_locs(
+    queries: list[tuple[Iterable[tuple[float, float]], tuple[float, float]]]
+) -> list[tuple[float, float] | None]:
+    """
+    Batched get_closest_loc: for each (possibilities, coord) query, the closest possibility to coord, wrapping
+    horizontally, computed for all queries in one NumPy computation. Queries without possibilities give None.
+    """
+    if not queries:
+        return []
+    possibilities = [list(query[0]) for query in queries]
+    width = max(map(len, possibilities))
+    if width == 0:
+        return [None] * len(queries)
+
+    # pad each query's possibilities with NaN up to the longest
+    points = np.full((len(queries), width, 2), np.nan)
+    for i, query_possibilities in enumerate(possibilities):
+        if query_possibilities:
+            points[i, : len(query_possibilities)] = query_possibilities
+    coords = np.array([query[1] for query in queries], dtype=float)
+
+    dx = points[:, :, 0] - coords[:, None, 0]
+    crossed = np.abs(dx) > MAP_WIDTH / 2
+    x = np.where(crossed, points[:, :, 0] - np.sign(dx) * MAP_WIDTH, points[:, :, 0])
+
+    # penalty for crossing map is 500 px
+    dists = np.hypot(x - coords[:, None, 0], points[:, :, 1] - coords[:, None, 1]) + 500 * crossed
+    short_ind = np.argmin(np.where(np.isnan(dists), np.inf, dists), axis=1)
+
+    rows = np.arange(len(queries))
+    closest = np.stack([x[rows, short_ind], points[rows, short_ind, 1]], axis=1).tolist()
+    return [tuple(point) if query_possibilities else None for point, query_possibilities in zip(closest, possibilities)]
+
+
 def loc_to_point(loc: Location, current: tuple[float, float], use_retreats=False):
     if not use_retreats:
         return get_closest_loc(loc.all_locs, current)
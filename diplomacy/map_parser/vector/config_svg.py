@@ -1,6 +1,11 @@
-# SVG map path
+from pathlib import Path
+
+# SVG map path, relative to the repository root
 # Province border coordinates must be relative to the last coordinate and in the format x,y in the path string.
 SVG_PATH: str = f"assets/imperial_diplomacy.svg"
+# The database saves boards and locations under SVG_PATH as the name of their variant, so it stays as it is, and the map
+# is read from here, found from this file so the bot can be run from any directory
+SVG_FILE: str = str(Path(__file__).parents[3] / SVG_PATH)
 
 # You can find the following in the SVG file. If you are using Inkscape, you will likely find id="..." next to
 # inkscape:groupmode="layer" and inkscape:label="...", the latter of which may describe which of the following (if any)
@@ -53,3 +58,13 @@ MAP_WIDTH = 4375
 RADIUS: float = 10
 # Order drawing stroke width
 STROKE_WIDTH: float = 2
+
+# Most convoy routes drawn for one convoyed army, shortest first. Set to 1 to only draw the shortest route.
+MAX_CONVOY_PATHS: int = 8
+
+# If true, units are drawn as <use> references to one <symbol> per unit type and color, and the copies of orders that
+# wrap around the edge of the map are <use> references to the original. This makes maps smaller and faster to draw.
+USE_SVG_REFERENCES: bool = True
+
+# If true, maps are sent gzip-compressed (.svgz) rather than as plain .svg
+COMPRESS_MAPS: bool = False
@@ -20,6 +20,7 @@ from diplomacy.map_parser.vector.utils import (
 )
 from diplomacy.persistence import phase
 from diplomacy.persistence.board import Board
+from diplomacy.persistence.name_matcher import NameMatcher
 from diplomacy.persistence.player import Player
 from diplomacy.persistence.province import Province, ProvinceType, Coast
 from diplomacy.persistence.unit import Unit, UnitType
@@ -35,7 +36,7 @@ NAMESPACE: dict[str, str] = {
 
 class Parser:
     def __init__(self):
-        svg_root = etree.parse(SVG_PATH)
+        svg_root = etree.parse(SVG_FILE)
 
         self.land_layer: Element = get_svg_element(svg_root, LAND_PROVINCE_LAYER_ID)
         self.island_layer: Element = get_svg_element(svg_root, ISLAND_PROVINCE_LAYER_ID)
@@ -56,6 +57,7 @@ class Parser:
 
         self.cache_provinces: set[Province] | None = None
         self.cache_adjacencies: set[tuple[str, str]] | None = None
+        self.name_matcher: NameMatcher | None = None
 
     def parse(self) -> Board:
         players = set()
@@ -75,7 +77,12 @@ class Parser:
             if unit:
                 units.add(unit)
 
-        return Board(players, provinces, units, phase.initial())
+        board = Board(players, provinces, units, phase.initial())
+        # names are the same on every board of the variant, so they only need to be indexed once
+        if self.name_matcher is None:
+            self.name_matcher = NameMatcher.from_provinces(provinces)
+        board.name_matcher = self.name_matcher
+        return board
 
     def read_map(self) -> tuple[set[Province], set[tuple[str, str]]]:
         if self.cache_provinces is None:
@@ -518,4 +525,13 @@ def _get_adjacencies(provinces: set[Province]) -> set[tuple[str, str]]:
     return adjacencies
 
 
-oneTrueParser = Parser()
+_parser: Parser | None = None
+
+
+# the parser reads the map SVG when it is made, so only make it when a board is first needed
+def get_parser() -> Parser:
+    global _parser
+    if _parser:
+        return _parser
+    _parser = Parser()
+    return _parser
@@ -1,3 +1,4 @@
+from diplomacy.persistence.name_matcher import NameMatcher
 from diplomacy.persistence.phase import Phase
 from diplomacy.persistence.player import Player
 from diplomacy.persistence.province import Province, Coast, Location
@@ -21,6 +22,10 @@ class Board:
         self.fish = 0
         self.orders_enabled: bool = True
 
+        # shared by every board of the variant when the parser makes the board, otherwise made when first needed
+        self.name_matcher: NameMatcher | None = None
+        self._name_to_location: dict[str, Location] | None = None
+
     # TODO: we could have this as a dict ready on the variant
     def get_player(self, name: str) -> Player:
         # we ignore capitalization because this is primarily used for user input
@@ -29,27 +34,32 @@ class Board:
     def get_players_by_score(self) -> list[Player]:
         return sorted(self.players, key=lambda sort_player: sort_player.score(), reverse=True)
 
-    # TODO: we could have this as a dict ready on the variant
+    def get_name_matcher(self) -> NameMatcher:
+        if self.name_matcher is None:
+            self.name_matcher = NameMatcher.from_provinces(self.provinces)
+        return self.name_matcher
+
+    def _get_name_to_location(self) -> dict[str, Location]:
+        if self._name_to_location is None:
+            self._name_to_location = {}
+            for province in self.provinces:
+                self._name_to_location[province.name] = province
+                for coast in province.coasts:
+                    self._name_to_location[coast.name] = coast
+        return self._name_to_location
+
     def get_province(self, name: str) -> Province:
-        # we ignore capitalization because this is primarily used for user input
-        return next((province for province in self.provinces if province.name.lower() == name.lower()), None)
+        # we ignore capitalization and spacing because this is primarily used for user input
+        location = self._get_name_to_location().get(self.get_name_matcher().get(name))
+        return location if isinstance(location, Province) else None
 
     def get_province_and_coast(self, name: str) -> tuple[Province, Coast | None]:
-        # TODO: (BETA) we build this everywhere, let's just have one live on the Board on init
-        # we ignore capitalization because this is primarily used for user input
-        name = name.lower()
-        name_to_province: dict[str, Province] = {}
-        name_to_coast: dict[str, Coast] = {}
-        for province in self.provinces:
-            name_to_province[province.name.lower()] = province
-            for coast in province.coasts:
-                name_to_coast[coast.name.lower()] = coast
-
-        coast = name_to_coast.get(name)
-        if coast:
-            return coast.province, coast
-        else:
-            return name_to_province[name], None
+        """:raises ValueError: if there is no province or coast called name, suggesting the closest names"""
+        # we ignore capitalization and spacing because this is primarily used for user input
+        location = self._get_name_to_location()[self.get_name_matcher().resolve(name)]
+        if isinstance(location, Coast):
+            return location.province, location
+        return location, None
 
     def get_location(self, name: str) -> Location:
         province, coast = self.get_province_and_coast(name)
@@ -67,6 +77,9 @@ class Board:
     def get_phase_and_year_string(self):
         return f"{self.year} {self.phase.name}"
 
+    def get_phase_ordinal(self) -> int:
+        return self.phase.ordinal(self.year)
+
     def change_owner(self, province: Province, player: Player):
         if province.has_supply_center:
             if province.owner:
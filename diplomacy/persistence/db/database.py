@@ -1,425 +1,644 @@
+import atexit
+import functools
+import json
 import logging
+import os
+import queue
 import sqlite3
-from collections.abc import Iterable
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future
 
 from diplomacy.map_parser.vector.config_svg import SVG_PATH
 
-# TODO: Find a better way to do this
-# maybe use a copy from manager?
-from diplomacy.map_parser.vector.vector import oneTrueParser
 from diplomacy.persistence import phase
 from diplomacy.persistence.board import Board
-from diplomacy.persistence.order import (
-    Core,
-    Hold,
-    ConvoyMove,
-    Move,
-    Support,
-    ConvoyTransport,
-    RetreatDisband,
-    RetreatMove,
-    Build,
-    Disband,
+from diplomacy.persistence.db import events, migrations, snapshot
+from diplomacy.persistence.db.rows import (
+    BoardRows,
+    build_board,
+    build_changes,
+    order_changes,
+    parse_phase_string,
+    phase_rows,
+    province_changes,
+    unit_changes,
+    unit_row,
 )
+from diplomacy.persistence.db.storage import Storage
 from diplomacy.persistence.player import Player
-from diplomacy.persistence.unit import UnitType, Unit
+from diplomacy.persistence.province import Location, Province
+from diplomacy.persistence.unit import Unit
 
 logger = logging.getLogger(__name__)
 
-SQL_FILE_PATH = "bot_db.sqlite"
+SQL_FILE_PATH = os.getenv("DATABASE_FILE", "bot_db.sqlite")
 
+# how long the writer waits for more writes to commit together with the first one it takes
+_group_commit_seconds = 0.005
 
-class _DatabaseConnection:
+# The latest phase of every board. Rather than reading every phase of every game, it skips from each board_id to the
+# next one and then to that board's highest phase_ordinal, each a seek on the (board_id, phase_ordinal) index, so it
+# costs the same however long the games have run.
+_latest_boards_sql = """
+WITH RECURSIVE board_ids(board_id) AS (
+    SELECT MIN(board_id) FROM boards
+    UNION ALL
+    SELECT (SELECT MIN(board_id) FROM boards WHERE board_id > board_ids.board_id) FROM board_ids
+    WHERE board_id IS NOT NULL
+)
+SELECT boards.board_id, boards.phase, boards.phase_ordinal, boards.fish FROM board_ids JOIN boards ON boards.rowid = (
+    SELECT rowid FROM boards WHERE board_id = board_ids.board_id ORDER BY phase_ordinal DESC LIMIT 1
+)
+"""
+
+# makes sure every location named in a statement has an id in locations, which is per variant
+_save_location_sql = "INSERT INTO locations (variant, name) VALUES (:variant, :name) ON CONFLICT DO NOTHING"
+
+# A phase is saved as a snapshot and the events since (see snapshot.py and events.py). Phases saved before snapshots
+# are instead in the row tables, which refer to locations and players by id and are only read: the first change to
+# such a phase saves it as a snapshot, which is read from then on.
+
+# The province rows that make up each wanted phase: those of its last keyframe and of every phase since, oldest first,
+# so that a later row for a province replaces an earlier one
+_province_history_sql = """
+SELECT wanted.board_id, wanted.phase_ordinal, province.name, owner.player_name, core.player_name,
+half_core.player_name
+FROM wanted JOIN provinces ON provinces.board_id = wanted.board_id AND provinces.phase_ordinal <= wanted.phase_ordinal
+AND provinces.phase_ordinal >= (
+    SELECT MAX(phase_ordinal) FROM boards
+    WHERE board_id = wanted.board_id AND is_keyframe AND phase_ordinal <= wanted.phase_ordinal
+)
+JOIN locations AS province ON province.location_id = provinces.province_id
+LEFT JOIN players AS owner ON owner.player_id = provinces.owner_id
+LEFT JOIN players AS core ON core.player_id = provinces.core_id
+LEFT JOIN players AS half_core ON half_core.player_id = provinces.half_core_id
+ORDER BY provinces.phase_ordinal
+"""
+
+# The other rows of each wanted phase, with the names of what they refer to
+_board_rows_sql: dict[str, str] = {
+    "builds": """
+SELECT wanted.board_id, wanted.phase_ordinal, player.player_name, location.name, builds.is_build, builds.is_army
+FROM wanted JOIN builds USING (board_id, phase_ordinal)
+JOIN players AS player ON player.player_id = builds.player_id
+JOIN locations AS location ON location.location_id = builds.location_id
+""",
+    "units": """
+SELECT wanted.board_id, wanted.phase_ordinal, location.name, units.is_dislodged, owner.player_name, units.is_army,
+units.order_type, destination.name, source.name
+FROM wanted JOIN units USING (board_id, phase_ordinal)
+JOIN locations AS location ON location.location_id = units.location_id
+JOIN players AS owner ON owner.player_id = units.owner_id
+LEFT JOIN locations AS destination ON destination.location_id = units.order_destination_id
+LEFT JOIN locations AS source ON source.location_id = units.order_source_id
+""",
+    "retreat_options": """
+SELECT wanted.board_id, wanted.phase_ordinal, origin.name, retreat_location.name
+FROM wanted JOIN retreat_options USING (board_id, phase_ordinal)
+JOIN locations AS origin ON origin.location_id = retreat_options.origin_id
+JOIN locations AS retreat_location ON retreat_location.location_id = retreat_options.retreat_location_id
+""",
+}
+
+# The snapshot of each wanted phase, if it has one this code can read; the others are read from the row tables
+_board_snapshot_sql = f"""
+SELECT wanted.board_id, wanted.phase_ordinal, snapshots.data
+FROM wanted JOIN snapshots USING (board_id, phase_ordinal)
+WHERE snapshots.version = {snapshot.VERSION}
+"""
+
+# The events of each wanted phase since its snapshot, oldest first
+_board_events_sql = f"""
+SELECT wanted.board_id, wanted.phase_ordinal, events.data
+FROM wanted JOIN snapshots USING (board_id, phase_ordinal)
+JOIN events ON events.board_id = wanted.board_id AND events.phase_ordinal = wanted.phase_ordinal
+AND events.event_id > snapshots.last_event_id
+WHERE snapshots.version = {snapshot.VERSION}
+ORDER BY events.event_id
+"""
+
+# a snapshot includes every event before it
+_save_snapshot_sql = """
+INSERT OR REPLACE INTO snapshots (board_id, phase_ordinal, version, data, last_event_id)
+VALUES (:board_id, :phase_ordinal, :version, :data, (SELECT COALESCE(MAX(event_id), 0) FROM events))
+"""
+
+# Changes to a phase are appended to events (see events.py), and its snapshot is remade from them once this many have
+# been appended since it was made
+_events_per_snapshot = int(os.getenv("EVENTS_PER_SNAPSHOT", "50"))
+
+_save_event_sql = """
+INSERT INTO events (board_id, phase_ordinal, created_at, kind, data)
+VALUES (:board_id, :phase_ordinal, :created_at, :kind, :data)
+"""
+
+_save_players_sql = "INSERT INTO players (board_id, player_name, color) VALUES (?, ?, ?) ON CONFLICT DO NOTHING"
+
+# each statement is run with executemany, with tuples for ? parameters or dicts for named ones, or a function making
+# them from what the statements before it saved
+_Statements = list[tuple[str, list[tuple] | list[dict] | Callable[[sqlite3.Cursor], list[dict]]]]
+
+
+def _save_locations_statement(names: Iterable[str | None]) -> tuple[str, list[dict]]:
+    return _save_location_sql, [{"variant": SVG_PATH, "name": name} for name in set(names) if name is not None]
+
+
+def _board_parameters(board_id: int, board: Board) -> dict:
+    return {"variant": SVG_PATH, "board_id": board_id, "phase_ordinal": board.get_phase_ordinal()}
+
+
+def _unit_location_names(units: list[Unit]) -> list[str | None]:
+    """:return: the names of every location units and their orders refer to"""
+    names = []
+    for unit in units:
+        parameters = unit_row(unit)
+        names += [parameters["location"], parameters["order_destination"], parameters["order_source"]]
+        names += [retreat_option.name for retreat_option in unit.retreat_options or []]
+    return names
+
+
+def _save_snapshot_statements(board_id: int, board: Board) -> _Statements:
+    """:return: statements saving a snapshot of the board's current phase as it is now, replacing any before"""
+    rows = phase_rows(board)
+    key = _board_parameters(board_id, board)
+
+    def parameters(cursor: sqlite3.Cursor) -> list[dict]:
+        # the ids are read once the statements before have given every location and player one
+        data = snapshot.encode(*rows, *_read_ids(cursor, board_id))
+        return [{**key, "version": snapshot.VERSION, "data": data}]
+
+    return [
+        _save_locations_statement(
+            location.name for province in board.provinces for location in [province, *province.coasts]
+        ),
+        (_save_players_sql, [(board_id, player.name, player.color) for player in board.players]),
+        (_save_snapshot_sql, parameters),
+    ]
+
+
+def _read_names(cursor: sqlite3.Cursor, board_id: int) -> tuple[dict[int, str], dict[int, str]]:
+    """:return: the name of each location of the variant and each player of the board, by id"""
+    location_names = dict(cursor.execute("SELECT location_id, name FROM locations WHERE variant=?", (SVG_PATH,)))
+    player_names = dict(cursor.execute("SELECT player_id, player_name FROM players WHERE board_id=?", (board_id,)))
+    return location_names, player_names
+
+
+def _read_ids(cursor: sqlite3.Cursor, board_id: int) -> tuple[dict[str, int], dict[str, int]]:
+    """:return: the id of each location of the variant and each player of the board, players by name in lower case"""
+    location_names, player_names = _read_names(cursor, board_id)
+    return (
+        {name: location_id for location_id, name in location_names.items()},
+        {name.lower(): player_id for player_id, name in player_names.items()},
+    )
+
+
+def _event_statement(board: Board, kind: str, changes: dict) -> tuple[str, list[dict]]:
+    """:return: a statement appending an event with changes to the board's current phase"""
+    event = {
+        "board_id": board.board_id,
+        "phase_ordinal": board.get_phase_ordinal(),
+        "created_at": time.time(),
+        "kind": kind,
+        "data": json.dumps(changes),
+    }
+    return _save_event_sql, [event]
+
+
+def _event_statements(board: Board, kind: str, changes: dict) -> _Statements:
+    """
+    :return: statements appending an event to the board's current phase, and remaking its snapshot if it is due, or
+        making its first one if it was saved before snapshots
+    """
+    board_id = board.board_id
+    phase_ordinal = board.get_phase_ordinal()
+
+    def parameters(cursor: sqlite3.Cursor) -> list[dict]:
+        snapshot_row = cursor.execute(
+            "SELECT data, last_event_id FROM snapshots WHERE board_id=? AND phase_ordinal=? AND version=?",
+            (board_id, phase_ordinal, snapshot.VERSION),
+        ).fetchone()
+        location_names, player_names = _read_names(cursor, board_id)
+        phase_events = "FROM events WHERE board_id=? AND phase_ordinal=? AND event_id>?"
+        if snapshot_row is None:
+            # The phase's rows are read and every event of the phase replayed on top. Events from before this one are
+            # already in the rows, but each sets what it changes, so replaying them again changes nothing.
+            last_event_id = 0
+            board_rows = _DatabaseConnection._get_board_rows([(board_id, phase_ordinal)], cursor)[
+                (board_id, phase_ordinal)
+            ]
+            phase_rows = (board_rows.provinces, board_rows.units, board_rows.retreat_options, board_rows.builds)
+        else:
+            data, last_event_id = snapshot_row
+            (event_count,) = cursor.execute(
+                f"SELECT COUNT(*) {phase_events}", (board_id, phase_ordinal, last_event_id)
+            ).fetchone()
+            if event_count < _events_per_snapshot:
+                return []
+            phase_rows = snapshot.decode(data, location_names, player_names)
+        event_data = [
+            json.loads(event_data)
+            for (event_data,) in cursor.execute(
+                f"SELECT data {phase_events} ORDER BY event_id", (board_id, phase_ordinal, last_event_id)
+            )
+        ]
+        rows = events.replay(*phase_rows, event_data)
+        data = snapshot.encode(*rows, *_read_ids(cursor, board_id))
+        return [{"board_id": board_id, "phase_ordinal": phase_ordinal, "version": snapshot.VERSION, "data": data}]
+
+    return [_event_statement(board, kind, changes), (_save_snapshot_sql, parameters)]
+
+
+# how many boards' rows are read by one query when loading boards together; each board takes two query parameters
+_board_keys_per_query = 400
+
+
+# commands for different servers run on different threads, which all share the connection; each method runs on its own
+# so that one thread's writes are never committed half done by another
+def _synchronized(method):
+    @functools.wraps(method)
+    def f(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return f
+
+
+# writes are committed by the writer thread, so a method that reads what it may have queued, or that must happen after
+# it, waits for those writes first; it must not already hold the connection's lock, which the writer needs
+def _after_pending_writes(method):
+    @functools.wraps(method)
+    def f(self, *args, **kwargs):
+        self.flush().result()
+        return method(self, *args, **kwargs)
+
+    return f
+
+
+class _DatabaseConnection(Storage):
     def __init__(self, db_file: str = SQL_FILE_PATH):
+        self._lock = threading.RLock()
         try:
-            self._connection = sqlite3.connect(db_file)
+            self._connection = sqlite3.connect(db_file, check_same_thread=False)
             logger.info("Connection to SQLite DB successful")
         except IOError as ex:
             logger.error("Could not open SQLite DB", exc_info=ex)
-            self._connection = sqlite3.connect(":memory:")  # Special wildcard; in-memory db
+            self._connection = sqlite3.connect(":memory:", check_same_thread=False)  # Special wildcard; in-memory db
 
+        # with a write-ahead log, commits append to the log rather than rewriting the database, and readers don't block
+        # the writer; synchronous=NORMAL only syncs the log to disk at checkpoints, so a power cut (but not a crash of
+        # the bot) can lose the last few commits
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
         self._initialize_schema()
 
+        # orders and edits are saved by this thread, which commits whatever has been queued in the last few
+        # milliseconds together, rather than each command waiting on its own commit
+        self._writes: queue.Queue[tuple[_Statements, Future[None]]] = queue.Queue()
+        threading.Thread(target=self._write_behind, name="database writer", daemon=True).start()
+        atexit.register(lambda: self.flush().result())
+
     def _initialize_schema(self):
         # FIXME: move the sql file somewhere more accessible (maybe it shouldn't be inside the package? /resources ?)
-        with open("diplomacy/persistence/db/schema.sql", "r") as sql_file:
-            cursor = self._connection.cursor()
-            cursor.executescript(sql_file.read())
-            cursor.close()
+        migrations.migrate(self._connection)
 
+    @_after_pending_writes
+    @_synchronized
     def get_boards(self) -> dict[int, Board]:
         cursor = self._connection.cursor()
 
-        board_data = cursor.execute("SELECT * FROM boards").fetchall()
-        board_keys = [(row[0], row[1]) for row in board_data]
+        board_data = cursor.execute(_latest_boards_sql).fetchall()
         logger.info(f"Loading {len(board_data)} boards from DB")
+        board_keys = [(board_id, phase_ordinal) for board_id, _, phase_ordinal, _ in board_data]
+        board_rows = self._get_board_rows(board_keys, cursor)
         boards = dict()
-        for board_row in board_data:
-            board_id, phase_string, svg_file, fish = board_row
-
-            split_index = phase_string.index(" ")
-            year = int(phase_string[:split_index])
-            phase_name = phase_string[split_index:].strip()
-            current_phase = phase.get(phase_name)
-            next_phase = current_phase.next
-            next_phase_year = year
-            if next_phase.name == "Spring Moves":
-                next_phase_year += 1
-            if (board_id, f"{next_phase_year} {next_phase.name}") in board_keys:
-                continue
-
-            if fish is None:
-                fish = 0
-
-            board = self._get_board(board_id, current_phase, year, fish, cursor)
-
-            boards[board_id] = board
+        for board_id, phase_string, phase_ordinal, fish in board_data:
+            current_phase, year = parse_phase_string(phase_string)
+            boards[board_id] = build_board(
+                board_id, current_phase, year, fish or 0, board_rows[(board_id, phase_ordinal)]
+            )
 
         cursor.close()
         logger.info("Successfully loaded")
         return boards
 
-    def get_board(self, board_id: int, board_phase: phase.Phase, year: int, fish: int) -> Board | None:
+    @_after_pending_writes
+    @_synchronized
+    def get_latest_board(self, board_id: int) -> Board | None:
         cursor = self._connection.cursor()
 
         board_data = cursor.execute(
-            "SELECT * FROM boards WHERE board_id=? and phase=?", (board_id, f"{year} {board_phase.name}")
+            "SELECT phase, phase_ordinal, fish FROM boards WHERE board_id=? ORDER BY phase_ordinal DESC LIMIT 1",
+            (board_id,),
         ).fetchone()
-        if not board_data:
-            cursor.close()
-            return None
+        board = None
+        if board_data:
+            phase_string, phase_ordinal, fish = board_data
+            current_phase, year = parse_phase_string(phase_string)
+            board_rows = self._get_board_rows([(board_id, phase_ordinal)], cursor)[(board_id, phase_ordinal)]
+            board = build_board(board_id, current_phase, year, fish or 0, board_rows)
 
-        board = self._get_board(board_id, board_phase, year, fish, cursor)
         cursor.close()
         return board
 
-    def _get_board(self, board_id: int, board_phase: phase.Phase, year: int, fish: int, cursor) -> Board:
-        logger.info(f"Loading board with ID {board_id}")
-        # TODO - we should eventually store things like coords, adjacencies, etc
-        #  so we don't have to reparse the whole board each time
-        board = oneTrueParser.parse()
-        board.phase = board_phase
-        board.year = year
-        board.fish = fish
-        board.board_id = board_id
-        player_data = cursor.execute("SELECT player_name, color FROM players WHERE board_id=?", (board_id,)).fetchall()
-        player_info_by_name = {player_name: color for player_name, color in player_data}
-        for player in board.players:
-            if player.name not in player_info_by_name:
-                logger.warning(f"Couldn't find player {player.name} in DB")
-                continue
-            color = player_info_by_name[player.name]
-            player.color = color
-            player.units = set()
-            player.centers = set()
-            # TODO - player build orders
-        if phase.is_builds(board_phase):
-            builds_data = cursor.execute(
-                "SELECT player, location, is_build, is_army FROM builds WHERE board_id=? and phase=?",
-                (board_id, board.get_phase_and_year_string()),
-            ).fetchall()
-            player_by_name = {player.name: player for player in board.players}
-            for player_name, location, is_build, is_army in builds_data:
-                if player_name not in player_by_name:
-                    logger.warning(f"Unknown player: {player_name}")
-                    continue
-                player = player_by_name[player_name]
-                if is_build:
-                    player_order = Build(board.get_location(location), UnitType.ARMY if is_army else UnitType.FLEET)
-                else:
-                    player_order = Disband(board.get_location(location))
-                player.build_orders.add(player_order)
-
-        province_data = cursor.execute(
-            "SELECT province_name, owner, core, half_core FROM provinces WHERE board_id=? and phase=?",
-            (board_id, board.get_phase_and_year_string()),
-        ).fetchall()
-        province_info_by_name = {
-            province_name: (owner, core, half_core) for province_name, owner, core, half_core in province_data
-        }
-        unit_data = cursor.execute(
-            "SELECT location, is_dislodged, owner, is_army, order_type, order_destination, order_source FROM units WHERE board_id=? and phase=?",
-            (board_id, board.get_phase_and_year_string()),
-        ).fetchall()
-        for province in board.provinces:
-            if province.name not in province_info_by_name:
-                logger.warning(f"Couldn't find province {province.name} in DB")
-                continue
+    @_after_pending_writes
+    @_synchronized
+    def get_board_ids(self) -> set[int]:
+        cursor = self._connection.cursor()
+        board_ids = {board_id for (board_id,) in cursor.execute("SELECT DISTINCT board_id FROM boards")}
+        cursor.close()
+        return board_ids
 
-            owner, core, half_core = province_info_by_name[province.name]
-
-            if owner is not None:
-                owner_player = board.get_player(owner)
-                province.owner = owner_player
-
-                if province.has_supply_center:
-                    owner_player.centers.add(province)
-            else:
-                province.owner = None
-
-            core_player = None
-            if core is not None:
-                core_player = board.get_player(core)
-            province.core = core_player
-
-            half_core_player = None
-            if half_core is not None:
-                half_core_player = board.get_player(half_core)
-            province.half_core = half_core_player
-            province.unit = None
-            province.dislodged_unit = None
-        board.units.clear()
-        for unit_info in unit_data:
-            location, is_dislodged, owner, is_army, order_type, order_destination, order_source = unit_info
-            province, coast = board.get_province_and_coast(location)
-            owner_player = board.get_player(owner)
-            if is_dislodged:
-                retreat_ops = cursor.execute(
-                    "SELECT retreat_loc FROM retreat_options WHERE board_id=? and phase=? and origin=?",
-                    (board_id, board.get_phase_and_year_string(), location),
+    @_after_pending_writes
+    @_synchronized
+    def get_board(self, board_id: int, board_phase: phase.Phase, year: int, fish: int) -> Board | None:
+        cursor = self._connection.cursor()
+        board = self._read_board(board_id, board_phase, year, fish, cursor)
+        cursor.close()
+        return board
+
+    @staticmethod
+    def _read_board(board_id: int, board_phase: phase.Phase, year: int, fish: int, cursor) -> Board | None:
+        phase_ordinal = board_phase.ordinal(year)
+        board_data = cursor.execute(
+            "SELECT * FROM boards WHERE board_id=? and phase_ordinal=?", (board_id, phase_ordinal)
+        ).fetchone()
+        if not board_data:
+            return None
+
+        board_rows = _DatabaseConnection._get_board_rows([(board_id, phase_ordinal)], cursor)
+        return build_board(board_id, board_phase, year, fish, board_rows[(board_id, phase_ordinal)])
+
+    @staticmethod
+    def _get_board_rows(board_keys: list[tuple[int, int]], cursor) -> dict[tuple[int, int], BoardRows]:
+        """
+        Reads the rows of every table for the given (board_id, phase_ordinal) pairs, with one query per table however
+        many boards there are (in chunks, to stay under SQLite's limit on query parameters). A phase with a snapshot is
+        read from it and the events since instead of the other tables.
+        """
+        board_rows = {board_key: BoardRows() for board_key in board_keys}
+        location_names: dict[int, str] | None = None
+        for i in range(0, len(board_keys), _board_keys_per_query):
+            chunk = board_keys[i : i + _board_keys_per_query]
+            chunk_board_ids = sorted({board_id for board_id, _ in chunk})
+            players_by_board_id: dict[int, list[tuple[str, str]]] = {board_id: [] for board_id in chunk_board_ids}
+            player_names: dict[int, str] = {}
+            player_data = cursor.execute(
+                f"SELECT board_id, player_id, player_name, color FROM players "
+                f"WHERE board_id IN ({', '.join('?' * len(chunk_board_ids))})",
+                chunk_board_ids,
+            )
+            for board_id, player_id, player_name, color in player_data:
+                players_by_board_id[board_id].append((player_name, color))
+                player_names[player_id] = player_name
+            for board_id, phase_ordinal in chunk:
+                board_rows[(board_id, phase_ordinal)].players = players_by_board_id[board_id]
+
+            # every other table is keyed by (board_id, phase_ordinal), so they are joined with the boards wanted
+            wanted = f"WITH wanted(board_id, phase_ordinal) AS (VALUES {', '.join(['(?, ?)'] * len(chunk))}) "
+            parameters = [value for board_key in chunk for value in board_key]
+            snapshots = cursor.execute(f"{wanted}{_board_snapshot_sql}", parameters).fetchall()
+            if snapshots and location_names is None:
+                location_names = dict(cursor.execute("SELECT location_id, name FROM locations"))
+            event_data: dict[tuple[int, int], list[dict]] = {}
+            if snapshots:
+                for board_id, phase_ordinal, data in cursor.execute(f"{wanted}{_board_events_sql}", parameters):
+                    event_data.setdefault((board_id, phase_ordinal), []).append(json.loads(data))
+            for board_id, phase_ordinal, data in snapshots:
+                rows = board_rows[(board_id, phase_ordinal)]
+                rows.provinces, rows.units, rows.retreat_options, rows.builds = events.replay(
+                    *snapshot.decode(data, location_names, player_names), event_data.get((board_id, phase_ordinal), [])
                 )
-                retreat_options = set(map(board.get_location, set().union(*retreat_ops)))
-            else:
-                retreat_options = None
-            unit = Unit(UnitType.ARMY if is_army else UnitType.FLEET, owner_player, province, coast, retreat_options)
-            if is_dislodged:
-                province.dislodged_unit = unit
-            else:
-                province.unit = unit
-            owner_player.units.add(unit)
-            board.units.add(unit)
-        # AAAAA We shouldn't be having to loop twice; why is ComplexOrder.source a Unit? Turn it into a province or something
-        # Currently we have to loop twice because it's a unit and we need to have all the units set up before parsing orders because of it
-        for unit_info in unit_data:
-            location, is_dislodged, owner, is_army, order_type, order_destination, order_source = unit_info
-            if order_type is not None:
-                order_classes = [
-                    Hold,
-                    Core,
-                    Move,
-                    ConvoyMove,
-                    ConvoyTransport,
-                    Support,
-                    RetreatMove,
-                    RetreatDisband,
-                ]
-                order_class = next(_class for _class in order_classes if _class.__name__ == order_type)
-                destination_province = None
-                if order_destination is not None:
-                    destination_province, destination_coast = board.get_province_and_coast(order_destination)
-                    if destination_coast is not None:
-                        destination_province = destination_coast
-                source_unit = None
-                if order_source is not None:
-                    source_province, source_coast = board.get_province_and_coast(order_source)
-                    if source_coast is not None:
-                        source_province = source_coast
-                    source_unit = source_province.unit
-                if order_class in [Hold, Core, RetreatDisband]:
-                    order = order_class()
-                elif order_class in [Move, ConvoyMove, RetreatMove]:
-                    order = order_class(destination=destination_province)
-                elif order_class in [Support, ConvoyTransport]:
-                    order = order_class(destination=destination_province, source=source_unit)
-                else:
-                    raise ValueError(f"Could not parse {order_class}")
-
-                province, coast = board.get_province_and_coast(location)
-                if is_dislodged:
-                    province.dislodged_unit.order = order
-                else:
-                    province.unit.order = order
 
-        return board
+            snapshot_keys = {(board_id, phase_ordinal) for board_id, phase_ordinal, _ in snapshots}
+            chunk = [board_key for board_key in chunk if board_key not in snapshot_keys]
+            if not chunk:
+                continue
+            wanted = f"WITH wanted(board_id, phase_ordinal) AS (VALUES {', '.join(['(?, ?)'] * len(chunk))}) "
+            parameters = [value for board_key in chunk for value in board_key]
+            for table, sql in [("provinces", _province_history_sql), *_board_rows_sql.items()]:
+                for row in cursor.execute(f"{wanted}{sql}", parameters):
+                    getattr(board_rows[(row[0], row[1])], table).append(row[2:])
+        return board_rows
 
     def save_board(self, board_id: int, board: Board):
+        # saved by the writer thread like any other write, but waited for, as the board must be saved before anything
+        # else is done with it
+        self._write(self._save_board_statements(board_id, board)).result()
+
+    @staticmethod
+    def _save_board_statements(board_id: int, board: Board) -> _Statements:
         # TODO: Check if board already exists
-        cursor = self._connection.cursor()
-        cursor.execute(
-            "INSERT INTO boards (board_id, phase, map_file, fish) VALUES (?, ?, ?, ?);",
-            (board_id, board.get_phase_and_year_string(), SVG_PATH, board.fish),
-        )
-        cursor.executemany(
-            "INSERT INTO players (board_id, player_name, color) VALUES (?, ?, ?) ON CONFLICT DO NOTHING",
-            [(board_id, player.name, player.color) for player in board.players],
-        )
-        cursor.executemany(
-            "INSERT INTO provinces (board_id, phase, province_name, owner, core, half_core) VALUES (?, ?, ?, ?, ?, ?)",
+        return [
+            (
+                "INSERT INTO boards (board_id, phase, phase_ordinal, map_file, fish) "
+                "VALUES (:board_id, :phase, :phase_ordinal, :variant, :fish)",
+                [
+                    {
+                        **_board_parameters(board_id, board),
+                        "phase": board.get_phase_and_year_string(),
+                        "fish": board.fish,
+                    }
+                ],
+            ),
+            _event_statement(board, events.ADJUDICATION, {"phase": board.get_phase_and_year_string()}),
+            *_save_snapshot_statements(board_id, board),
+        ]
+
+    def save_phase(self, board: Board, old_phase_ordinal: int) -> Future[None]:
+        """Moves the board's current phase, saved as old_phase_ordinal, to the phase the board is in now"""
+        key = {"board_id": board.board_id, "old_phase_ordinal": old_phase_ordinal}
+        new_phase = {**key, "phase": board.get_phase_and_year_string(), "phase_ordinal": board.get_phase_ordinal()}
+        return self._write(
             [
                 (
-                    board_id,
-                    board.get_phase_and_year_string(),
-                    province.name,
-                    province.owner.name if province.owner else None,
-                    province.core.name if province.core else None,
-                    province.half_core.name if province.half_core else None,
-                )
-                for province in board.provinces
-            ],
-        )
-        cursor.executemany(
-            "INSERT INTO builds (board_id, phase, player, location, is_build, is_army) VALUES (?, ?, ?, ?, ?, ?)",
-            [
-                (
-                    board_id,
-                    board.get_phase_and_year_string(),
-                    player.name,
-                    build_order.location.name,
-                    isinstance(build_order, Build),
-                    getattr(build_order, "unit_type", None) == UnitType.ARMY,
-                )
-                for player in board.players
-                for build_order in player.build_orders
-            ],
-        )
-        # TODO - this is hacky
-        cursor.executemany(
-            "INSERT INTO units (board_id, phase, location, is_dislodged, owner, is_army, order_type, order_destination, order_source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            [
+                    "UPDATE boards SET phase=:phase, phase_ordinal=:phase_ordinal "
+                    "WHERE board_id=:board_id AND phase_ordinal=:old_phase_ordinal",
+                    [new_phase],
+                ),
+                # the new snapshot is the whole phase, so any rows it was saved as before snapshots are done with
+                *[
+                    (f"DELETE FROM {table} WHERE board_id=:board_id AND phase_ordinal=:old_phase_ordinal", [key])
+                    for table in ["provinces", "units", "builds", "retreat_options", "snapshots"]
+                ],
+                # the phase's events go with it, and the new snapshot includes them
                 (
-                    board_id,
-                    board.get_phase_and_year_string(),
-                    unit.location().name,
-                    unit == unit.province.dislodged_unit,
-                    unit.player.name,
-                    unit.unit_type == UnitType.ARMY,
-                    unit.order.__class__.__name__ if unit.order is not None else None,
-                    getattr(getattr(unit.order, "destination", None), "name", None) if unit.order is not None else None,
-                    (
-                        getattr(getattr(getattr(unit.order, "source", None), "province", None), "name", None)
-                        if unit.order is not None
-                        else None
-                    ),
-                )
-                for unit in board.units
-            ],
-        )
-        cursor.executemany(
-            "INSERT INTO retreat_options (board_id, phase, origin, retreat_loc) VALUES (?, ?, ?, ?)",
-            [
-                (board_id, board.get_phase_and_year_string(), unit.location().name, retreat_option.name)
-                for unit in board.units
-                if unit.retreat_options is not None
-                for retreat_option in unit.retreat_options
-            ],
+                    "UPDATE events SET phase_ordinal=:phase_ordinal "
+                    "WHERE board_id=:board_id AND phase_ordinal=:old_phase_ordinal",
+                    [new_phase],
+                ),
+                _event_statement(board, events.EDIT, {"phase": board.get_phase_and_year_string()}),
+                *_save_snapshot_statements(board.board_id, board),
+            ]
         )
-        cursor.close()
-        self._connection.commit()
 
-    def save_order_for_units(self, board: Board, units: Iterable[Unit]):
-        cursor = self._connection.cursor()
-        cursor.executemany(
-            "UPDATE units SET order_type=?, order_destination=?, order_source=? "
-            "WHERE board_id=? and phase=? and location=? and is_dislodged=?",
+    def save_provinces(self, board: Board, provinces: Iterable[Province]) -> Future[None]:
+        """Saves edits to provinces in the board's current phase"""
+        return self._write(self._save_province_statements(board, provinces))
+
+    @staticmethod
+    def _save_province_statements(board: Board, provinces: Iterable[Province]) -> _Statements:
+        provinces = list(provinces)
+        return [
+            _save_locations_statement(province.name for province in provinces),
+            *_event_statements(board, events.EDIT, province_changes(provinces)),
+        ]
+
+    def save_units(self, board: Board, units: Iterable[Unit]) -> Future[None]:
+        """Saves units added to the board's current phase by an edit, with the retreat options of dislodged ones"""
+        units = list(units)
+        return self._write(
             [
-                (
-                    unit.order.__class__.__name__ if unit.order is not None else None,
-                    getattr(getattr(unit.order, "destination", None), "name", None) if unit.order is not None else None,
-                    (
-                        getattr(getattr(getattr(unit.order, "source", None), "province", None), "name", None)
-                        if unit.order is not None
-                        else None
-                    ),
-                    board.board_id,
-                    board.get_phase_and_year_string(),
-                    unit.location().name,
-                    unit.province.dislodged_unit == unit,
-                )
-                for unit in units
-            ],
-        )
-        cursor.executemany(
-            "DELETE FROM retreat_options WHERE board_id=? and phase=? and origin=?",
-            [
-                (board.board_id, board.get_phase_and_year_string(), unit.location().name)
-                for unit in units
-                if unit.retreat_options is not None
-            ],
-        )
-        cursor.executemany(
-            "INSERT INTO retreat_options (board_id, phase, origin, retreat_loc) VALUES (?, ?, ?, ?)",
-            [
-                (board.board_id, board.get_phase_and_year_string(), unit.location().name, retreat_option.name)
-                for unit in units
-                if unit.retreat_options is not None
-                for retreat_option in unit.retreat_options
-            ],
+                _save_locations_statement(_unit_location_names(units)),
+                *_event_statements(board, events.EDIT, unit_changes(units)),
+            ]
         )
-        cursor.close()
-        self._connection.commit()
 
-    def save_build_orders_for_players(self, board: Board, player: Player | None):
+    def delete_unit(self, board: Board, location: Location, is_dislodged: bool) -> Future[None]:
+        """Deletes the unit, or the dislodged unit, at location in the board's current phase"""
+        return self._write(_event_statements(board, events.EDIT, {"removed_units": [[location.name, is_dislodged]]}))
+
+    def save_order_for_units(self, board: Board, units: Iterable[Unit]) -> Future[None]:
+        return self._write(self._save_order_statements(board, units))
+
+    @staticmethod
+    def _save_order_statements(board: Board, units: Iterable[Unit]) -> _Statements:
+        units = list(units)
+        return [
+            _save_locations_statement(_unit_location_names(units)),
+            *_event_statements(
+                board,
+                events.ORDER_REMOVED if all(unit.order is None for unit in units) else events.ORDER_SET,
+                order_changes(units),
+            ),
+        ]
+
+    def save_build_orders_for_players(self, board: Board, player: Player | None) -> Future[None]:
+        return self._write(self._save_build_statements(board, player))
+
+    @staticmethod
+    def _save_build_statements(board: Board, player: Player | None) -> _Statements:
         if player is None:
             players = board.players
         else:
             players = {player}
-        cursor = self._connection.cursor()
-        cursor.executemany(
-            "INSERT INTO builds (board_id, phase, player, location, is_build, is_army) VALUES (?, ?, ?, ?, ?, ?) "
-            "ON CONFLICT (board_id, phase, player, location) DO UPDATE SET is_build=?, is_army=?",
+        return [
+            _save_locations_statement(
+                build_order.location.name for player in players for build_order in player.build_orders
+            ),
+            *_event_statements(board, events.ORDER_SET, build_changes(players)),
+        ]
+
+    def delete_build_orders(self, board: Board, location_names: Iterable[str]) -> Future[None]:
+        """Deletes the build orders of every player at the locations in the board's current phase"""
+        return self._write(_event_statements(board, events.ORDER_REMOVED, {"removed_builds": list(location_names)}))
+
+    def delete_board(self, board: Board):
+        self._write(self._delete_board_statements(board)).result()
+
+    @staticmethod
+    def _delete_board_statements(board: Board) -> _Statements:
+        key = [(board.board_id, board.get_phase_ordinal())]
+        return [
+            ("DELETE FROM boards WHERE board_id=? AND phase_ordinal=?", key),
+            ("DELETE FROM provinces WHERE board_id=? AND phase_ordinal=?", key),
+            ("DELETE FROM units WHERE board_id=? AND phase_ordinal=?", key),
+            ("DELETE FROM builds WHERE board_id=? AND phase_ordinal=?", key),
+            ("DELETE FROM retreat_options WHERE board_id=? AND phase_ordinal=?", key),
+            ("DELETE FROM snapshots WHERE board_id=? AND phase_ordinal=?", key),
+            # the phase's events are kept, as a record of what happened in it
+            _event_statement(board, events.ROLLBACK, {}),
+        ]
+
+    def save_fish(self, board: Board) -> Future[None]:
+        return self._write(
             [
                 (
-                    board.board_id,
-                    board.get_phase_and_year_string(),
-                    player.name,
-                    build_order.location.name,
-                    isinstance(build_order, Build),
-                    getattr(build_order, "unit_type", None) == UnitType.ARMY,
-                    isinstance(build_order, Build),
-                    getattr(build_order, "unit_type", None) == UnitType.ARMY,
+                    "UPDATE boards SET fish=? WHERE board_id=? AND phase_ordinal=?",
+                    [(board.fish, board.board_id, board.get_phase_ordinal())],
                 )
-                for player in players
-                for build_order in player.build_orders
-            ],
+            ]
         )
-        cursor.close()
-        self._connection.commit()
 
-    def delete_board(self, board: Board):
+    def _write(self, statements: _Statements) -> Future[None]:
+        """
+        Queues statements, each run with executemany, to be committed by the writer thread
+
+        :return: resolved once they are committed, or with the error if they couldn't be
+        """
+        done: Future[None] = Future()
+        self._writes.put((statements, done))
+        return done
+
+    def flush(self) -> Future[None]:
+        """:return: resolved once every write queued before it has been committed"""
+        return self._write([])
+
+    def _write_behind(self) -> None:
+        while True:
+            batch = [self._writes.get()]
+            deadline = time.monotonic() + _group_commit_seconds
+            # someone waiting on a flush shouldn't wait for more writes to come
+            while batch[-1][0]:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._writes.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._commit(batch)
+            except Exception as ex:
+                # this thread saves every write, so it must outlive any one of them; nobody waits on a write forever
+                logger.error(f"Could not save {len(batch)} writes", exc_info=ex)
+                for _, done in batch:
+                    if not done.done():
+                        done.set_exception(ex)
+
+    @_synchronized
+    def _commit(self, batch: list[tuple[_Statements, Future[None]]]) -> None:
         cursor = self._connection.cursor()
-        cursor.execute(
-            "DELETE FROM boards WHERE board_id=? AND phase=?", (board.board_id, board.get_phase_and_year_string())
-        )
-        cursor.execute(
-            "DELETE FROM provinces WHERE board_id=? AND phase=?", (board.board_id, board.get_phase_and_year_string())
-        )
-        cursor.execute(
-            "DELETE FROM units WHERE board_id=? AND phase=?", (board.board_id, board.get_phase_and_year_string())
-        )
-        cursor.execute(
-            "DELETE FROM builds WHERE board_id=? AND phase=?", (board.board_id, board.get_phase_and_year_string())
-        )
-        cursor.execute(
-            "DELETE FROM retreat_options WHERE board_id=? AND phase=?",
-            (board.board_id, board.get_phase_and_year_string()),
-        )
-        cursor.close()
-        self._connection.commit()
-
-    def execute_arbitrary_sql(self, sql: str, args: tuple):
-        # TODO - everywhere using this should just be made into a method probably? idk
-        cursor = self._connection.cursor()
-        cursor.execute(sql, args)
-        cursor.close()
-        self._connection.commit()
-
-    def executemany_arbitrary_sql(self, sql: str, args: list[tuple]):
-        cursor = self._connection.cursor()
-        cursor.executemany(sql, args)
-        cursor.close()
-        self._connection.commit()
+        try:
+            for statements, _ in batch:
+                _execute(cursor, statements)
+            self._connection.commit()
+            for _, done in batch:
+                done.set_result(None)
+        except Exception as ex:
+            self._connection.rollback()
+            logger.error(f"Could not commit {len(batch)} writes together, committing them one at a time", exc_info=ex)
+            # so that one bad write doesn't lose the others
+            for statements, done in batch:
+                try:
+                    _execute(cursor, statements)
+                    self._connection.commit()
+                    done.set_result(None)
+                except Exception as statement_ex:
+                    self._connection.rollback()
+                    logger.error(f"Could not save {statements}", exc_info=statement_ex)
+                    done.set_exception(statement_ex)
+        finally:
+            cursor.close()
 
     def __del__(self):
         self._connection.commit()
         self._connection.close()
 
 
+def _execute(cursor: sqlite3.Cursor, statements: _Statements) -> None:
+    for sql, args in statements:
+        cursor.executemany(sql, args(cursor) if callable(args) else args)
+
+
 _db_class: _DatabaseConnection | None = None
+_db_class_lock = threading.Lock()
 
 
 def get_connection() -> _DatabaseConnection:
     global _db_class
-    if _db_class:
+    with _db_class_lock:
+        if _db_class is None:
+            _db_class = _DatabaseConnection()
         return _db_class
-    _db_class = _DatabaseConnection()
-    return _db_class
@@ -0,0 +1,82 @@
+"""
+Every change to a board's current phase is appended to the events table, saying when it was made and what it changed,
+rather than only overwriting the rows it changes. A phase is its last snapshot with the events since replayed on top,
+and the snapshot is remade from them every so often so that there are never many to replay.
+
+An event's data is a JSON object of the changes it made, each key a kind of change applied in this order:
+- removed_units: [location, is dislodged] of units removed, along with their retreat options
+- units: unit rows of units added, or whose owner and type changed
+- orders: [location, is dislodged, order type, order destination, order source] of units whose order changed
+- retreat_options: [origin, [retreat location, ...]] replacing the retreat options of a dislodged unit
+- provinces: province rows of provinces that changed
+- removed_builds: locations whose build orders were removed
+- builds: build rows of build orders added or changed
+Other keys are only recorded.
+"""
+
+from collections.abc import Iterable
+
+ORDER_SET = "order set"
+ORDER_REMOVED = "order removed"
+EDIT = "edit"
+# a new phase was saved, by adjudicating or by creating the game
+ADJUDICATION = "adjudication"
+ROLLBACK = "rollback"
+
+
+def replay(
+    provinces: list[tuple],
+    units: list[tuple],
+    retreat_options: list[tuple],
+    builds: list[tuple],
+    events: Iterable[dict],
+) -> tuple[list[tuple], list[tuple], list[tuple], list[tuple]]:
+    """
+    :param provinces, units, retreat_options, builds: rows of a phase, as a snapshot is read into
+    :param events: the changes of each event since, oldest first
+    :return: the rows of the phase after the events
+    """
+    provinces_by_name = {row[0]: row for row in provinces}
+    units_by_location = {(row[0], bool(row[1])): row for row in units}
+    retreat_options_by_origin: dict[str, list[str]] = {}
+    for origin, retreat_location in retreat_options:
+        retreat_options_by_origin.setdefault(origin, []).append(retreat_location)
+    # player names are matched ignoring capitalization, as they are in the database
+    builds_by_key = {(row[0].lower(), row[1]): row for row in builds}
+
+    for changes in events:
+        for location, is_dislodged in changes.get("removed_units", []):
+            units_by_location.pop((location, is_dislodged), None)
+            if is_dislodged:
+                retreat_options_by_origin.pop(location, None)
+        for row in changes.get("units", []):
+            unit_key = (row[0], row[1])
+            if unit_key in units_by_location:
+                old_row = units_by_location[unit_key]
+                units_by_location[unit_key] = (*old_row[:2], row[2], row[3], *old_row[4:])
+            else:
+                units_by_location[unit_key] = tuple(row)
+        for location, is_dislodged, *order in changes.get("orders", []):
+            if (location, is_dislodged) in units_by_location:
+                old_row = units_by_location[(location, is_dislodged)]
+                units_by_location[(location, is_dislodged)] = (*old_row[:4], *order)
+        for origin, origin_retreat_options in changes.get("retreat_options", []):
+            retreat_options_by_origin[origin] = origin_retreat_options
+        for row in changes.get("provinces", []):
+            provinces_by_name[row[0]] = tuple(row)
+        removed_builds = set(changes.get("removed_builds", []))
+        if removed_builds:
+            builds_by_key = {key: row for key, row in builds_by_key.items() if key[1] not in removed_builds}
+        for row in changes.get("builds", []):
+            builds_by_key[(row[0].lower(), row[1])] = tuple(row)
+
+    return (
+        list(provinces_by_name.values()),
+        list(units_by_location.values()),
+        [
+            (origin, retreat_location)
+            for origin, origin_retreat_options in retreat_options_by_origin.items()
+            for retreat_location in origin_retreat_options
+        ],
+        list(builds_by_key.values()),
+    )
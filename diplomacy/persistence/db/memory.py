@@ -0,0 +1,172 @@
+import functools
+import threading
+from collections.abc import Iterable
+from concurrent.futures import Future
+
+from diplomacy.persistence import phase
+from diplomacy.persistence.board import Board
+from diplomacy.persistence.db import events, rows
+from diplomacy.persistence.db.storage import Storage
+from diplomacy.persistence.player import Player
+from diplomacy.persistence.province import Location, Province
+from diplomacy.persistence.unit import Unit
+
+
+# commands for different servers run on different threads, which all share the storage
+def _synchronized(method):
+    @functools.wraps(method)
+    def f(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return f
+
+
+def _saved(method):
+    """Makes a write resolve the future it returns straight away, as the database's writer thread would once it saves"""
+
+    @functools.wraps(method)
+    def f(self, *args, **kwargs) -> Future[None]:
+        done: Future[None] = Future()
+        try:
+            method(self, *args, **kwargs)
+            done.set_result(None)
+        except Exception as ex:
+            done.set_exception(ex)
+        return done
+
+    return f
+
+
+class _SavedPhase:
+    """A phase of a board as it is saved: its rows in the form they are read from the database"""
+
+    def __init__(
+        self, phase_string: str, fish: int, phase_rows: tuple[list[tuple], list[tuple], list[tuple], list[tuple]]
+    ):
+        self.phase_string = phase_string
+        self.fish = fish
+        self.provinces, self.units, self.retreat_options, self.builds = phase_rows
+
+    def apply(self, changes: dict) -> None:
+        self.provinces, self.units, self.retreat_options, self.builds = events.replay(
+            self.provinces, self.units, self.retreat_options, self.builds, [changes]
+        )
+
+
+class MemoryStorage(Storage):
+    """
+    Keeps boards in dicts rather than a database, for benchmarks and tests that run many games and shouldn't touch the
+    disk. Boards are saved as the same rows the database saves (see rows.py), changed by the same changes its events
+    record, and read back through the same code, so they load the same.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # the saved phases of each board, by phase_ordinal
+        self._phases: dict[int, dict[int, _SavedPhase]] = {}
+        # (name, color) of the players of each board, by name in lower case
+        self._players: dict[int, dict[str, tuple[str, str]]] = {}
+
+    @_synchronized
+    def get_board_ids(self) -> set[int]:
+        return {board_id for board_id, phases in self._phases.items() if phases}
+
+    @_synchronized
+    def get_boards(self) -> dict[int, Board]:
+        boards = dict()
+        for board_id in self.get_board_ids():
+            boards[board_id] = self.get_latest_board(board_id)
+        return boards
+
+    @_synchronized
+    def get_latest_board(self, board_id: int) -> Board | None:
+        phases = self._phases.get(board_id)
+        if not phases:
+            return None
+        saved = phases[max(phases)]
+        current_phase, year = rows.parse_phase_string(saved.phase_string)
+        return self._get_board(board_id, current_phase, year, saved.fish or 0, saved)
+
+    @_synchronized
+    def get_board(self, board_id: int, board_phase: phase.Phase, year: int, fish: int) -> Board | None:
+        saved = self._phases.get(board_id, {}).get(board_phase.ordinal(year))
+        if saved is None:
+            return None
+        return self._get_board(board_id, board_phase, year, fish, saved)
+
+    def _get_board(self, board_id: int, board_phase: phase.Phase, year: int, fish: int, saved: _SavedPhase) -> Board:
+        board_rows = rows.BoardRows()
+        board_rows.players = list(self._players.get(board_id, {}).values())
+        board_rows.provinces = saved.provinces
+        board_rows.units = saved.units
+        board_rows.retreat_options = saved.retreat_options
+        board_rows.builds = saved.builds
+        return rows.build_board(board_id, board_phase, year, fish, board_rows)
+
+    @_synchronized
+    def save_board(self, board_id: int, board: Board):
+        phases = self._phases.setdefault(board_id, {})
+        phase_ordinal = board.get_phase_ordinal()
+        if phase_ordinal in phases:
+            raise ValueError(f"Board {board_id} is already saved in {board.get_phase_and_year_string()}")
+        players = self._players.setdefault(board_id, {})
+        for player in board.players:
+            players.setdefault(player.name.lower(), (player.name, player.color))
+        phases[phase_ordinal] = _SavedPhase(board.get_phase_and_year_string(), board.fish, rows.phase_rows(board))
+
+    @_saved
+    @_synchronized
+    def save_phase(self, board: Board, old_phase_ordinal: int):
+        phases = self._phases.get(board.board_id, {})
+        if old_phase_ordinal in phases:
+            saved = phases.pop(old_phase_ordinal)
+            saved.phase_string = board.get_phase_and_year_string()
+            phases[board.get_phase_ordinal()] = saved
+
+    @_saved
+    def save_provinces(self, board: Board, provinces: Iterable[Province]):
+        self._apply(board, rows.province_changes(list(provinces)))
+
+    @_saved
+    def save_units(self, board: Board, units: Iterable[Unit]):
+        self._apply(board, rows.unit_changes(list(units)))
+
+    @_saved
+    def delete_unit(self, board: Board, location: Location, is_dislodged: bool):
+        self._apply(board, {"removed_units": [[location.name, is_dislodged]]})
+
+    @_saved
+    def save_order_for_units(self, board: Board, units: Iterable[Unit]):
+        self._apply(board, rows.order_changes(list(units)))
+
+    @_saved
+    def save_build_orders_for_players(self, board: Board, player: Player | None):
+        self._apply(board, rows.build_changes(board.players if player is None else {player}))
+
+    @_saved
+    def delete_build_orders(self, board: Board, location_names: Iterable[str]):
+        self._apply(board, {"removed_builds": list(location_names)})
+
+    @_synchronized
+    def delete_board(self, board: Board):
+        self._phases.get(board.board_id, {}).pop(board.get_phase_ordinal(), None)
+
+    @_saved
+    @_synchronized
+    def save_fish(self, board: Board):
+        saved = self._phases.get(board.board_id, {}).get(board.get_phase_ordinal())
+        if saved is not None:
+            saved.fish = board.fish
+
+    @_saved
+    def flush(self):
+        # every write is saved before it returns
+        pass
+
+    @_synchronized
+    def _apply(self, board: Board, changes: dict) -> None:
+        """Applies changes to the board's current phase, if it is saved"""
+        saved = self._phases.get(board.board_id, {}).get(board.get_phase_ordinal())
+        if saved is not None:
+            saved.apply(changes)
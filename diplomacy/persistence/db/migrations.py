@@ -0,0 +1,82 @@
+import logging
+import os
+import re
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# found from this file, so the bot can be run from any directory
+SCHEMA_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
+MIGRATIONS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "SQL"))
+
+# Databases made before migrations were recorded have every migration up to this one applied by hand
+_BASELINE_VERSION = 6
+
+_migration_file = re.compile(r"(\d+)-.*\.sql")
+
+
+def get_migrations(migrations_dir: str = MIGRATIONS_DIR) -> list[tuple[int, str]]:
+    """:return: (version, path) of every migration, in the order they are applied"""
+    migrations = []
+    for file_name in os.listdir(migrations_dir):
+        match = _migration_file.fullmatch(file_name)
+        if match:
+            migrations.append((int(match.group(1)), os.path.join(migrations_dir, file_name)))
+    migrations.sort()
+    versions = [version for version, _ in migrations]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Two migrations in {migrations_dir} have the same number")
+    return migrations
+
+
+def migrate(
+    connection: sqlite3.Connection, schema_path: str = SCHEMA_FILE_PATH, migrations_dir: str = MIGRATIONS_DIR
+) -> None:
+    """
+    Brings the database up to date. The version of the last migration applied is kept in PRAGMA user_version.
+
+    A new database is created from schema.sql, which is always the result of every migration, and marked as having
+    them all. Otherwise each migration newer than the database is applied in order, each in its own transaction along
+    with the new version, so a failed migration leaves the database as it was. Migrations must therefore not begin or
+    commit transactions themselves.
+    """
+    migrations = get_migrations(migrations_dir)
+    latest_version = migrations[-1][0] if migrations else 0
+
+    cursor = connection.cursor()
+    (version,) = cursor.execute("PRAGMA user_version").fetchone()
+    has_boards = cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='boards'").fetchone()
+
+    if not has_boards:
+        logger.info(f"Creating DB schema at version {latest_version}")
+        with open(schema_path, "r") as sql_file:
+            cursor.executescript(sql_file.read())
+        cursor.execute(f"PRAGMA user_version = {latest_version}")
+        connection.commit()
+        cursor.close()
+        return
+
+    if version == 0:
+        version = _BASELINE_VERSION
+        # 7 was written before there was a runner, so it may have been applied by hand too
+        board_columns = [row[1] for row in cursor.execute("PRAGMA table_info(boards)")]
+        if "phase_ordinal" in board_columns:
+            version = 7
+        logger.info(f"DB has no recorded version, assuming it is at version {version}")
+        cursor.execute(f"PRAGMA user_version = {version}")
+        connection.commit()
+
+    for migration_version, path in migrations:
+        if migration_version <= version:
+            continue
+        logger.info(f"Applying DB migration {path}")
+        with open(path, "r") as sql_file:
+            sql = sql_file.read()
+        try:
+            # executescript commits whatever is open first, so the transaction is part of the script
+            cursor.executescript(f"BEGIN;\n{sql};\nPRAGMA user_version = {migration_version};\nCOMMIT;")
+        except sqlite3.Error:
+            connection.rollback()
+            raise
+        version = migration_version
+    cursor.close()
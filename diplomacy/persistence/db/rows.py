@@ -0,0 +1,274 @@
+"""
+The rows a phase of a board is saved as, shared by every Storage so that boards save and load the same from each:
+- players: (name, color)
+- provinces: (province, owner, core, half core)
+- units: (location, is dislodged, owner, is army, order type, order destination, order source)
+- retreat_options: (origin, retreat location)
+- builds: (player, location, is build, is army)
+Everything is referred to by name. The changes writes make to these rows are the ones events record (see events.py).
+"""
+
+import logging
+from collections.abc import Iterable
+
+# TODO: Find a better way to do this
+# maybe use a copy from manager?
+from diplomacy.map_parser.vector.vector import get_parser
+from diplomacy.persistence import phase
+from diplomacy.persistence.board import Board
+from diplomacy.persistence.order import (
+    Core,
+    Hold,
+    ConvoyMove,
+    Move,
+    Support,
+    ConvoyTransport,
+    RetreatDisband,
+    RetreatMove,
+    Build,
+    Disband,
+)
+from diplomacy.persistence.player import Player
+from diplomacy.persistence.province import Province
+from diplomacy.persistence.unit import UnitType, Unit
+
+logger = logging.getLogger(__name__)
+
+
+class BoardRows:
+    """The rows of each table, named after it, for one board and phase"""
+
+    def __init__(self):
+        self.players: list[tuple[str, str]] = []
+        self.builds: list[tuple] = []
+        # oldest phase first; a later row for a province replaces an earlier one
+        self.provinces: list[tuple] = []
+        self.units: list[tuple] = []
+        self.retreat_options: list[tuple] = []
+
+
+# Each row as a dict by column, which the database saves them with as statement parameters
+
+
+def province_row(province: Province) -> dict:
+    return {
+        "province": province.name,
+        "owner": province.owner.name if province.owner else None,
+        "core": province.core.name if province.core else None,
+        "half_core": province.half_core.name if province.half_core else None,
+    }
+
+
+def unit_row(unit: Unit) -> dict:
+    # TODO - this is hacky
+    return {
+        "location": unit.location().name,
+        "is_dislodged": unit == unit.province.dislodged_unit,
+        "owner": unit.player.name,
+        "is_army": unit.unit_type == UnitType.ARMY,
+        "order_type": unit.order.__class__.__name__ if unit.order is not None else None,
+        "order_destination": getattr(getattr(unit.order, "destination", None), "name", None),
+        "order_source": getattr(getattr(getattr(unit.order, "source", None), "province", None), "name", None),
+    }
+
+
+def build_row(player: Player, build_order: Build | Disband) -> dict:
+    return {
+        "player": player.name,
+        "location": build_order.location.name,
+        "is_build": isinstance(build_order, Build),
+        "is_army": getattr(build_order, "unit_type", None) == UnitType.ARMY,
+    }
+
+
+def phase_rows(board: Board) -> tuple[list[tuple], list[tuple], list[tuple], list[tuple]]:
+    """:return: the province, unit, retreat option and build rows of the board as it is now"""
+    provinces = [tuple(province_row(province).values()) for province in board.provinces]
+    units = [tuple(unit_row(unit).values()) for unit in board.units]
+    retreat_options = [
+        (unit.location().name, retreat_option.name)
+        for unit in board.units
+        if unit.retreat_options is not None
+        for retreat_option in unit.retreat_options
+    ]
+    builds = [
+        tuple(build_row(player, build_order).values())
+        for player in board.players
+        for build_order in player.build_orders
+    ]
+    return provinces, units, retreat_options, builds
+
+
+# The changes each kind of write makes to a phase, as events record them
+
+
+def province_changes(provinces: list[Province]) -> dict:
+    return {"provinces": [list(province_row(province).values()) for province in provinces]}
+
+
+def unit_changes(units: list[Unit]) -> dict:
+    return {
+        "units": [list(unit_row(unit).values()) for unit in units],
+        "retreat_options": _retreat_option_changes(units),
+    }
+
+
+def order_changes(units: list[Unit]) -> dict:
+    orders = []
+    for unit in units:
+        row = unit_row(unit)
+        orders.append(
+            [row["location"], row["is_dislodged"], row["order_type"], row["order_destination"], row["order_source"]]
+        )
+    return {"orders": orders, "retreat_options": _retreat_option_changes(units)}
+
+
+def _retreat_option_changes(units: list[Unit]) -> list:
+    return [
+        [unit.location().name, [retreat_option.name for retreat_option in unit.retreat_options]]
+        for unit in units
+        if unit.retreat_options is not None
+    ]
+
+
+def build_changes(players: Iterable[Player]) -> dict:
+    return {
+        "builds": [
+            list(build_row(player, build_order).values()) for player in players for build_order in player.build_orders
+        ]
+    }
+
+
+def parse_phase_string(phase_string: str) -> tuple[phase.Phase, int]:
+    """:return: the phase and year of a phase string such as '1642 Spring Moves'"""
+    split_index = phase_string.index(" ")
+    return phase.get(phase_string[split_index:].strip()), int(phase_string[:split_index])
+
+
+def build_board(board_id: int, board_phase: phase.Phase, year: int, fish: int, rows: BoardRows) -> Board:
+    """:return: the variant's board, set to the phase saved as rows"""
+    logger.info(f"Loading board with ID {board_id}")
+    # TODO - we should eventually store things like coords, adjacencies, etc
+    #  so we don't have to reparse the whole board each time
+    board = get_parser().parse()
+    board.phase = board_phase
+    board.year = year
+    board.fish = fish
+    board.board_id = board_id
+    player_info_by_name = {player_name: color for player_name, color in rows.players}
+    for player in board.players:
+        if player.name not in player_info_by_name:
+            logger.warning(f"Couldn't find player {player.name} in DB")
+            continue
+        color = player_info_by_name[player.name]
+        player.color = color
+        player.units = set()
+        player.centers = set()
+        # TODO - player build orders
+    # names are matched ignoring capitalization, as Board.get_player does
+    player_by_name = {player.name.lower(): player for player in board.players}
+    if phase.is_builds(board_phase):
+        for player_name, location, is_build, is_army in rows.builds:
+            if player_name.lower() not in player_by_name:
+                logger.warning(f"Unknown player: {player_name}")
+                continue
+            player = player_by_name[player_name.lower()]
+            if is_build:
+                player_order = Build(board.get_location(location), UnitType.ARMY if is_army else UnitType.FLEET)
+            else:
+                player_order = Disband(board.get_location(location))
+            player.build_orders.add(player_order)
+
+    province_info_by_name = {
+        province_name: (owner, core, half_core) for province_name, owner, core, half_core in rows.provinces
+    }
+    unit_data = rows.units
+    retreat_options_by_origin: dict[str, set[str]] = {}
+    for origin, retreat_loc in rows.retreat_options:
+        retreat_options_by_origin.setdefault(origin, set()).add(retreat_loc)
+    for province in board.provinces:
+        if province.name not in province_info_by_name:
+            logger.warning(f"Couldn't find province {province.name} in DB")
+            continue
+
+        owner, core, half_core = province_info_by_name[province.name]
+
+        if owner is not None:
+            owner_player = player_by_name.get(owner.lower())
+            province.owner = owner_player
+
+            if province.has_supply_center:
+                owner_player.centers.add(province)
+        else:
+            province.owner = None
+
+        core_player = None
+        if core is not None:
+            core_player = player_by_name.get(core.lower())
+        province.core = core_player
+
+        half_core_player = None
+        if half_core is not None:
+            half_core_player = player_by_name.get(half_core.lower())
+        province.half_core = half_core_player
+        province.unit = None
+        province.dislodged_unit = None
+    board.units.clear()
+    for unit_info in unit_data:
+        location, is_dislodged, owner, is_army, order_type, order_destination, order_source = unit_info
+        province, coast = board.get_province_and_coast(location)
+        owner_player = player_by_name.get(owner.lower())
+        if is_dislodged:
+            retreat_options = set(map(board.get_location, retreat_options_by_origin.get(location, set())))
+        else:
+            retreat_options = None
+        unit = Unit(UnitType.ARMY if is_army else UnitType.FLEET, owner_player, province, coast, retreat_options)
+        if is_dislodged:
+            province.dislodged_unit = unit
+        else:
+            province.unit = unit
+        owner_player.units.add(unit)
+        board.units.add(unit)
+    # AAAAA We shouldn't be having to loop twice; why is ComplexOrder.source a Unit? Turn it into a province or something
+    # Currently we have to loop twice because it's a unit and we need to have all the units set up before parsing orders because of it
+    for unit_info in unit_data:
+        location, is_dislodged, owner, is_army, order_type, order_destination, order_source = unit_info
+        if order_type is not None:
+            order_classes = [
+                Hold,
+                Core,
+                Move,
+                ConvoyMove,
+                ConvoyTransport,
+                Support,
+                RetreatMove,
+                RetreatDisband,
+            ]
+            order_class = next(_class for _class in order_classes if _class.__name__ == order_type)
+            destination_province = None
+            if order_destination is not None:
+                destination_province, destination_coast = board.get_province_and_coast(order_destination)
+                if destination_coast is not None:
+                    destination_province = destination_coast
+            source_unit = None
+            if order_source is not None:
+                source_province, source_coast = board.get_province_and_coast(order_source)
+                if source_coast is not None:
+                    source_province = source_coast
+                source_unit = source_province.unit
+            if order_class in [Hold, Core, RetreatDisband]:
+                order = order_class()
+            elif order_class in [Move, ConvoyMove, RetreatMove]:
+                order = order_class(destination=destination_province)
+            elif order_class in [Support, ConvoyTransport]:
+                order = order_class(destination=destination_province, source=source_unit)
+            else:
+                raise ValueError(f"Could not parse {order_class}")
+
+            province, coast = board.get_province_and_coast(location)
+            if is_dislodged:
+                province.dislodged_unit.order = order
+            else:
+                province.unit.order = order
+
+    return board
@@ -3,58 +3,90 @@ CREATE TABLE IF NOT EXISTS boards (
     phase text,
     map_file text,
     fish int,
+    phase_ordinal int,
+    is_keyframe boolean NOT NULL DEFAULT 1,
     PRIMARY KEY (board_id, phase));
+CREATE UNIQUE INDEX IF NOT EXISTS boards_latest_phase ON boards (board_id, phase_ordinal);
+CREATE TABLE IF NOT EXISTS locations (
+    location_id INTEGER PRIMARY KEY,
+    variant text NOT NULL,
+    name text NOT NULL,
+    UNIQUE (variant, name));
 CREATE TABLE IF NOT EXISTS players (
+    player_id INTEGER PRIMARY KEY,
     board_id int,
-    player_name text,
+    player_name text COLLATE NOCASE,
     color varchar(6),
-    PRIMARY KEY (board_id, player_name),
+    UNIQUE (board_id, player_name),
     FOREIGN KEY (board_id) REFERENCES boards (board_id));
 CREATE TABLE IF NOT EXISTS provinces (
     board_id int,
-    phase text,
-    province_name text,
-    owner text,
-    core text,
-    half_core text,
-    PRIMARY KEY (board_id, phase, province_name),
-    FOREIGN KEY (board_id, phase) REFERENCES boards (board_id, phase),
-    FOREIGN KEY (board_id, owner) REFERENCES players (board_id, player_name),
-    FOREIGN KEY (board_id, core) REFERENCES players (board_id, player_name),
-    FOREIGN KEY (board_id, half_core) REFERENCES players (board_id, player_name));
+    phase_ordinal int,
+    province_id int,
+    owner_id int,
+    core_id int,
+    half_core_id int,
+    PRIMARY KEY (board_id, phase_ordinal, province_id),
+    FOREIGN KEY (board_id, phase_ordinal) REFERENCES boards (board_id, phase_ordinal),
+    FOREIGN KEY (province_id) REFERENCES locations (location_id),
+    FOREIGN KEY (owner_id) REFERENCES players (player_id),
+    FOREIGN KEY (core_id) REFERENCES players (player_id),
+    FOREIGN KEY (half_core_id) REFERENCES players (player_id)
+) WITHOUT ROWID;
 CREATE TABLE IF NOT EXISTS retreat_options (
     board_id int,
-    phase text,
-    origin text,
-    retreat_loc text,
-    PRIMARY KEY (board_id, phase, origin, retreat_loc),
-    FOREIGN KEY (board_id, phase) REFERENCES boards (board_id, phase),
-    FOREIGN KEY (board_id, phase, origin) REFERENCES provinces (board_id, phase, province_name),
-    FOREIGN KEY (board_id, phase, retreat_loc) REFERENCES provinces (board_id, phase, province_name));
+    phase_ordinal int,
+    origin_id int,
+    retreat_location_id int,
+    PRIMARY KEY (board_id, phase_ordinal, origin_id, retreat_location_id),
+    FOREIGN KEY (board_id, phase_ordinal) REFERENCES boards (board_id, phase_ordinal),
+    FOREIGN KEY (origin_id) REFERENCES locations (location_id),
+    FOREIGN KEY (retreat_location_id) REFERENCES locations (location_id)
+) WITHOUT ROWID;
 CREATE TABLE IF NOT EXISTS units (
     board_id int,
-    phase text,
-    location text,
+    phase_ordinal int,
+    location_id int,
     is_dislodged boolean,
-    owner text,
+    owner_id int,
     is_army boolean,
     order_type text,
-    order_destination text,
-    order_source text,
-    PRIMARY KEY (board_id, phase, location, is_dislodged),
-    FOREIGN KEY (board_id, phase) REFERENCES boards (board_id, phase),
-    FOREIGN KEY (board_id, phase, location) REFERENCES provinces (board_id, phase, province_name),
-    FOREIGN KEY (board_id, owner) REFERENCES players (board_id, player_name),
-    FOREIGN KEY (board_id, phase, location) REFERENCES retreat_options (board_id, phase, origin));
+    order_destination_id int,
+    order_source_id int,
+    PRIMARY KEY (board_id, phase_ordinal, location_id, is_dislodged),
+    FOREIGN KEY (board_id, phase_ordinal) REFERENCES boards (board_id, phase_ordinal),
+    FOREIGN KEY (location_id) REFERENCES locations (location_id),
+    FOREIGN KEY (owner_id) REFERENCES players (player_id),
+    FOREIGN KEY (order_destination_id) REFERENCES locations (location_id),
+    FOREIGN KEY (order_source_id) REFERENCES locations (location_id)
+) WITHOUT ROWID;
 CREATE TABLE IF NOT EXISTS builds(
     board_id int,
-    phase text,
-    player text,
-    location text,
+    phase_ordinal int,
+    player_id int,
+    location_id int,
     is_build boolean,
     is_army boolean,
-    PRIMARY KEY (board_id, phase, player, location),
-    FOREIGN KEY (board_id, phase) REFERENCES boards (board_id, phase),
-    FOREIGN KEY (board_id, player) REFERENCES players (board_id, player_name),
-    FOREIGN KEY (board_id, phase, location) REFERENCES provinces (board_id, phase, province_name)
-)
\ No newline at end of file
+    PRIMARY KEY (board_id, phase_ordinal, player_id, location_id),
+    FOREIGN KEY (board_id, phase_ordinal) REFERENCES boards (board_id, phase_ordinal),
+    FOREIGN KEY (player_id) REFERENCES players (player_id),
+    FOREIGN KEY (location_id) REFERENCES locations (location_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS builds_location ON builds (board_id, phase_ordinal, location_id);
+CREATE TABLE IF NOT EXISTS snapshots (
+    board_id int,
+    phase_ordinal int,
+    version int NOT NULL,
+    data blob NOT NULL,
+    last_event_id int NOT NULL DEFAULT 0,
+    PRIMARY KEY (board_id, phase_ordinal),
+    FOREIGN KEY (board_id, phase_ordinal) REFERENCES boards (board_id, phase_ordinal)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS events (
+    event_id INTEGER PRIMARY KEY,
+    board_id int NOT NULL,
+    phase_ordinal int NOT NULL,
+    created_at real NOT NULL,
+    kind text NOT NULL,
+    data text NOT NULL);
+CREATE INDEX IF NOT EXISTS events_phase ON events (board_id, phase_ordinal, event_id);
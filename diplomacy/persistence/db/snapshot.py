@@ -0,0 +1,196 @@
+"""
+A snapshot is the state of a board in one phase packed into one bytes value, so that a phase is loaded with one read
+rather than a query per table. It holds, after a header, fixed-width little-endian arrays of the provinces, the units,
+the retreat options of the dislodged units (a bitset over the provinces) and the build orders. Locations and players
+are referred to by their ids in the database, and 0 means none.
+
+Snapshots are made from and read into rows in the same form as the row tables are read in, so they load through the
+same code.
+"""
+
+import numpy as np
+
+# a snapshot of any other version is not read
+VERSION = 1
+
+# the orders a unit can have, by their opcode in a snapshot minus 1; 0 is no order
+_order_types = ["Hold", "Core", "Move", "ConvoyMove", "ConvoyTransport", "Support", "RetreatMove", "RetreatDisband"]
+
+_header = np.dtype([("version", "<u4"), ("provinces", "<u4"), ("units", "<u4"), ("builds", "<u4")])
+_province = np.dtype([("province", "<u4"), ("owner", "<u4"), ("core", "<u4"), ("half_core", "<u4")])
+_unit = np.dtype(
+    [
+        ("location", "<u4"),
+        ("owner", "<u4"),
+        ("flags", "u1"),
+        ("order", "u1"),
+        ("destination", "<u4"),
+        ("source", "<u4"),
+    ]
+)
+_build = np.dtype([("player", "<u4"), ("location", "<u4"), ("flags", "u1")])
+
+# unit flags
+_ARMY = 1
+_DISLODGED = 2
+# build flags
+_IS_BUILD = 1
+_BUILDS_ARMY = 2
+
+
+def encode(
+    provinces: list[tuple],
+    units: list[tuple],
+    retreat_options: list[tuple],
+    builds: list[tuple],
+    location_ids: dict[str, int],
+    player_ids: dict[str, int],
+) -> bytes:
+    """
+    :param provinces: (province, owner, core, half core) of every province
+    :param units: (location, is dislodged, owner, is army, order type, order destination, order source) of every unit
+    :param retreat_options: (origin, retreat location) of every retreat option of the dislodged units
+    :param builds: (player, location, is build, is army) of every build order
+    :param location_ids: the id of each location by name
+    :param player_ids: the id of each player by name in lower case
+    :raise ValueError: if a location or player has no id
+    """
+
+    def player_id(name: str | None) -> int:
+        if name is None:
+            return 0
+        if name.lower() not in player_ids:
+            raise ValueError(f"Player {name} has no id")
+        return player_ids[name.lower()]
+
+    def location_id(name: str | None) -> int:
+        if name is None:
+            return 0
+        if name not in location_ids:
+            raise ValueError(f"Location {name} has no id")
+        return location_ids[name]
+
+    province_array = np.array(
+        [
+            (location_id(province), player_id(owner), player_id(core), player_id(half_core))
+            for province, owner, core, half_core in provinces
+        ],
+        dtype=_province,
+    )
+    unit_array = np.array(
+        [
+            (
+                location_id(location),
+                player_id(owner),
+                (_ARMY if is_army else 0) | (_DISLODGED if is_dislodged else 0),
+                _order_types.index(order_type) + 1 if order_type is not None else 0,
+                location_id(destination),
+                location_id(source),
+            )
+            for location, is_dislodged, owner, is_army, order_type, destination, source in units
+        ],
+        dtype=_unit,
+    )
+
+    # a row of bits for each dislodged unit, in the order of the units, with a bit for each province
+    province_index = {province[0]: i for i, province in enumerate(provinces)}
+    dislodged_index = {unit[0]: i for i, unit in enumerate(unit for unit in units if unit[1])}
+    retreat_bits = np.zeros((len(dislodged_index), len(provinces)), dtype=bool)
+    for origin, retreat_location in retreat_options:
+        if origin in dislodged_index:
+            if retreat_location not in province_index:
+                raise ValueError(f"Retreat option {retreat_location} is not a province")
+            retreat_bits[dislodged_index[origin], province_index[retreat_location]] = True
+
+    build_array = np.array(
+        [
+            (
+                player_id(player),
+                location_id(location),
+                (_IS_BUILD if is_build else 0) | (_BUILDS_ARMY if is_army else 0),
+            )
+            for player, location, is_build, is_army in builds
+        ],
+        dtype=_build,
+    )
+
+    header = np.array([(VERSION, len(provinces), len(units), len(builds))], dtype=_header)
+    return b"".join(
+        [
+            header.tobytes(),
+            province_array.tobytes(),
+            unit_array.tobytes(),
+            np.packbits(retreat_bits, axis=1).tobytes(),
+            build_array.tobytes(),
+        ]
+    )
+
+
+def decode(
+    data: bytes, location_names: dict[int, str], player_names: dict[int, str]
+) -> tuple[list[tuple], list[tuple], list[tuple], list[tuple]]:
+    """:return: the provinces, units, retreat options and builds in data, in the form encode takes them"""
+    header = np.frombuffer(data, dtype=_header, count=1)[0]
+    if header["version"] != VERSION:
+        raise ValueError(f"Can't read a version {header['version']} snapshot")
+    province_count, unit_count, build_count = int(header["provinces"]), int(header["units"]), int(header["builds"])
+
+    offset = _header.itemsize
+    province_array = np.frombuffer(data, dtype=_province, count=province_count, offset=offset)
+    offset += province_array.nbytes
+    unit_array = np.frombuffer(data, dtype=_unit, count=unit_count, offset=offset)
+    offset += unit_array.nbytes
+    dislodged = (unit_array["flags"] & _DISLODGED).astype(bool)
+    row_bytes = (province_count + 7) // 8
+    packed_bits = np.frombuffer(data, dtype=np.uint8, count=int(dislodged.sum()) * row_bytes, offset=offset)
+    offset += packed_bits.nbytes
+    build_array = np.frombuffer(data, dtype=_build, count=build_count, offset=offset)
+
+    # names looked up by id for a whole column at once, with None for 0
+    locations = _lookup_table(location_names)
+    players = _lookup_table(player_names)
+    order_types = np.array([None, *_order_types], dtype=object)
+
+    province_names = locations[province_array["province"]]
+    provinces = list(
+        zip(
+            province_names.tolist(),
+            players[province_array["owner"]].tolist(),
+            players[province_array["core"]].tolist(),
+            players[province_array["half_core"]].tolist(),
+        )
+    )
+    unit_locations = locations[unit_array["location"]]
+    units = list(
+        zip(
+            unit_locations.tolist(),
+            dislodged.tolist(),
+            players[unit_array["owner"]].tolist(),
+            (unit_array["flags"] & _ARMY).astype(bool).tolist(),
+            order_types[unit_array["order"]].tolist(),
+            locations[unit_array["destination"]].tolist(),
+            locations[unit_array["source"]].tolist(),
+        )
+    )
+    retreat_bits = np.unpackbits(packed_bits.reshape(-1, row_bytes), axis=1, count=province_count).astype(bool)
+    retreat_options = [
+        (origin, retreat_location)
+        for origin, bits in zip(unit_locations[dislodged].tolist(), retreat_bits)
+        for retreat_location in province_names[bits].tolist()
+    ]
+    builds = list(
+        zip(
+            players[build_array["player"]].tolist(),
+            locations[build_array["location"]].tolist(),
+            (build_array["flags"] & _IS_BUILD).astype(bool).tolist(),
+            (build_array["flags"] & _BUILDS_ARMY).astype(bool).tolist(),
+        )
+    )
+    return provinces, units, retreat_options, builds
+
+
+def _lookup_table(names: dict[int, str]) -> np.ndarray:
+    table = np.full(max(names, default=0) + 1, None, dtype=object)
+    for name_id, name in names.items():
+        table[name_id] = name
+    return table
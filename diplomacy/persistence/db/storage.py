@@ -0,0 +1,91 @@
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from concurrent.futures import Future
+
+from diplomacy.persistence import phase
+from diplomacy.persistence.board import Board
+from diplomacy.persistence.player import Player
+from diplomacy.persistence.province import Location, Province
+from diplomacy.persistence.unit import Unit
+
+
+class Storage(ABC):
+    """
+    Where boards are saved, owned by Manager, which commands save their changes through. database.get_connection() is
+    the SQLite database the bot runs with, and memory.MemoryStorage keeps boards in memory with the same behaviour, for
+    benchmarks and tests that shouldn't touch the disk.
+
+    A board is saved once per phase with save_board, and after that each change to its current phase is saved by the
+    method for that kind of change. Writes may be saved in the background: each returns a future resolved once it is
+    saved, or with the error if it couldn't be, and flush waits for every one.
+    """
+
+    @abstractmethod
+    def get_board_ids(self) -> set[int]:
+        pass
+
+    @abstractmethod
+    def get_boards(self) -> dict[int, Board]:
+        """:return: the latest phase of every board, by board id"""
+        pass
+
+    @abstractmethod
+    def get_latest_board(self, board_id: int) -> Board | None:
+        pass
+
+    @abstractmethod
+    def get_board(self, board_id: int, board_phase: phase.Phase, year: int, fish: int) -> Board | None:
+        pass
+
+    @abstractmethod
+    def save_board(self, board_id: int, board: Board):
+        """Saves a new phase of the board, waiting until it is saved"""
+        pass
+
+    @abstractmethod
+    def save_phase(self, board: Board, old_phase_ordinal: int) -> Future[None]:
+        """Moves the board's current phase, saved as old_phase_ordinal, to the phase the board is in now"""
+        pass
+
+    @abstractmethod
+    def save_provinces(self, board: Board, provinces: Iterable[Province]) -> Future[None]:
+        """Saves edits to provinces in the board's current phase"""
+        pass
+
+    @abstractmethod
+    def save_units(self, board: Board, units: Iterable[Unit]) -> Future[None]:
+        """Saves units added to the board's current phase by an edit, with the retreat options of dislodged ones"""
+        pass
+
+    @abstractmethod
+    def delete_unit(self, board: Board, location: Location, is_dislodged: bool) -> Future[None]:
+        """Deletes the unit, or the dislodged unit, at location in the board's current phase"""
+        pass
+
+    @abstractmethod
+    def save_order_for_units(self, board: Board, units: Iterable[Unit]) -> Future[None]:
+        pass
+
+    @abstractmethod
+    def save_build_orders_for_players(self, board: Board, player: Player | None) -> Future[None]:
+        """Saves the build orders of player, or of every player if None"""
+        pass
+
+    @abstractmethod
+    def delete_build_orders(self, board: Board, location_names: Iterable[str]) -> Future[None]:
+        """Deletes the build orders of every player at the locations in the board's current phase"""
+        pass
+
+    @abstractmethod
+    def delete_board(self, board: Board):
+        """Deletes the board's current phase, waiting until it is deleted"""
+        pass
+
+    @abstractmethod
+    def save_fish(self, board: Board) -> Future[None]:
+        pass
+
+    @abstractmethod
+    def flush(self) -> Future[None]:
+        """:return: resolved once every write made before it has been saved"""
+        pass
@@ -1,89 +1,241 @@
+import collections
+import contextlib
+import io
 import logging
+import os
+import threading
+import time
+from typing import Iterator
 
 from diplomacy.adjudicator.adjudicator import make_adjudicator
 from diplomacy.adjudicator.mapper import Mapper
-from diplomacy.map_parser.vector.vector import oneTrueParser
+from diplomacy.map_parser.vector.vector import get_parser
 from diplomacy.persistence import phase
 from diplomacy.persistence.board import Board
 from diplomacy.persistence.db import database
+from diplomacy.persistence.db.storage import Storage
 from diplomacy.persistence.player import Player
+from diplomacy.persistence.server_lock import ServerLock
 
 logger = logging.getLogger(__name__)
 
+# If set, every map sent is also saved under <DEBUG_RENDER_DIR>/<server id>/
+_debug_render_dir = os.getenv("DEBUG_RENDER_DIR")
+
+# boards are loaded when a command first needs them, and unloaded again once they haven't been used for
+# BOARD_IDLE_SECONDS or when more than MAX_LOADED_BOARDS are loaded, least recently used first
+_max_loaded_boards = int(os.getenv("MAX_LOADED_BOARDS", "32"))
+_board_idle_seconds = float(os.getenv("BOARD_IDLE_SECONDS", "3600"))
 
-class Manager:
-    """Manager acts as an intermediary between Bot (the Discord API), Board (the board state), the database."""
 
-    def __init__(self):
-        self._database = database.get_connection()
-        self._boards: dict[int, Board] = self._database.get_boards()
+class Manager:
+    """
+    Manager acts as an intermediary between Bot (the Discord API), Board (the board state), the storage.
+
+    Commands for different servers may run at once on different threads. Anything reading a server's board should hold
+    its lock shared (reading()) and anything changing it exclusively (writing()); Manager's own methods don't take it.
+    """
+
+    def __init__(self, storage: Storage | None = None):
+        # where boards are saved, which commands save their changes to as well
+        self.storage: Storage = storage if storage is not None else database.get_connection()
+        # the loaded boards, least recently used first
+        self._boards: collections.OrderedDict[int, Board] = collections.OrderedDict()
+        self._last_used: dict[int, float] = {}
+        # guards _boards, _last_used, _mappers, _mapper_locks and _locks, which commands for every server share
+        self._boards_lock = threading.Lock()
+        # mappers are kept between commands so that each render only redraws what changed on the board
+        self._mappers: dict[int, Mapper] = {}
+        # a mapper changes its map while drawing, so commands reading the same board still take turns to draw it
+        self._mapper_locks: dict[int, threading.Lock] = {}
+        self._locks: dict[int, ServerLock] = {}
         # TODO: have multiple for each variant?
         # do it like this so that the parser can cache data between board initilizations
 
+    def get_lock(self, server_id: int) -> ServerLock:
+        # Unlike mappers, locks are never dropped with their boards. A command gets its server's lock before taking a
+        # place in it, so a lock dropped for having no one in it could still be about to be used, while the next command
+        # made a second lock for the same server. Each is only a few small objects, one per server the bot is in.
+        with self._boards_lock:
+            lock = self._locks.get(server_id)
+            if lock is None:
+                lock = ServerLock()
+                self._locks[server_id] = lock
+        return lock
+
+    @contextlib.contextmanager
+    def reading(self, server_id: int) -> Iterator[None]:
+        with self.get_lock(server_id).hold(exclusive=False):
+            yield
+
+    @contextlib.contextmanager
+    def writing(self, server_id: int) -> Iterator[None]:
+        with self.get_lock(server_id).hold(exclusive=True):
+            yield
+
     def list_servers(self) -> set[int]:
-        return set(self._boards.keys())
+        return self.storage.get_board_ids()
 
     def create_game(self, server_id: int) -> str:
-        if self._boards.get(server_id):
+        if self._find_board(server_id):
             raise RuntimeError("A game already exists in this server.")
 
         logger.info(f"Creating new [ImpDip] game in server {server_id}")
-        self._boards[server_id] = oneTrueParser.parse()
-        self._boards[server_id].board_id = server_id
-        self._database.save_board(server_id, self._boards[server_id])
+        board = get_parser().parse()
+        board.board_id = server_id
+        self.storage.save_board(server_id, board)
+        self._set_board(server_id, board)
 
         return "ImpDip game created"
 
     def get_board(self, server_id: int) -> Board:
-        board = self._boards.get(server_id)
+        board = self._find_board(server_id)
         if not board:
             raise RuntimeError("There is no existing game this this server.")
         return board
 
-    def draw_moves_map(self, server_id: int, player_restriction: Player | None) -> str:
-        return Mapper(self._boards[server_id]).draw_moves_map(self._boards[server_id].phase, player_restriction)
+    def _find_board(self, server_id: int) -> Board | None:
+        with self._boards_lock:
+            board = self._boards.get(server_id)
+            if board is not None:
+                self._boards.move_to_end(server_id)
+                self._last_used[server_id] = time.monotonic()
+                unloaded = self._unload_idle_boards()
+        if board is not None:
+            self._forget_boards(unloaded)
+            return board
+
+        board = self.storage.get_latest_board(server_id)
+        if board is None:
+            return None
+        # another command for the server may have loaded it meanwhile, and then that one is used
+        return self._set_board(server_id, board, replace=False)
+
+    def _set_board(self, server_id: int, board: Board, replace: bool = True) -> Board:
+        """Makes board the loaded board of server_id, unloading the boards that have been idle too long"""
+        with self._boards_lock:
+            if not replace and server_id in self._boards:
+                board = self._boards[server_id]
+            self._boards[server_id] = board
+            self._boards.move_to_end(server_id)
+            self._last_used[server_id] = time.monotonic()
+            unloaded = self._unload_idle_boards()
+        self._forget_boards(unloaded)
+        return board
 
-    def adjudicate(self, server_id: int) -> str:
+    def _unload_idle_boards(self) -> list[Board]:
+        """:return: the boards unloaded; must be called holding _boards_lock"""
+        now = time.monotonic()
+        unloaded = []
+        for server_id in list(self._boards):
+            too_many = len(self._boards) > _max_loaded_boards
+            if not too_many and now - self._last_used[server_id] <= _board_idle_seconds:
+                # the rest were used more recently still
+                break
+            board = self._boards[server_id]
+            lock = self._locks.get(server_id)
+            # whether orders are locked is only kept in memory, and boards that commands are using must stay
+            if not board.orders_enabled or (lock is not None and lock.depth()):
+                continue
+            del self._boards[server_id]
+            del self._last_used[server_id]
+            self._mappers.pop(server_id, None)
+            # nothing is drawing it, as only commands draw and none are using it
+            self._mapper_locks.pop(server_id, None)
+            unloaded.append(board)
+        return unloaded
+
+    def _forget_boards(self, unloaded: list[Board]) -> None:
+        for board in unloaded:
+            # fish are only saved now and then as they are caught, so save them before they are forgotten
+            self.storage.save_fish(board)
+        if unloaded:
+            logger.info(f"Unloaded {len(unloaded)} idle boards, {len(self._boards)} are loaded")
+
+    def draw_moves_map(self, server_id: int, player_restriction: Player | None) -> io.BytesIO:
+        with self._get_mapper_lock(server_id):
+            svg = self._get_mapper(server_id).draw_moves_map(self.get_board(server_id).phase, player_restriction)
+        return self._save_debug_render(server_id, svg)
+
+    def draw_current_map(self, server_id: int) -> io.BytesIO:
+        with self._get_mapper_lock(server_id):
+            svg = self._get_mapper(server_id).draw_current_map()
+        return self._save_debug_render(server_id, svg)
+
+    def draw_player_moves_maps(self, server_id: int) -> dict[Player, io.BytesIO]:
+        with self._get_mapper_lock(server_id):
+            maps = self._get_mapper(server_id).draw_player_moves_maps(self.get_board(server_id).phase)
+        return {player: self._save_debug_render(server_id, svg) for player, svg in maps.items()}
+
+    @staticmethod
+    def _save_debug_render(server_id: int, svg: io.BytesIO) -> io.BytesIO:
+        if _debug_render_dir:
+            game_dir = os.path.join(_debug_render_dir, str(server_id))
+            os.makedirs(game_dir, exist_ok=True)
+            with open(os.path.join(game_dir, svg.name), "wb") as file:
+                file.write(svg.getbuffer())
+        return svg
+
+    def _get_mapper_lock(self, server_id: int) -> threading.Lock:
+        with self._boards_lock:
+            lock = self._mapper_locks.get(server_id)
+            if lock is None:
+                lock = threading.Lock()
+                self._mapper_locks[server_id] = lock
+        return lock
+
+    def _get_mapper(self, server_id: int) -> Mapper:
+        board = self.get_board(server_id)
+        with self._boards_lock:
+            mapper = self._mappers.get(server_id)
+        if mapper is None:
+            mapper = Mapper(board)
+            with self._boards_lock:
+                self._mappers[server_id] = mapper
+        else:
+            mapper.update(board)
+        return mapper
+
+    def adjudicate(self, server_id: int) -> io.BytesIO:
         # mapper = Mapper(self._boards[server_id])
         # mapper.draw_moves_map(None)
-        adjudicator = make_adjudicator(self._boards[server_id])
+        # orders are saved in the background; make sure every order adjudicated has been
+        self.storage.flush().result()
+        adjudicator = make_adjudicator(self.get_board(server_id))
         # TODO - use adjudicator.orders() (tells you which ones succeeded and failed) to draw a better moves map
         new_board = adjudicator.run()
         new_board.phase = new_board.phase.next
         if new_board.phase.name == "Spring Moves":
             new_board.year += 1
         logger.info("Adjudicator ran successfully")
-        self._boards[server_id] = new_board
-        self._database.save_board(server_id, new_board)
-        mapper = Mapper(new_board)
-        return mapper.draw_current_map()
+        self.storage.save_board(server_id, new_board)
+        self._set_board(server_id, new_board)
+        return self.draw_current_map(server_id)
 
-    def rollback(self, server_id: int) -> tuple[str, str]:
+    def rollback(self, server_id: int) -> tuple[str, io.BytesIO]:
         logger.info(f"Rolling back in server {server_id}")
-        board = self._boards[server_id]
+        board = self.get_board(server_id)
         # TODO: what happens if we're on the first phase?
         last_phase = board.phase.previous
         last_phase_year = board.year
         if board.phase.name == "Spring Moves":
             last_phase_year -= 1
 
-        old_board = self._database.get_board(board.board_id, last_phase, last_phase_year, board.fish)
+        old_board = self.storage.get_board(board.board_id, last_phase, last_phase_year, board.fish)
         if old_board is None:
             raise ValueError(f"There is no {last_phase_year} {last_phase.name} board for this server")
 
-        self._database.delete_board(board)
-        self._boards[server_id] = old_board
-        mapper = Mapper(old_board)
-        return f"Rolled back to {old_board.get_phase_and_year_string()}", mapper.draw_current_map()
+        self.storage.delete_board(board)
+        self._set_board(server_id, old_board)
+        return f"Rolled back to {old_board.get_phase_and_year_string()}", self.draw_current_map(server_id)
 
-    def reload(self, server_id: int) -> tuple[str, str]:
+    def reload(self, server_id: int) -> tuple[str, io.BytesIO]:
         logger.info(f"Reloading server {server_id}")
-        board = self._boards[server_id]
+        board = self.get_board(server_id)
 
-        loaded_board = self._database.get_board(server_id, board.phase, board.year, board.fish)
+        loaded_board = self.storage.get_board(server_id, board.phase, board.year, board.fish)
         if loaded_board is None:
             raise ValueError(f"There is no {board.year} {board.phase.name} board for this server")
 
-        self._boards[server_id] = loaded_board
-        mapper = Mapper(loaded_board)
-        return f"Reloaded board for phase {loaded_board.get_phase_and_year_string()}", mapper.draw_current_map()
+        self._set_board(server_id, loaded_board)
+        return f"Reloaded board for phase {loaded_board.get_phase_and_year_string()}", self.draw_current_map(server_id)
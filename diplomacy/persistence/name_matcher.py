@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    from diplomacy.persistence.province import Province
+
+# the ways players write each coast, keyed by the suffix of coast names
+_coast_spellings: dict[str, list[str]] = {
+    "nc": ["nc", "north coast", "(nc)"],
+    "sc": ["sc", "south coast", "(sc)"],
+    "ec": ["ec", "east coast", "(ec)"],
+    "wc": ["wc", "west coast", "(wc)"],
+}
+
+# marks the end of a name in the trie; words never contain whitespace, so this can't clash with one
+_END = " "
+
+
+def normalize(name: str) -> str:
+    """Lowercases name and treats underscores and dots as spaces, e.g. 'St._Helena' and 'st. helena' -> 'st helena'"""
+    return " ".join(name.lower().replace("_", " ").replace(".", " ").split())
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Edit distance between a and b, counting swapped neighbouring letters as one edit (the most common typo), or
+    limit + 1 as soon as it is known to be more than limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before_previous: list[int] = []
+    previous = list(range(len(b) + 1))
+    for i, a_char in enumerate(a, 1):
+        current = [i]
+        for j, b_char in enumerate(b, 1):
+            distance = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a_char != b_char))
+            if i > 1 and j > 1 and a_char == b[j - 2] and a[i - 2] == b_char:
+                distance = min(distance, before_previous[j - 2] + 1)
+            current.append(distance)
+        if min(current) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return previous[-1]
+
+
+class NameMatcher:
+    """
+    Matches the names players write for provinces and coasts to the names the variant uses. Names are kept in a trie of
+    normalized words, so a multi-word name is found in one left-to-right scan of an order. It only depends on the
+    variant's names, so one is shared by every board of the variant.
+    """
+
+    def __init__(self):
+        self._names: dict[str, str] = {}
+        self._trie: dict = {}
+
+    @classmethod
+    def from_provinces(cls, provinces: Iterable[Province]) -> NameMatcher:
+        matcher = cls()
+        for province in provinces:
+            matcher.add(province.name, province.name)
+            for coast in province.coasts:
+                matcher.add(coast.name, coast.name)
+                for suffix, spellings in _coast_spellings.items():
+                    if normalize(coast.name) == f"{normalize(province.name)} {suffix}":
+                        for spelling in spellings:
+                            matcher.add(f"{province.name} {spelling}", coast.name)
+        return matcher
+
+    def add(self, alias: str, name: str) -> None:
+        """Makes alias, however it is capitalized or spaced, match the location called name"""
+        alias = normalize(alias)
+        self._names[alias] = name
+        node = self._trie
+        for word in alias.split():
+            node = node.setdefault(word, {})
+        node[_END] = name
+
+    def get(self, name: str) -> str | None:
+        return self._names.get(normalize(name))
+
+    def match(self, words: list[str], start: int = 0) -> tuple[str, int] | None:
+        """
+        Finds the longest name at the start of words[start:], which must already be normalized.
+
+        :return: the location name and the index of the first word after it, or None if no name starts there
+        """
+        longest = None
+        node = self._trie
+        for i in range(start, len(words)):
+            node = node.get(words[i])
+            if node is None:
+                break
+            if _END in node:
+                longest = (node[_END], i + 1)
+        return longest
+
+    def resolve(self, name: str) -> str:
+        """:raises ValueError: if nothing is called name, suggesting the closest names"""
+        match = self.get(name)
+        if match is not None:
+            return match
+        suggestions = self.suggest(name)
+        if suggestions:
+            raise ValueError(f"Could not find a location named {name}, did you mean {' or '.join(suggestions)}?")
+        raise ValueError(f"Could not find a location named {name}")
+
+    def suggest(self, name: str, limit: int = 3) -> list[str]:
+        """The names closest to name by edit distance, closest first; a distance of more than 2 is never a match"""
+        name = normalize(name)
+        max_distance = 1 if len(name) <= 4 else 2
+        best: dict[str, int] = {}
+        for alias, location_name in self._names.items():
+            distance = _edit_distance(name, alias, max_distance)
+            if distance <= max_distance and distance < best.get(location_name, max_distance + 1):
+                best[location_name] = distance
+        return sorted(best, key=lambda location_name: (best[location_name], location_name))[:limit]
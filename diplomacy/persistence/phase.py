@@ -2,20 +2,26 @@ from __future__ import annotations
 
 
 class Phase:
-    def __init__(self, name: str, next_phase: Phase, previous_phase: Phase):
+    def __init__(self, name: str, index: int, next_phase: Phase, previous_phase: Phase):
         self.name: str = name
+        # where the phase comes in the year, from 0 for Spring Moves to 4 for Winter Builds
+        self.index: int = index
         self.next: Phase = next_phase
         self.previous: Phase = previous_phase
 
     def __str__(self):
         return self.name
 
+    def ordinal(self, year: int) -> int:
+        """A number that orders every phase of every year, stored with boards so the latest can be found in SQL"""
+        return year * 5 + self.index
 
-_winter_builds = Phase("Winter Builds", None, None)
-_fall_retreats = Phase("Fall Retreats", _winter_builds, None)
-_fall_moves = Phase("Fall Moves", _fall_retreats, None)
-_spring_retreats = Phase("Spring Retreats", _fall_moves, None)
-_spring_moves = Phase("Spring Moves", _spring_retreats, None)
+
+_winter_builds = Phase("Winter Builds", 4, None, None)
+_fall_retreats = Phase("Fall Retreats", 3, _winter_builds, None)
+_fall_moves = Phase("Fall Moves", 2, _fall_retreats, None)
+_spring_retreats = Phase("Spring Retreats", 1, _fall_moves, None)
+_spring_moves = Phase("Spring Moves", 0, _spring_retreats, None)
 
 _winter_builds.next = _spring_moves
 _winter_builds.previous = _fall_retreats
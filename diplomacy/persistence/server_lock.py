@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import collections
+import contextlib
+import threading
+from concurrent.futures import Future
+from typing import Iterator
+
+
+class Ticket:
+    """A place in a ServerLock's queue; granted is resolved once it is the ticket's turn to hold the lock"""
+
+    def __init__(self, exclusive: bool):
+        self.exclusive: bool = exclusive
+        self.granted: Future[None] = Future()
+
+
+class ServerLock:
+    """
+    A read/write lock for one server's game. Any number of shared holders (commands that only read the board) may hold
+    it at once, or one exclusive holder (commands that change it).
+
+    Tickets are granted strictly in the order they were reserved, so a command never overtakes one sent before it, and
+    a command waiting for exclusive access is never starved by a stream of readers. Reserving never blocks, and waiting
+    for a ticket can be done on a thread (Ticket.granted.result()) or on an event loop (asyncio.wrap_future).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiting: collections.deque[Ticket] = collections.deque()
+        self._readers = 0
+        self._writing = False
+
+    def reserve(self, exclusive: bool) -> Ticket:
+        ticket = Ticket(exclusive)
+        with self._lock:
+            self._waiting.append(ticket)
+            granted = self._grant()
+        for ticket_granted in granted:
+            ticket_granted.granted.set_result(None)
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        with self._lock:
+            if ticket.exclusive:
+                self._writing = False
+            else:
+                self._readers -= 1
+            granted = self._grant()
+        # resolved outside the lock, as resolving runs the callbacks of whoever is waiting
+        for ticket_granted in granted:
+            ticket_granted.granted.set_result(None)
+
+    def _grant(self) -> list[Ticket]:
+        """Takes the tickets at the front of the queue that can hold the lock now; must be called holding self._lock"""
+        granted = []
+        while self._waiting and not self._writing:
+            ticket = self._waiting[0]
+            if ticket.exclusive:
+                if self._readers:
+                    break
+                self._writing = True
+            else:
+                self._readers += 1
+            granted.append(self._waiting.popleft())
+        return granted
+
+    def depth(self) -> int:
+        """How many commands hold or are waiting for the lock"""
+        with self._lock:
+            return len(self._waiting) + self._readers + self._writing
+
+    @contextlib.contextmanager
+    def hold(self, exclusive: bool) -> Iterator[None]:
+        """Blocks the calling thread until the lock is held"""
+        ticket = self.reserve(exclusive)
+        ticket.granted.result()
+        try:
+            yield
+        finally:
+            self.release(ticket)